@@ -5,16 +5,24 @@
 
 import os
 import hashlib
+import hmac
 import secrets
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
-from enum import Enum
-from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Dict, List, Any, Iterable, Union
+from enum import Enum, IntFlag
+from dataclasses import dataclass, field
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from password_pool import password_pool, PasswordPoolSaturated
+from token_cache import CachedToken, token_cache, token_digest
+from user_store import UserRepository, create_user_repository
+from tracing import set_span_attributes, tracing
+
 # 简化的密码哈希实现，避免 bcrypt 兼容性问题
 def simple_hash_password(password: str) -> str:
     """简单的密码哈希实现"""
@@ -27,7 +35,8 @@ def simple_verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         salt, stored_hash = hashed_password.split(':')
         password_hash = hashlib.pbkdf2_hmac('sha256', plain_password.encode('utf-8'), salt.encode('utf-8'), 100000)
-        return password_hash.hex() == stored_hash
+        # 常数时间比较，避免按匹配前缀长度泄露时间信息
+        return hmac.compare_digest(password_hash.hex().encode('ascii'), stored_hash.encode('ascii'))
     except (ValueError, AttributeError):
         return False
 
@@ -75,6 +84,29 @@ class Permission(str, Enum):
     ADMIN = "admin"
     MANAGE_USERS = "manage:users"
 
+# 每个权限对应一个比特位；权限集合表示为掩码，检查权限只需一次按位与
+PermissionMask = IntFlag("PermissionMask", {p.name: 1 << i for i, p in enumerate(Permission)})
+PERMISSION_BITS: Dict[Permission, int] = {p: int(PermissionMask[p.name]) for p in Permission}
+# 同时挂在成员上（Permission.X.bit），热路径上省掉一次以枚举为键的字典查找（Enum 的 __hash__ 是 Python 实现）
+for _permission, _bit in PERMISSION_BITS.items():
+    _permission.bit = _bit
+_PERMISSION_BITS_BY_VALUE: Dict[str, int] = {p.value: bit for p, bit in PERMISSION_BITS.items()}
+
+def permission_mask(permissions: Iterable[Union[Permission, str]]) -> int:
+    """把权限列表（枚举或字符串值）转换为掩码，未知权限忽略"""
+    mask = 0
+    for p in permissions:
+        mask |= p.bit if isinstance(p, Permission) else _PERMISSION_BITS_BY_VALUE.get(p, 0)
+    return mask
+
+@lru_cache(maxsize=256)
+def _mask_for_values(values: tuple) -> int:
+    return permission_mask(values)
+
+def permission_mask_from_values(values: Iterable[str]) -> int:
+    """user_info["permissions"]（字符串列表）对应的掩码；相同的权限组合只计算一次"""
+    return _mask_for_values(tuple(values))
+
 class Role(str, Enum):
     """角色枚举"""
     ADMIN = "admin"
@@ -94,11 +126,18 @@ class User:
     is_active: bool = True
     created_at: datetime = None
     last_login: Optional[datetime] = None
+    permission_mask: int = field(default=0, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow()
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # 权限列表被替换时（创建、修改角色）同步重新计算掩码
+        if name == "permissions":
+            super().__setattr__("permission_mask", permission_mask(value or []))
+
 # 角色权限映射
 ROLE_PERMISSIONS = {
     Role.ADMIN: [
@@ -145,8 +184,38 @@ ROLE_PERMISSIONS = {
     ],
 }
 
-# 内存中的用户存储（生产环境应使用数据库）
-USERS_DB: Dict[str, User] = {}
+def role_permissions_fingerprint() -> tuple:
+    """ROLE_PERMISSIONS 当前内容的指纹，用于发现运行时对角色权限的修改"""
+    return tuple((role, tuple(perms)) for role, perms in ROLE_PERMISSIONS.items())
+
+# 每个角色的权限掩码；ROLE_PERMISSIONS 在运行时被修改后由 refresh_role_permission_masks() 原地重新计算
+ROLE_PERMISSION_MASKS: Dict[Role, int] = {}
+_role_masks_fingerprint: Optional[tuple] = None
+
+def refresh_role_permission_masks() -> bool:
+    """ROLE_PERMISSIONS 与上次计算时不同则重新计算 ROLE_PERMISSION_MASKS，返回是否有变化"""
+    global _role_masks_fingerprint
+    fingerprint = role_permissions_fingerprint()
+    if fingerprint == _role_masks_fingerprint:
+        return False
+    masks = {role: permission_mask(perms) for role, perms in ROLE_PERMISSIONS.items()}
+    # 先更新再删除，并发读取时不会看到空表
+    ROLE_PERMISSION_MASKS.update(masks)
+    for role in set(ROLE_PERMISSION_MASKS) - set(masks):
+        del ROLE_PERMISSION_MASKS[role]
+    _role_masks_fingerprint = fingerprint
+    return True
+
+def role_permission_mask(role: Role) -> int:
+    """角色当前的权限掩码（会先检查 ROLE_PERMISSIONS 是否被修改过）"""
+    refresh_role_permission_masks()
+    return ROLE_PERMISSION_MASKS.get(role, 0)
+
+refresh_role_permission_masks()
+
+# 用户存储（USER_STORE_BACKEND=memory | sqlite，见 user_store.py）
+# 进程级单例
+user_repository: UserRepository = create_user_repository()
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
@@ -180,7 +249,45 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
 
 def get_user(username: str) -> Optional[User]:
     """根据用户名获取用户"""
-    return USERS_DB.get(username)
+    return user_repository.get_by_username(username)
+
+def resolve_token(token: str) -> Optional[CachedToken]:
+    """验证令牌并解析用户；结果按令牌摘要缓存，缓存不会超过令牌的 exp"""
+    started = time.perf_counter()
+    with tracing.span("auth.resolve_token") as span:
+        key = token_digest(token)
+        entry = token_cache.get(key)
+        if entry is not None:
+            token_cache.record(True, time.perf_counter() - started)
+            set_span_attributes(span, cache_hit=True, user=entry.username)
+            return entry
+        payload = verify_token(token)
+        user = get_user(payload.get("sub")) if payload else None
+        if user is not None:
+            entry = token_cache.put(key, payload, user)
+        token_cache.record(False, time.perf_counter() - started)
+        set_span_attributes(span, cache_hit=False, user=user.username if user else None, valid=user is not None)
+        return entry
+
+def user_info_for_token(token: str) -> Optional[Dict[str, Any]]:
+    """返回 agent 使用的用户信息字典（与令牌一起缓存）"""
+    entry = resolve_token(token)
+    if entry is None:
+        return None
+    if entry.user_info is None:
+        user = entry.user
+        entry.user_info = {
+            "username": user.username,
+            "role": user.role.value,
+            "permissions": [p.value for p in user.permissions],
+            "user_id": user.id
+        }
+    # 返回副本，调用方修改不会影响缓存
+    return {**entry.user_info, "permissions": list(entry.user_info["permissions"])}
+
+def invalidate_user_tokens(username: str):
+    """用户被修改或删除后使其缓存的令牌失效"""
+    token_cache.invalidate_user(username)
 
 def authenticate_user(username: str, password: str) -> Optional[User]:
     """验证用户凭据"""
@@ -191,12 +298,28 @@ def authenticate_user(username: str, password: str) -> Optional[User]:
         return None
     return user
 
-def create_user(username: str, email: str, password: str, role: Role = Role.VIEWER) -> User:
-    """创建新用户"""
-    if username in USERS_DB:
+async def aauthenticate_user(username: str, password: str) -> Optional[User]:
+    """验证用户凭据（异步版本，密码校验在工作池中执行；池满时抛出 PasswordPoolSaturated）"""
+    user = await user_repository.aget_by_username(username)
+    if not user:
+        return None
+    if not await password_pool.run(verify_password, password, user.hashed_password):
+        return None
+    return user
+
+def create_user(
+    username: str,
+    email: str,
+    password: str,
+    role: Role = Role.VIEWER,
+    hashed_password: Optional[str] = None,
+) -> User:
+    """创建新用户（hashed_password 已在别处计算好时不再重复哈希）；用户名已存在时抛出 ValueError"""
+    if user_repository.get_by_username(username) is not None:
         raise ValueError("用户已存在")
     
-    hashed_password = get_password_hash(password)
+    if hashed_password is None:
+        hashed_password = get_password_hash(password)
     permissions = ROLE_PERMISSIONS.get(role, [])
     
     user = User(
@@ -208,7 +331,23 @@ def create_user(username: str, email: str, password: str, role: Role = Role.VIEW
         permissions=permissions
     )
     
-    USERS_DB[username] = user
+    user_repository.add(user)
+    return user
+
+async def acreate_user(username: str, email: str, password: str, role: Role = Role.VIEWER) -> User:
+    """创建新用户（异步版本，密码哈希在工作池中执行；池满时抛出 PasswordPoolSaturated）"""
+    if await user_repository.aget_by_username(username) is not None:
+        raise ValueError("用户已存在")
+    hashed_password = await password_pool.run(get_password_hash, password)
+    user = User(
+        id=username,  # 简化处理，使用用户名作为ID
+        username=username,
+        email=email,
+        hashed_password=hashed_password,
+        role=role,
+        permissions=ROLE_PERMISSIONS.get(role, [])
+    )
+    await user_repository.aadd(user)
     return user
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
@@ -220,24 +359,16 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     )
     
     token = credentials.credentials
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    username: str = payload.get("sub")
-    if username is None:
+    entry = resolve_token(token)
+    if entry is None:
         raise credentials_exception
     
-    user = get_user(username)
-    if user is None:
-        raise credentials_exception
-    
-    return user
+    return entry.user
 
 def require_permission(permission: Permission):
     """权限装饰器工厂"""
     def permission_checker(current_user: User = Depends(get_current_user)) -> User:
-        if permission not in current_user.permissions:
+        if not has_permission(current_user, permission):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"权限不足：需要 {permission} 权限"
@@ -258,7 +389,7 @@ def require_role(role: Role):
 
 def has_permission(user: User, permission: Permission) -> bool:
     """检查用户是否有特定权限"""
-    return permission in user.permissions
+    return bool(user.permission_mask & permission.bit)
 
 def has_role(user: User, role: Role) -> bool:
     """检查用户是否有特定角色"""
@@ -266,16 +397,21 @@ def has_role(user: User, role: Role) -> bool:
 
 # 初始化默认用户
 def init_default_users():
-    """初始化默认用户"""
-    if not USERS_DB:
-        # 创建管理员用户
-        create_user("admin", "admin@example.com", "admin123", Role.ADMIN)
-        # 创建编辑者用户
-        create_user("editor", "editor@example.com", "editor123", Role.EDITOR)
-        # 创建查看者用户
-        create_user("viewer", "viewer@example.com", "viewer123", Role.VIEWER)
-        # 创建访客用户
-        create_user("guest", "guest@example.com", "guest123", Role.GUEST)
+    """初始化默认用户（仅在存储为空时；持久化存储重启后不会重复创建）"""
+    if user_repository.count() == 0:
+        defaults = [
+            # 管理员、编辑者、查看者、访客
+            ("admin", "admin@example.com", "admin123", Role.ADMIN),
+            ("editor", "editor@example.com", "editor123", Role.EDITOR),
+            ("viewer", "viewer@example.com", "viewer123", Role.VIEWER),
+            ("guest", "guest@example.com", "guest123", Role.GUEST),
+        ]
+        for username, email, password, role in defaults:
+            try:
+                create_user(username, email, password, role)
+            except ValueError:
+                # 多个 worker 同时启动时可能已被其他进程创建
+                pass
 
 # 在模块加载时初始化默认用户
 init_default_users()
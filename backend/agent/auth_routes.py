@@ -3,21 +3,36 @@
 提供登录、注册、用户管理等功能
 """
 
-from datetime import timedelta
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 
 from auth import (
     User, Role, Permission,
-    authenticate_user, create_user, get_current_user,
+    aauthenticate_user, acreate_user, get_current_user,
     create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES,
-    require_permission, require_role
+    require_permission, require_role,
+    PasswordPoolSaturated, invalidate_user_tokens, user_repository,
 )
 
 router = APIRouter(prefix="/auth", tags=["认证"])
 
+# 用户列表默认页大小、单页上限和 NDJSON 导出（以及不分页的完整列表）每批读取的用户数
+DEFAULT_USERS_PAGE_SIZE = 100
+MAX_USERS_PAGE_SIZE = 1000
+USERS_STREAM_BATCH_SIZE = 500
+
+def password_pool_busy() -> HTTPException:
+    """密码哈希工作池已满时返回 503，提示客户端稍后重试"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="认证服务繁忙，请稍后重试",
+        headers={"Retry-After": "1"},
+    )
+
 class Token(BaseModel):
     """令牌响应模型"""
     access_token: str
@@ -42,6 +57,11 @@ class UserResponse(BaseModel):
     created_at: str
     last_login: Optional[str] = None
 
+class UserPage(BaseModel):
+    """用户分页响应模型"""
+    items: list[UserResponse]
+    next_cursor: Optional[str] = None
+
 class UserUpdate(BaseModel):
     """用户更新模型"""
     email: Optional[EmailStr] = None
@@ -51,7 +71,10 @@ class UserUpdate(BaseModel):
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """用户登录"""
-    user = authenticate_user(form_data.username, form_data.password)
+    try:
+        user = await aauthenticate_user(form_data.username, form_data.password)
+    except PasswordPoolSaturated:
+        raise password_pool_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,7 +94,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     )
     
     # 更新最后登录时间
-    user.last_login = user.created_at  # 简化处理
+    user.last_login = datetime.utcnow()
+    await user_repository.aupdate(user)
     
     return {
         "access_token": access_token,
@@ -83,7 +107,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 async def register(user_data: UserCreate):
     """用户注册"""
     try:
-        user = create_user(
+        user = await acreate_user(
             username=user_data.username,
             email=user_data.email,
             password=user_data.password,
@@ -99,6 +123,8 @@ async def register(user_data: UserCreate):
             created_at=user.created_at.isoformat(),
             last_login=user.last_login.isoformat() if user.last_login else None
         )
+    except PasswordPoolSaturated:
+        raise password_pool_busy()
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -119,23 +145,59 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         last_login=current_user.last_login.isoformat() if current_user.last_login else None
     )
 
-@router.get("/users", response_model=list[UserResponse])
-async def list_users(current_user: User = Depends(require_permission(Permission.MANAGE_USERS))):
-    """获取用户列表（仅管理员）"""
-    from auth import USERS_DB
-    return [
-        UserResponse(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            role=user.role,
-            permissions=user.permissions,
-            is_active=user.is_active,
-            created_at=user.created_at.isoformat(),
-            last_login=user.last_login.isoformat() if user.last_login else None
-        )
-        for user in USERS_DB.values()
-    ]
+def user_response(user: User) -> UserResponse:
+    """User -> UserResponse"""
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        role=user.role,
+        permissions=user.permissions,
+        is_active=user.is_active,
+        created_at=user.created_at.isoformat(),
+        last_login=user.last_login.isoformat() if user.last_login else None
+    )
+
+@router.get("/users", response_model=Union[list[UserResponse], UserPage])
+async def list_users(
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_USERS_PAGE_SIZE),
+    role: Optional[Role] = None,
+    is_active: Optional[bool] = None,
+    current_user: User = Depends(require_permission(Permission.MANAGE_USERS))
+):
+    """
+    获取用户列表（仅管理员），按 id 排序
+
+    默认返回完整列表（与原接口相同）；传入 cursor 或 limit 时返回 UserPage，用 next_cursor 获取下一页
+    """
+    if cursor is None and limit is None:
+        return [
+            user_response(user)
+            async for page in user_repository.aiter_pages(role, is_active, None, USERS_STREAM_BATCH_SIZE)
+            for user in page
+        ]
+    limit = limit or DEFAULT_USERS_PAGE_SIZE
+    # 多取一条判断是否还有下一页
+    users = await user_repository.alist_page(cursor, limit + 1, role, is_active)
+    return UserPage(
+        items=[user_response(user) for user in users[:limit]],
+        next_cursor=users[limit - 1].id if len(users) > limit else None,
+    )
+
+@router.get("/users/stream")
+async def stream_users(
+    cursor: Optional[str] = Query(None, description="从该 id 之后开始"),
+    role: Optional[Role] = None,
+    is_active: Optional[bool] = None,
+    current_user: User = Depends(require_permission(Permission.MANAGE_USERS))
+):
+    """以 NDJSON 流式导出用户（仅管理员），每行一个用户，按批读取不在内存中拼出完整列表"""
+    async def lines():
+        async for page in user_repository.aiter_pages(role, is_active, cursor, USERS_STREAM_BATCH_SIZE):
+            yield "".join(user_response(user).model_dump_json() + "\n" for user in page)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -144,16 +206,13 @@ async def update_user(
     current_user: User = Depends(require_permission(Permission.MANAGE_USERS))
 ):
     """更新用户信息（仅管理员）"""
-    from auth import USERS_DB
-    
-    if user_id not in USERS_DB:
+    user = await user_repository.aget_by_id(user_id)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
     
-    user = USERS_DB[user_id]
-    
     # 更新用户信息
     if user_update.email is not None:
         user.email = user_update.email
@@ -164,6 +223,8 @@ async def update_user(
         user.permissions = ROLE_PERMISSIONS.get(user_update.role, [])
     if user_update.is_active is not None:
         user.is_active = user_update.is_active
+    await user_repository.aupdate(user)
+    invalidate_user_tokens(user_id)
     
     return UserResponse(
         id=user.id,
@@ -182,9 +243,7 @@ async def delete_user(
     current_user: User = Depends(require_permission(Permission.MANAGE_USERS))
 ):
     """删除用户（仅管理员）"""
-    from auth import USERS_DB
-    
-    if user_id not in USERS_DB:
+    if await user_repository.aget_by_id(user_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
@@ -196,7 +255,8 @@ async def delete_user(
             detail="不能删除自己的账户"
         )
     
-    del USERS_DB[user_id]
+    await user_repository.adelete(user_id)
+    invalidate_user_tokens(user_id)
     return {"message": "用户删除成功"}
 
 @router.get("/permissions", response_model=list[str])
@@ -10,6 +10,9 @@ from langchain_core.tools import BaseTool
 from fastapi import HTTPException, status
 from auth import User, Permission, has_permission
 from agent import graph as original_graph
+from structured_logging import get_logger
+
+logger = get_logger("authenticated_agent")
 
 
 class AuthenticatedLangGraphAgent:
@@ -30,20 +33,12 @@ class AuthenticatedLangGraphAgent:
         # 根据用户权限过滤可用的工具
         self.filtered_tools = self._filter_tools_by_permissions()
         
-    def _filter_tools_by_permissions(self) -> List[BaseTool]:
+    def _filter_tools_by_permissions(self) -> List[str]:
         """根据用户权限过滤可用的工具"""
-        from permission_agent import PermissionAwareAgent
-        
-        permission_agent = PermissionAwareAgent(self.original_graph)
-        available_tools = []
-        
-        for tool_name, permission in permission_agent.permission_tool_mapping.items():
-            if has_permission(self.user, permission):
-                # 这里需要根据实际的工具获取方式来获取工具对象
-                # 暂时返回工具名称，实际实现需要获取工具对象
-                available_tools.append(tool_name)
+        from tool_permissions import tool_permission_index
         
-        return available_tools
+        # 暂时返回工具名称，实际实现需要获取工具对象
+        return list(tool_permission_index.tools_for_user(self.user))
     
     def _check_permissions(self):
         """检查用户是否有必要的权限"""
@@ -86,17 +81,16 @@ class AuthenticatedLangGraphAgent:
     
     def _log_user_action(self, input_data: Dict[str, Any]):
         """记录用户操作日志"""
-        print(f"[AUTH_AGENT] User {self.user.username} (role: {self.user.role.value}) "
-              f"invoking agent with permissions: {[p.value for p in self.user.permissions]}")
-        print(f"[AUTH_AGENT] Input data keys: {list(input_data.keys())}")
+        logger.info("agent.invoke", username=self.user.username, role=self.user.role.value)
+        logger.debug("agent.invoke.input", username=self.user.username, keys=list(input_data.keys()))
     
     def _log_success_action(self, input_data: Dict[str, Any], result: Dict[str, Any]):
         """记录成功操作日志"""
-        print(f"[AUTH_AGENT] Success: User {self.user.username} completed agent invocation")
+        logger.info("agent.invoke.ok", username=self.user.username)
     
     def _log_error_action(self, input_data: Dict[str, Any], error: Exception):
         """记录错误操作日志"""
-        print(f"[AUTH_AGENT] Error: User {self.user.username} failed agent invocation: {str(error)}")
+        logger.error("agent.invoke.error", username=self.user.username, error=str(error))
     
     def get_available_tools(self) -> List[str]:
         """获取用户可用的工具列表"""
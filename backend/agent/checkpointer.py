@@ -0,0 +1,476 @@
+"""
+检查点保存器配置
+通过 CHECKPOINTER_BACKEND 选择 memory / sqlite / postgres，并按线程保留最近 N 个检查点
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from metrics import CHECKPOINT_WRITE_BYTES
+from tracing import set_span_attributes, tracing
+
+
+@dataclass(frozen=True)
+class CheckpointerSettings:
+    """检查点保存器配置"""
+    backend: str = "memory"  # memory | sqlite | postgres
+    sqlite_path: str = "checkpoints.sqlite"
+    postgres_url: str = ""
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    keep_last: int = 0  # 每个线程保留的检查点数，0 表示不清理（memory 后端默认 50）
+    prune_every: int = 10  # 每个线程每写入 N 个检查点批量清理一次
+    max_threads: int = 1000  # memory 后端最多保留的线程数，超出时淘汰最久未使用的线程
+
+
+def load_checkpointer_settings() -> CheckpointerSettings:
+    """从环境变量读取检查点保存器配置"""
+    return CheckpointerSettings(
+        backend=os.getenv("CHECKPOINTER_BACKEND", "memory").lower(),
+        sqlite_path=os.getenv("CHECKPOINTER_SQLITE_PATH", "checkpoints.sqlite"),
+        postgres_url=os.getenv("CHECKPOINTER_POSTGRES_URL", ""),
+        pool_min_size=int(os.getenv("CHECKPOINTER_POOL_MIN_SIZE", "1")),
+        pool_max_size=int(os.getenv("CHECKPOINTER_POOL_MAX_SIZE", "10")),
+        keep_last=int(os.getenv("CHECKPOINTER_KEEP_LAST", "0")),
+        prune_every=max(1, int(os.getenv("CHECKPOINTER_PRUNE_EVERY", "10"))),
+        max_threads=max(1, int(os.getenv("CHECKPOINTER_MAX_THREADS", "1000"))),
+    )
+
+
+# memory 后端未配置 CHECKPOINTER_KEEP_LAST 时每个线程保留的检查点数
+DEFAULT_MEMORY_KEEP_LAST = 50
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    有界的内存检查点保存器
+
+    限制线程总数（按最近使用淘汰整个线程）和每个线程的检查点数（淘汰最旧的检查点），
+    并维护按线程的键索引，淘汰时不需要扫描全部 writes/blobs/通道版本。
+    """
+
+    def __init__(self, max_threads: int = 1000, max_checkpoints_per_thread: int = DEFAULT_MEMORY_KEEP_LAST, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._thread_writes: Dict[str, set] = {}
+        self._thread_blobs: Dict[str, set] = {}
+        # (thread ID, checkpoint NS, checkpoint ID) -> channel_versions，用于判断哪些 blob 仍被引用
+        self._versions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._thread_versions: Dict[str, set] = {}
+        self._lock = threading.RLock()
+        self.evicted_threads = 0
+        self.trimmed_checkpoints = 0
+
+    def _touch(self, thread_id: str):
+        self._lru[thread_id] = None
+        self._lru.move_to_end(thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._lock:
+            result = super().get_tuple(config)
+            if thread_id in self._lru:
+                self._touch(thread_id)
+            elif not any(self.storage.get(thread_id, {}).values()):
+                # MemorySaver 的 defaultdict 在读取未知线程时会留下空条目
+                self.storage.pop(thread_id, None)
+            return result
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._thread_blobs.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()
+            )
+            version_key = (thread_id, checkpoint_ns, checkpoint["id"])
+            self._versions[version_key] = dict(checkpoint["channel_versions"])
+            self._thread_versions.setdefault(thread_id, set()).add(version_key)
+            self._touch(thread_id)
+            self._trim_thread(thread_id, checkpoint_ns)
+            while len(self._lru) > self.max_threads:
+                oldest = next(iter(self._lru))
+                self.delete_thread(oldest)
+                self.evicted_threads += 1
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._thread_writes.setdefault(thread_id, set()).add((thread_id, checkpoint_ns, checkpoint_id))
+
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        excess = len(checkpoints) - self.max_checkpoints_per_thread
+        if excess <= 0:
+            return
+        # 检查点 ID 按时间有序，最旧的排在前面
+        for checkpoint_id in sorted(checkpoints.keys())[:excess]:
+            del checkpoints[checkpoint_id]
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(key, None)
+            self._thread_writes.get(thread_id, set()).discard(key)
+            self._versions.pop(key, None)
+            self._thread_versions.get(thread_id, set()).discard(key)
+            self.trimmed_checkpoints += 1
+        referenced = {
+            (thread_id, checkpoint_ns, channel, version)
+            for checkpoint_id in checkpoints
+            for channel, version in self._versions.get((thread_id, checkpoint_ns, checkpoint_id), {}).items()
+        }
+        blob_keys = self._thread_blobs.get(thread_id, set())
+        for key in [k for k in blob_keys if k[1] == checkpoint_ns and k not in referenced]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in self._thread_writes.pop(thread_id, set()):
+                self.writes.pop(key, None)
+            for key in self._thread_blobs.pop(thread_id, set()):
+                self.blobs.pop(key, None)
+            for key in self._thread_versions.pop(thread_id, set()):
+                self._versions.pop(key, None)
+            self._lru.pop(thread_id, None)
+
+    def approx_bytes(self) -> int:
+        """序列化后的检查点、元数据、写入记录和通道值的字节数之和（近似值）"""
+        with self._lock:
+            total = sum(len(v[1]) for v in self.blobs.values())
+            for namespaces in self.storage.values():
+                for checkpoints in namespaces.values():
+                    for checkpoint, metadata, _ in checkpoints.values():
+                        total += len(checkpoint[1]) + len(metadata[1])
+            for writes in self.writes.values():
+                for _, _, value, _ in writes.values():
+                    total += len(value[1])
+            return total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checkpoints = sum(len(c) for ns in self.storage.values() for c in ns.values())
+            return {
+                "live_threads": len(self._lru),
+                "max_threads": self.max_threads,
+                "checkpoints": checkpoints,
+                "max_checkpoints_per_thread": self.max_checkpoints_per_thread,
+                "evicted_threads": self.evicted_threads,
+                "trimmed_checkpoints": self.trimmed_checkpoints,
+                "approx_bytes": self.approx_bytes(),
+            }
+
+
+# 当前写入累计的序列化字节数；只在 ManagedCheckpointer 的写方法内设置
+_write_bytes: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("checkpoint_write_bytes", default=None)
+
+
+class MeasuringSerializer:
+    """包装保存器的序列化器，把 dumps_typed 的输出长度累加到当前写入上（不额外序列化）"""
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        acc = _write_bytes.get()
+        if acc is not None:
+            acc[0] += len(data)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return self.inner.loads_typed(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+
+def _thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+class _MeasureWrite:
+    """统计一次 put / put_writes 序列化的字节数并写入 canvas_checkpoint_write_bytes"""
+
+    __slots__ = ("kind", "acc", "token")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def __enter__(self) -> List[int]:
+        self.acc = [0]
+        self.token = _write_bytes.set(self.acc)
+        return self.acc
+
+    def __exit__(self, *exc):
+        _write_bytes.reset(self.token)
+        CHECKPOINT_WRITE_BYTES.observe(self.acc[0], kind=self.kind)
+
+
+class ManagedCheckpointer(BaseCheckpointSaver):
+    """
+    委托式检查点保存器
+
+    graph 在导入时编译，而 sqlite/postgres 的异步保存器必须在事件循环内创建，
+    因此真正的保存器在第一次使用（或 FastAPI 启动）时才创建。写入后按线程批量清理旧检查点。
+    """
+
+    def __init__(self, settings: Optional[CheckpointerSettings] = None):
+        super().__init__()
+        self.settings = settings or load_checkpointer_settings()
+        if self.settings.backend not in ("memory", "sqlite", "postgres"):
+            raise ValueError(f"不支持的检查点后端: {self.settings.backend}")
+        self._saver: Optional[BaseCheckpointSaver] = None
+        self._resource: Any = None  # aiosqlite 连接或 psycopg 连接池
+        self._init_lock: Optional[asyncio.Lock] = None
+        self._puts_since_prune: Dict[Tuple[str, str], int] = {}
+        if self.settings.backend == "memory":
+            self._saver = BoundedMemorySaver(
+                max_threads=self.settings.max_threads,
+                max_checkpoints_per_thread=self.settings.keep_last or DEFAULT_MEMORY_KEEP_LAST,
+            )
+            self._saver.serde = MeasuringSerializer(self._saver.serde)
+        self.serde = self._saver.serde if self._saver is not None else self.serde
+
+    # ---- 生命周期 ----
+
+    async def setup(self) -> BaseCheckpointSaver:
+        """创建并初始化底层保存器（幂等）"""
+        if self._saver is not None:
+            return self._saver
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if self._saver is None:
+                if self.settings.backend == "sqlite":
+                    self._saver = await self._create_sqlite_saver()
+                else:
+                    self._saver = await self._create_postgres_saver()
+                self._saver.serde = MeasuringSerializer(self._saver.serde)
+                self.serde = self._saver.serde
+        return self._saver
+
+    async def _create_sqlite_saver(self) -> BaseCheckpointSaver:
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise RuntimeError(
+                "CHECKPOINTER_BACKEND=sqlite 需要安装 langgraph-checkpoint-sqlite"
+            ) from e
+        conn = await aiosqlite.connect(self.settings.sqlite_path)
+        # WAL 下 synchronous=NORMAL 是安全的，每次提交少一次 fsync
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        self._resource = conn
+        return saver
+
+    async def _create_postgres_saver(self) -> BaseCheckpointSaver:
+        try:
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError as e:
+            raise RuntimeError(
+                "CHECKPOINTER_BACKEND=postgres 需要安装 langgraph-checkpoint-postgres 和 psycopg[binary,pool]"
+            ) from e
+        if not self.settings.postgres_url:
+            raise RuntimeError("CHECKPOINTER_BACKEND=postgres 需要设置 CHECKPOINTER_POSTGRES_URL")
+        pool = AsyncConnectionPool(
+            conninfo=self.settings.postgres_url,
+            min_size=self.settings.pool_min_size,
+            max_size=self.settings.pool_max_size,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False,
+        )
+        await pool.open()
+        saver = AsyncPostgresSaver(pool)
+        await saver.setup()
+        self._resource = pool
+        return saver
+
+    async def aclose(self):
+        """关闭数据库连接或连接池（FastAPI shutdown 时调用）"""
+        resource, self._resource = self._resource, None
+        if resource is not None:
+            await resource.close()
+            self._saver = None
+
+    # ---- 保留策略 ----
+
+    async def _maybe_prune(self, config: RunnableConfig):
+        keep_last = self.settings.keep_last
+        if keep_last <= 0 or self.settings.backend == "memory":
+            # memory 后端由 BoundedMemorySaver 在写入时自行裁剪
+            return
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = (thread_id, checkpoint_ns)
+        count = self._puts_since_prune.get(key, 0) + 1
+        if count < self.settings.prune_every:
+            self._puts_since_prune[key] = count
+            return
+        self._puts_since_prune.pop(key, None)
+        await self.prune_thread(thread_id, checkpoint_ns, keep_last)
+
+    async def prune_thread(self, thread_id: str, checkpoint_ns: str, keep_last: int):
+        """删除该线程中除最近 keep_last 个以外的检查点及其写入记录"""
+        saver = await self.setup()
+        if self.settings.backend == "sqlite":
+            params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, keep_last)
+            keep = (
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT ?"
+            )
+            async with saver.lock:
+                await saver.conn.execute(
+                    f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ({keep})",
+                    params,
+                )
+                await saver.conn.execute(
+                    f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ({keep})",
+                    params,
+                )
+                await saver.conn.commit()
+        elif self.settings.backend == "postgres":
+            params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, keep_last)
+            keep = (
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = %s "
+                "ORDER BY checkpoint_id DESC LIMIT %s"
+            )
+            async with self._resource.connection() as conn, conn.transaction():
+                await conn.execute(
+                    f"DELETE FROM checkpoint_writes WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id NOT IN ({keep})",
+                    params,
+                )
+                await conn.execute(
+                    f"DELETE FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id NOT IN ({keep})",
+                    params,
+                )
+                # 通道值按版本存放，只删除不再被保留检查点引用的版本
+                await conn.execute(
+                    "DELETE FROM checkpoint_blobs b WHERE b.thread_id = %s AND b.checkpoint_ns = %s AND NOT EXISTS ("
+                    "SELECT 1 FROM checkpoints c WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns "
+                    "AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)",
+                    (thread_id, checkpoint_ns),
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": self.settings.backend,
+            "initialized": self._saver is not None,
+            "keep_last": self.settings.keep_last,
+            "prune_every": self.settings.prune_every,
+        }
+        if isinstance(self._saver, BoundedMemorySaver):
+            stats.update(self._saver.stats())
+        return stats
+
+    # ---- 委托给底层保存器 ----
+
+    @property
+    def config_specs(self) -> list:
+        return self._saver.config_specs if self._saver is not None else super().config_specs
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if self._saver is not None:
+            return self._saver.get_next_version(current, channel)
+        return MemorySaver.get_next_version(self, current, channel)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._require_sync().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        return self._require_sync().list(config, **kwargs)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with _MeasureWrite("checkpoint"):
+            return self._require_sync().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with _MeasureWrite("writes"):
+            return self._require_sync().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        return self._require_sync().delete_thread(thread_id)
+
+    def _require_sync(self) -> BaseCheckpointSaver:
+        if self._saver is None:
+            raise RuntimeError(f"{self.settings.backend} 检查点后端只支持异步调用（ainvoke/astream）")
+        return self._saver
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        saver = await self.setup()
+        with tracing.span("checkpoint.get", thread_id=_thread_id(config)) as span:
+            result = await saver.aget_tuple(config)
+            set_span_attributes(span, found=result is not None)
+        return result
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        saver = await self.setup()
+        async for item in saver.alist(config, **kwargs):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saver = await self.setup()
+        with tracing.span("checkpoint.put", thread_id=_thread_id(config)) as span, _MeasureWrite("checkpoint") as written:
+            next_config = await saver.aput(config, checkpoint, metadata, new_versions)
+            set_span_attributes(span, bytes=written[0])
+        await self._maybe_prune(config)
+        return next_config
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        saver = await self.setup()
+        with tracing.span("checkpoint.put_writes", thread_id=_thread_id(config), writes=len(writes)) as span, _MeasureWrite("writes") as written:
+            await saver.aput_writes(config, writes, task_id, task_path)
+            set_span_attributes(span, bytes=written[0])
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        saver = await self.setup()
+        await saver.adelete_thread(thread_id)
+        self._puts_since_prune = {k: v for k, v in self._puts_since_prune.items() if k[0] != thread_id}
+
+
+# 进程级单例（agent.py 编译 graph 时使用）
+checkpointer = ManagedCheckpointer()
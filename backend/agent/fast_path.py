@@ -0,0 +1,356 @@
+"""
+只读查询快速路径
+"画布标题是什么"、"列出我的图表"、"指标 X 的值是多少" 这类问题的答案就在共享状态里（items、globalTitle 等），
+开启 FAST_PATH_ENABLED 后在 chat_node 之前按规则识别意图、用按 id / 名称 / 类型 / 指标标签建立的索引直接回答，
+不调用 LLM。置信度低于 FAST_PATH_MIN_CONFIDENCE、含修改意图或无法识别时交给 LLM
+"""
+
+import difflib
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from metrics import metrics
+
+FAST_PATH_QUERIES = metrics.counter(
+    "canvas_fast_path_queries_total", "Read-only queries seen by the fast path, by intent and outcome", ["intent", "outcome"]
+)
+
+# 复数 / 同义词 -> 条目类型；None 表示所有类型
+TYPE_WORDS: Dict[str, Optional[str]] = {
+    "chart": "chart", "charts": "chart",
+    "note": "note", "notes": "note",
+    "project": "project", "projects": "project",
+    "entity": "entity", "entities": "entity",
+    "item": None, "items": None, "card": None, "cards": None,
+}
+TYPE_PATTERN = "|".join(sorted(TYPE_WORDS, key=len, reverse=True))
+
+# 出现这些词时可能是修改请求，直接交给 LLM
+MUTATION_PATTERN = re.compile(
+    r"\b(set|change|rename|update|add|create|make|delete|remove|clear|fill|append|edit|write|move|plan|generate|random|"
+    r"mark|assign|replace|reset|undo|fix|put|insert|toggle|check|uncheck)\b"
+)
+
+# 问句中可以按字段名回答的条目字段：字段名 -> {类型: 取值函数}
+ITEM_FIELDS = {
+    "subtitle": {t: (lambda i: i.get("subtitle", "")) for t in ("project", "entity", "note", "chart")},
+    "description": {
+        "project": lambda i: i.get("subtitle", ""),
+        "entity": lambda i: i.get("subtitle", ""),
+        "chart": lambda i: i.get("subtitle", ""),
+        "note": lambda i: _data(i).get("field1", ""),
+    },
+    "content": {"note": lambda i: _data(i).get("field1", "")},
+    "text": {"note": lambda i: _data(i).get("field1", "")},
+    "date": {"project": lambda i: _data(i).get("field3", "")},
+    "due date": {"project": lambda i: _data(i).get("field3", "")},
+    "checklist": {"project": lambda i: [c.get("text", "") for c in _data(i).get("field4", []) or [] if isinstance(c, dict)]},
+    "tags": {"entity": lambda i: list(_data(i).get("field3", []) or [])},
+    "metrics": {"chart": lambda i: [f"{m.get('label', '')}: {_percent(m.get('value'))}" for m in _data(i).get("field1", []) or [] if isinstance(m, dict)]},
+}
+FIELD_PATTERN = "|".join(sorted(ITEM_FIELDS, key=len, reverse=True))
+
+_ARTICLE = r"(?:the |my |our )?"
+RULES: Sequence[Tuple[str, "re.Pattern[str]"]] = (
+    ("global_title", re.compile(rf"^(?:what is|show me|tell me) {_ARTICLE}(?:canvas |board |global |page )?(?:title|name)(?: of {_ARTICLE}(?:canvas|board))?$")),
+    ("global_description", re.compile(rf"^(?:what is|show me|tell me) {_ARTICLE}(?:canvas |board |global |page )?description(?: of {_ARTICLE}(?:canvas|board))?$")),
+    ("count_items", re.compile(rf"^how many (?P<type>{TYPE_PATTERN})(?: are there| do (?:i|we) have| (?:are )?on {_ARTICLE}(?:canvas|board)| exist)?$")),
+    ("list_items", re.compile(
+        rf"^(?:(?:list|show)(?: me)?(?: all)? {_ARTICLE}(?P<type>{TYPE_PATTERN})"
+        rf"|(?:what|which) (?P<type2>{TYPE_PATTERN}) (?:do (?:i|we) have|are there|exist|are on {_ARTICLE}(?:canvas|board)))$"
+    )),
+    ("metric_value", re.compile(
+        rf"^what is {_ARTICLE}(?:value|percentage|score) (?:of|for) {_ARTICLE}(?:metric )?(?P<metric>.+?)"
+        rf"(?: (?:in|on|of) {_ARTICLE}(?:chart )?(?P<item>.+))?$"
+    )),
+    ("item_field", re.compile(rf"^what (?:is|are) {_ARTICLE}(?P<field>{FIELD_PATTERN}) (?:of|for|on) {_ARTICLE}(?P<item>.+)$")),
+)
+
+
+@dataclass(frozen=True)
+class FastPathSettings:
+    """快速路径配置"""
+    enabled: bool = False
+    min_confidence: float = 0.8
+
+
+def load_fast_path_settings() -> FastPathSettings:
+    """从环境变量读取快速路径配置（每次调用都重新读取，修改 .env 后无需重建 graph）"""
+    return FastPathSettings(
+        enabled=os.getenv("FAST_PATH_ENABLED", "false").lower() in ("1", "true", "yes", "on"),
+        min_confidence=min(1.0, max(0.0, float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8")))),
+    )
+
+
+@dataclass(frozen=True)
+class FastPathAnswer:
+    """快速路径的回答"""
+    intent: str
+    text: str
+    confidence: float
+
+
+def _data(item: Dict[str, Any]) -> Dict[str, Any]:
+    data = item.get("data")
+    return data if isinstance(data, dict) else {}
+
+
+def _percent(value: Any) -> str:
+    return "no value" if value in ("", None) else f"{value}%"
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().strip()
+    text = re.sub(r"\b(what|who|where|how)'s\b", r"\1 is", text)
+    text = re.sub(r"^(?:(?:hey|hi|ok|okay|so),?\s+)?(?:please\s+|can you\s+|could you\s+)?", "", text)
+    text = re.sub(r"[?.!\s]+$", "", text)
+    text = re.sub(r"\s*\bplease\b$", "", text)
+    return re.sub(r"\s+", " ", text)
+
+
+_QUOTES = str.maketrans("", "", "\"'`“”‘’")
+
+
+def _name_key(text: str) -> str:
+    return text.lower().translate(_QUOTES).strip()
+
+
+def _plural(count: int, word: str) -> str:
+    if count == 1:
+        return f"{count} {word}"
+    return f"{count} {'entities' if word == 'entity' else word + 's'}"
+
+
+def _label(item: Dict[str, Any]) -> str:
+    return f"\"{item.get('name', '')}\" (id={item.get('id', '')})"
+
+
+class CanvasIndex:
+    """按 id、名称、类型和图表指标标签索引画布条目；各索引在第一次用到时才建立"""
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = [i for i in items if isinstance(i, dict)]
+
+    @cached_property
+    def by_id(self) -> Dict[str, Dict[str, Any]]:
+        return {str(item.get("id", "")).lower(): item for item in self.items}
+
+    @cached_property
+    def by_name(self) -> Dict[str, List[Dict[str, Any]]]:
+        table: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for item in self.items:
+            table[_name_key(str(item.get("name", "")))].append(item)
+        return table
+
+    @cached_property
+    def by_type(self) -> Dict[str, List[Dict[str, Any]]]:
+        table: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for item in self.items:
+            table[str(item.get("type", ""))].append(item)
+        return table
+
+    @cached_property
+    def metrics(self) -> Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """指标标签 -> [(所属图表, 指标)]"""
+        table: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = defaultdict(list)
+        for item in self.by_type.get("chart", []):
+            for metric in _data(item).get("field1", []) or []:
+                if isinstance(metric, dict):
+                    table[_name_key(str(metric.get("label", "")))].append((item, metric))
+        return table
+
+    @staticmethod
+    def _resolve(phrase: str, table: Dict[str, List[Any]]) -> Tuple[Optional[Any], float]:
+        """精确匹配 1.0；唯一的包含匹配 0.9；否则取相似度最高且唯一的候选，置信度为相似度 x 0.9"""
+        key = _name_key(phrase)
+        if not key:
+            return None, 0.0
+        exact = table.get(key)
+        if exact:
+            return (exact[0], 1.0) if len(exact) == 1 else (None, 0.0)
+        contains = [k for k in table if k and (key in k or k in key)]
+        if len(contains) == 1 and len(table[contains[0]]) == 1:
+            return table[contains[0]][0], 0.9
+        # get_close_matches 先用 quick_ratio 过滤，只对少数候选计算完整相似度
+        close = difflib.get_close_matches(key, [k for k in table if k], n=2, cutoff=0.6)
+        scored = [(difflib.SequenceMatcher(None, key, k).ratio(), k) for k in close]
+        if not scored or len(table[scored[0][1]]) != 1:
+            return None, 0.0
+        if len(scored) > 1 and scored[1][0] == scored[0][0]:
+            return None, 0.0
+        # 近似匹配（拼写错误等）打折，默认阈值下需要相似度约 0.9 以上
+        return table[scored[0][1]][0], scored[0][0] * 0.9
+
+    def find_item(self, phrase: str, item_type: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """按 id 或名称查找条目，返回 (条目, 置信度)"""
+        phrase = phrase.strip()
+        # "project Launch" / "item 0003"：类型词可能是名称的一部分，也可能只是修饰
+        stripped = re.sub(rf"^(?:{TYPE_PATTERN}) ", "", phrase)
+        for candidate in (phrase, stripped):
+            by_id = self.by_id.get(re.sub(r"^(?:id\s*=?\s*)", "", candidate).lower())
+            if by_id is not None and (item_type is None or by_id.get("type") == item_type):
+                return by_id, 1.0
+        table = self.by_name
+        if item_type is not None:
+            table = {k: [i for i in v if i.get("type") == item_type] for k, v in self.by_name.items()}
+            table = {k: v for k, v in table.items() if v}
+        for candidate in (phrase, stripped):
+            exact = table.get(_name_key(candidate))
+            if exact:
+                return (exact[0], 1.0) if len(exact) == 1 else (None, 0.0)
+        return self._resolve(stripped, table)
+
+    def find_metric(self, phrase: str, chart: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Tuple[Dict[str, Any], Dict[str, Any]]], float]:
+        """按标签查找图表指标，可限定在某个图表内"""
+        table = self.metrics
+        if chart is not None:
+            table = {k: [(c, m) for c, m in v if c is chart] for k, v in self.metrics.items()}
+            table = {k: v for k, v in table.items() if v}
+        return self._resolve(phrase, table)
+
+
+class FastPathStats:
+    """快速路径命中统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.answered = 0
+        self.low_confidence = 0
+        self.unresolved = 0
+        self.no_match = 0
+        self.by_intent: Dict[str, int] = defaultdict(int)
+
+    def record(self, intent: str, outcome: str):
+        FAST_PATH_QUERIES.inc(intent=intent, outcome=outcome)
+        with self._lock:
+            self.queries += 1
+            if outcome == "answered":
+                self.answered += 1
+                self.by_intent[intent] += 1
+            elif outcome == "low_confidence":
+                self.low_confidence += 1
+            elif outcome == "unresolved":
+                self.unresolved += 1
+            else:
+                self.no_match += 1
+
+    def stats(self) -> Dict[str, Any]:
+        settings = load_fast_path_settings()
+        return {
+            "enabled": settings.enabled,
+            "min_confidence": settings.min_confidence,
+            "queries": self.queries,
+            "answered": self.answered,
+            "low_confidence": self.low_confidence,
+            "unresolved": self.unresolved,
+            "no_match": self.no_match,
+            "hit_rate": (self.answered / self.queries) if self.queries else 0.0,
+            "answered_by_intent": dict(self.by_intent),
+        }
+
+
+class CanvasQueryEngine:
+    """规则识别意图 + 索引查找；answer() 返回 None 时交给 LLM"""
+
+    def __init__(self, stats: Optional[FastPathStats] = None):
+        self.stats = stats or FastPathStats()
+
+    def classify(self, text: str) -> Tuple[Optional[str], Optional["re.Match[str]"]]:
+        query = _normalize(text)
+        if not query or MUTATION_PATTERN.search(query):
+            return None, None
+        for intent, pattern in RULES:
+            match = pattern.match(query)
+            if match:
+                return intent, match
+        return None, None
+
+    def answer(self, state: Dict[str, Any], text: str, min_confidence: Optional[float] = None) -> Optional[FastPathAnswer]:
+        """尝试直接从状态回答；不确定时返回 None 并记录原因"""
+        if min_confidence is None:
+            min_confidence = load_fast_path_settings().min_confidence
+        intent, match = self.classify(text)
+        if intent is None:
+            self.stats.record("none", "no_match")
+            return None
+        result = getattr(self, f"_answer_{intent}")(state, match)
+        if result is None:
+            # 意图识别出来了，但条目/指标不存在、有歧义，或该类型没有这个字段
+            self.stats.record(intent, "unresolved")
+            return None
+        reply, confidence = result
+        if confidence < min_confidence:
+            self.stats.record(intent, "low_confidence")
+            return None
+        self.stats.record(intent, "answered")
+        return FastPathAnswer(intent=intent, text=reply, confidence=confidence)
+
+    def _answer_global_title(self, state, match):
+        title = state.get("globalTitle") or ""
+        return (f"The canvas title is \"{title}\"." if title else "The canvas has no title yet."), 1.0
+
+    def _answer_global_description(self, state, match):
+        description = state.get("globalDescription") or ""
+        return (f"The canvas description is \"{description}\"." if description else "The canvas has no description yet."), 1.0
+
+    def _items_of_type(self, state, match) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        word = match.groupdict().get("type") or match.groupdict().get("type2")
+        item_type = TYPE_WORDS[word]
+        index = CanvasIndex(state.get("items") or [])
+        return item_type, (index.by_type.get(item_type, []) if item_type else index.items)
+
+    def _answer_count_items(self, state, match):
+        item_type, items = self._items_of_type(state, match)
+        return f"There {'is' if len(items) == 1 else 'are'} {_plural(len(items), item_type or 'item')} on the canvas.", 1.0
+
+    def _answer_list_items(self, state, match):
+        item_type, items = self._items_of_type(state, match)
+        word = item_type or "item"
+        if not items:
+            return f"There are no {_plural(0, word).split(' ', 1)[1]} on the canvas.", 1.0
+        lines = [f"You have {_plural(len(items), word)}:"]
+        lines.extend(f"- {_label(i)}" + ("" if item_type else f" · {i.get('type', '')}") for i in items)
+        return "\n".join(lines), 1.0
+
+    def _answer_metric_value(self, state, match):
+        index = CanvasIndex(state.get("items") or [])
+        chart, chart_confidence = None, 1.0
+        if match.group("item"):
+            chart, chart_confidence = index.find_item(match.group("item"), "chart")
+            if chart is None:
+                return None
+        found, confidence = index.find_metric(match.group("metric"), chart)
+        if found is None:
+            return None
+        chart, metric = found
+        value = metric.get("value")
+        reply = f"Metric \"{metric.get('label', '')}\" in chart {_label(chart)} " + ("has no value." if value in ("", None) else f"is {value}%.")
+        return reply, confidence * chart_confidence
+
+    def _answer_item_field(self, state, match):
+        index = CanvasIndex(state.get("items") or [])
+        item, confidence = index.find_item(match.group("item"))
+        if item is None:
+            return None
+        field = match.group("field")
+        getter = ITEM_FIELDS[field].get(str(item.get("type", "")))
+        if getter is None:
+            # 该类型没有这个字段，交给 LLM 解释
+            return None
+        value = getter(item)
+        if isinstance(value, list):
+            shown = ", ".join(str(v) for v in value) if value else "none"
+            reply = f"The {field} of {_label(item)}: {shown}."
+        else:
+            reply = f"The {field} of {_label(item)} is \"{value}\"." if value else f"{_label(item)} has no {field} yet."
+        return reply, confidence
+
+
+# 进程级单例
+query_engine = CanvasQueryEngine()
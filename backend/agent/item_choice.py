@@ -0,0 +1,181 @@
+"""
+条目选择（human-in-the-loop）
+用户要修改某个条目但没有说明是哪一个、画布上又有多个候选时，chat_node 通过 interrupt 让前端弹出条目选择框（choose_item）。
+默认关闭（ITEM_CHOICE_INTERRUPT），关闭时不做判断也不暂停。
+是否需要询问只按最新的用户消息判断一次：关键词用预编译的正则匹配，结果按消息 id 缓存；
+工具结果之后和计划自动继续的 chat_node 调用不再判断。interrupt 的触发次数和等待时长记录为指标
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.errors import GraphInterrupt
+from langgraph.types import interrupt
+
+from metrics import metrics
+
+# 用户选择条目可能要等几秒到几分钟
+WAIT_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+
+INTERRUPTS = metrics.counter(
+    "canvas_interrupt_total", "Human-in-the-loop interrupts by type and outcome (fired, chosen, cancelled)", ["type", "outcome"]
+)
+INTERRUPT_WAIT = metrics.histogram(
+    "canvas_interrupt_wait_seconds", "Time between an interrupt firing and its resume", ["type"], buckets=WAIT_BUCKETS
+)
+
+# 以下模式都匹配小写后的文本：带 IGNORECASE 的多选分支在 CPython 中要慢好几倍
+# 修改已有条目的动词
+EDIT_VERBS = re.compile(r"\b(?:rename|change|set|update|edit|modify|assign|reassign|mark|delete|remove)\b")
+# 新建条目不需要选择已有条目
+CREATE_VERBS = re.compile(r"\b(?:create|add|new|make|generate|insert|duplicate)\b")
+# 单个条目（单数名词）或条目字段；复数和 all / every / each 指的是一组条目，交给模型处理
+# （清单项 "checklist item" 是项目里的一行，不是画布条目）
+TARGET_WORDS = re.compile(r"\b(?:(?<!checklist )(?P<type>item|card|note|project|chart|entity)|owner|priority|status)\b")
+GROUP_WORDS = re.compile(r"\b(?:all|every|each|both)\b")
+# 显式写出的 id
+EXPLICIT_ID = re.compile(r"prj_|item id|\bid\s*[=:]")
+# 名词 -> 条目类型；None 表示任意类型
+TYPE_WORDS: Dict[str, Optional[str]] = {
+    "item": None, "card": None, "note": "note", "project": "project", "chart": "chart", "entity": "entity",
+}
+
+CHOOSE_ITEM = "choose_item"
+
+
+def item_choice_enabled() -> bool:
+    """ITEM_CHOICE_INTERRUPT=true 时对含糊的修改请求弹出条目选择框（默认关闭）"""
+    return os.getenv("ITEM_CHOICE_INTERRUPT", "false").lower() in ("1", "true", "yes", "on")
+
+
+def _mentions_item(text: str, words: FrozenSet[str], item: Dict[str, Any]) -> bool:
+    if str(item.get("id") or "").lower() in words:
+        return True
+    name = str(item.get("name") or "").strip().lower()
+    return len(name) >= 2 and name in text
+
+
+def needs_item_choice(text: str, items: Sequence[Dict[str, Any]]) -> bool:
+    """
+    消息要修改单个已有条目，但没有写出它的 id 或名称，且画布上有多个候选条目。
+
+    新建、只读和针对一组条目的请求都不询问；像 2025 这样的数字只有等于某个条目 id 时才算指明了条目。
+    """
+    text = text.lower()
+    if not EDIT_VERBS.search(text) or CREATE_VERBS.search(text) or GROUP_WORDS.search(text):
+        return False
+    target = TARGET_WORDS.search(text)
+    if target is None or EXPLICIT_ID.search(text):
+        return False
+    item_type = TYPE_WORDS.get(target.group("type") or "")
+    candidates: List[Dict[str, Any]] = [
+        i for i in items if isinstance(i, dict) and (item_type is None or i.get("type") == item_type)
+    ]
+    if len(candidates) <= 1:
+        return False
+    words = frozenset(re.findall(r"\w+", text))
+    return not any(_mentions_item(text, words, i) for i in items if isinstance(i, dict))
+
+
+def fresh_human_message(messages: Sequence[BaseMessage]) -> Optional[HumanMessage]:
+    """最后一条消息是用户消息时返回它；工具结果和计划自动继续的调用返回 None"""
+    if messages and isinstance(messages[-1], HumanMessage):
+        return messages[-1]
+    return None
+
+
+class ItemChoiceGate:
+    """按消息 id 缓存是否需要询问，并在 interrupt 前后记录触发次数和等待时长"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._decisions: "OrderedDict[str, bool]" = OrderedDict()
+        # 消息 id -> interrupt 触发时间（resume 在同一进程时用于计算等待时长）
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.cache_hits = 0
+        self.skipped = 0
+        self.fired = 0
+        self.chosen = 0
+        self.cancelled = 0
+
+    def should_ask(self, messages: Sequence[BaseMessage], items: Sequence[Dict[str, Any]]) -> bool:
+        """只对新的用户消息判断；同一条消息（例如 resume 后重新执行节点）直接用缓存的结果"""
+        message = fresh_human_message(messages)
+        if message is None:
+            with self._lock:
+                self.skipped += 1
+            return False
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if not message.id:
+            return needs_item_choice(content, items)
+        with self._lock:
+            decision = self._decisions.get(message.id)
+            if decision is not None:
+                self._decisions.move_to_end(message.id)
+                self.cache_hits += 1
+                return decision
+        decision = needs_item_choice(content, items)
+        with self._lock:
+            self.decisions += 1
+            self._decisions[message.id] = decision
+            while len(self._decisions) > self.max_entries:
+                self._decisions.popitem(last=False)
+        return decision
+
+    def ask(self, messages: Sequence[BaseMessage]) -> str:
+        """
+        发出 choose_item interrupt，返回用户选择的条目 id（取消时为空字符串）。
+
+        第一次执行时 interrupt 抛出 GraphInterrupt，graph 暂停等待前端；resume 后节点重新执行，
+        interrupt 直接返回前端给出的值。
+        """
+        key = getattr(messages[-1], "id", None) or ""
+        try:
+            choice = interrupt({
+                "type": CHOOSE_ITEM,
+                "content": "Please choose which item you mean.",
+            })
+        except GraphInterrupt:
+            INTERRUPTS.inc(type=CHOOSE_ITEM, outcome="fired")
+            with self._lock:
+                self.fired += 1
+                self._pending[key] = time.monotonic()
+                while len(self._pending) > self.max_entries:
+                    self._pending.pop(next(iter(self._pending)))
+            raise
+        choice = choice if isinstance(choice, str) else ""
+        outcome = "chosen" if choice else "cancelled"
+        INTERRUPTS.inc(type=CHOOSE_ITEM, outcome=outcome)
+        with self._lock:
+            if choice:
+                self.chosen += 1
+            else:
+                self.cancelled += 1
+            fired_at = self._pending.pop(key, None)
+        if fired_at is not None:
+            INTERRUPT_WAIT.observe(time.monotonic() - fired_at, type=CHOOSE_ITEM)
+        return choice
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "decisions": self.decisions,
+                "cache_hits": self.cache_hits,
+                "skipped": self.skipped,
+                "cached_messages": len(self._decisions),
+                "fired": self.fired,
+                "chosen": self.chosen,
+                "cancelled": self.cancelled,
+                "waiting": len(self._pending),
+            }
+
+
+# 进程级单例
+item_choice_gate = ItemChoiceGate()
@@ -0,0 +1,283 @@
+"""
+画布条目摘要
+逐条渲染条目摘要行，单个条目异常不影响整体；同一步内对同一份 items 只渲染一次。
+配置了 token 预算时，按与最新用户消息的相关度排序，预算外的条目压缩为一行简要信息或只列出 id，整个摘要不超过预算。
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def render_item_line(p: Dict[str, Any]) -> str:
+    """渲染单个条目的摘要行"""
+    pid = p.get("id", "")
+    name = p.get("name", "")
+    itype = p.get("type", "")
+    data = p.get("data", {}) or {}
+    subtitle = p.get("subtitle", "")
+    summary = ""
+    if itype == "project":
+        field1 = data.get("field1", "")
+        field2 = data.get("field2", "")
+        field3 = data.get("field3", "")
+        checklist_items = (data.get("field4", []) or [])
+        checklist = ", ".join([c.get("text", "") for c in checklist_items])
+        summary = f"subtitle={subtitle} · field1={field1} · field2={field2} · field3={field3} · field4=[{checklist}]"
+    elif itype == "entity":
+        field1 = data.get("field1", "")
+        field2 = data.get("field2", "")
+        selected_tags = (data.get("field3", []) or [])
+        available_tags = (data.get("field3_options", []) or [])
+        tags = ", ".join(selected_tags)
+        opts = ", ".join(available_tags)
+        summary = f"subtitle={subtitle} · field1={field1} · field2={field2} · field3(tags)=[{tags}] · field3_options=[{opts}]"
+    elif itype == "note":
+        content = data.get("field1", "")
+        # Include full content so the model has complete visibility for edits
+        summary = f"subtitle={subtitle} · noteContent=\"{content}\""
+    elif itype == "chart":
+        metrics_list = (data.get("field1", []) or [])
+        metrics = ", ".join([f"{m.get('label','')}:{m.get('value', 0)}%" for m in metrics_list])
+        summary = f"subtitle={subtitle} · field1(metrics)=[{metrics}]"
+    return f"id={pid} · name={name} · type={itype} · {summary}"
+
+
+def safe_render_item_line(p: Any) -> str:
+    """渲染单个条目；数据格式异常时退化为只含 id/name/type 的行"""
+    try:
+        return render_item_line(p)
+    except (AttributeError, TypeError):
+        if not isinstance(p, dict):
+            return "(unable to summarize item)"
+        return f"id={p.get('id', '')} · name={p.get('name', '')} · type={p.get('type', '')} · (unable to summarize item)"
+
+
+def render_item_stub(p: Any) -> str:
+    """预算不足时的单行简要信息（保留 id 以便模型按 id 引用）"""
+    if not isinstance(p, dict):
+        return "(unable to summarize item)"
+    return f"id={p.get('id', '')} · name={p.get('name', '')} · type={p.get('type', '')} · (details omitted)"
+
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """本地计算 token 数：优先使用 tiktoken，不可用时按约 4 个字符一个 token 估算"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(os.getenv("ITEMS_SUMMARY_TOKEN_ENCODING", "o200k_base"))
+        except Exception:
+            # tiktoken 未安装或编码文件无法下载（离线环境）
+            _encoding = None
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _words(text: str) -> Set[str]:
+    return {w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 or w.isdigit()}
+
+
+def _mentioned_ids(words: Iterable[str]) -> Set[str]:
+    """消息中提到的 id；纯数字也按数值匹配（例如 "item 3" 对应 id "0003"）"""
+    ids: Set[str] = set()
+    for w in words:
+        ids.add(w)
+        if w.isdigit():
+            ids.add(str(int(w)))
+    return ids
+
+
+def _normalized_id(pid: Any) -> Tuple[str, str]:
+    text = str(pid).lower()
+    return text, (str(int(text)) if text.isdigit() else text)
+
+
+def rank_items(items: List[Any], query: str = "", last_action: str = "") -> List[Tuple[float, int]]:
+    """按相关度返回 (得分, 下标)：被提到的 id > lastAction 的目标 > 词汇重叠数 > 画布顺序"""
+    query_words = _words(query or "")
+    mentioned = _mentioned_ids(query_words)
+    action_target = ""
+    if last_action and ":" in last_action:
+        action_target = _normalized_id(last_action.split(":", 1)[1].strip())[1]
+
+    scores: List[Tuple[float, int]] = []
+    for idx, p in enumerate(items):
+        score = 0.0
+        if isinstance(p, dict):
+            raw_id, num_id = _normalized_id(p.get("id", ""))
+            if raw_id in mentioned or num_id in mentioned:
+                score += REFERENCED_SCORE * 2
+            if action_target and num_id == action_target:
+                score += REFERENCED_SCORE
+            if query_words:
+                data = p.get("data", {}) or {}
+                text = " ".join(
+                    str(v) for v in (p.get("name", ""), p.get("subtitle", ""), p.get("type", ""), data.get("field1", ""))
+                    if isinstance(v, str)
+                )
+                score += len(query_words & _words(text))
+        scores.append((score, idx))
+    scores.sort(key=lambda x: (-x[0], x[1]))
+    return scores
+
+
+# 被消息或 lastAction 直接引用的条目得分下限，这些条目总是给出完整信息
+REFERENCED_SCORE = 50.0
+
+
+def truncation_note(truncated: int, total: int) -> str:
+    """部分条目没有给出完整信息时附在摘要末尾的说明"""
+    return (
+        f"({truncated} of {total} items shown without full details to fit the prompt budget; "
+        "their field values are NOT shown. Do not guess them: reference the item by id and ask, "
+        "or tell the user the details are not visible.)"
+    )
+
+
+def _id_tail(ids: List[str], more: int) -> str:
+    listed = ", ".join(ids) + (f" … +{more} more" if ids and more else "")
+    if not ids:
+        listed = f"… +{more} more"
+    return f"(other item ids, details not shown: {listed})"
+
+
+def budget_summary_lines(
+    items: List[Any],
+    budget_tokens: int,
+    query: str = "",
+    last_action: str = "",
+) -> Tuple[List[str], int]:
+    """
+    在 token 预算内给出摘要行（保持画布顺序），返回 (行列表, 未给出完整信息的条目数)
+
+    分配顺序：被直接引用的条目优先（完整信息，放不下时给简要信息）-> 其余条目按相关度给一行简要信息 ->
+    剩余预算按相关度升级为完整信息 -> 按相关度在末尾列出其余条目的 id，放不下的合并为 "… +N more"。
+    末尾的 id 行和截断说明（ItemsSummarizer 追加）都计入预算，每行另算一个换行符。
+    """
+    ranked = rank_items(items, query, last_action)
+    levels = [0] * len(items)  # 0: 仅 id, 1: 简要信息, 2: 完整信息
+    lines: Dict[Tuple[int, int], str] = {}
+
+    def line(idx: int, level: int) -> str:
+        key = (idx, level)
+        if key not in lines:
+            lines[key] = safe_render_item_line(items[idx]) if level == 2 else render_item_stub(items[idx])
+        return lines[key]
+
+    def cost(idx: int, level: int) -> int:
+        return count_tokens(line(idx, level)) + 1
+
+    # 按最坏情况（所有条目都未完整给出）预留截断说明和 id 行的固定部分
+    available = budget_tokens - count_tokens(truncation_note(len(items), len(items))) - count_tokens(_id_tail([], len(items))) - 2
+    used = 0
+    for score, idx in ranked:
+        if score < REFERENCED_SCORE:
+            break
+        for level in (2, 1):
+            if used + cost(idx, level) <= available:
+                used += cost(idx, level)
+                levels[idx] = level
+                break
+    for _, idx in ranked:
+        if levels[idx] == 0:
+            if used + cost(idx, 1) <= available:
+                used += cost(idx, 1)
+                levels[idx] = 1
+    for _, idx in ranked:
+        if levels[idx] == 1:
+            extra = cost(idx, 2) - cost(idx, 1)
+            if used + extra <= available:
+                used += extra
+                levels[idx] = 2
+
+    out = [line(i, levels[i]) for i in range(len(items)) if levels[i] > 0]
+    unlisted = [idx for _, idx in ranked if levels[idx] == 0]
+    if unlisted:
+        listed: List[int] = []
+        for idx in unlisted:
+            if not isinstance(items[idx], dict):
+                continue
+            id_cost = count_tokens(f", {items[idx].get('id', '')}")
+            if used + id_cost > available:
+                break
+            used += id_cost
+            listed.append(idx)
+        listed.sort()
+        out.append(_id_tail([str(items[i].get("id", "")) for i in listed], len(unlisted) - len(listed)))
+    return out, sum(1 for level in levels if level < 2)
+
+
+def default_token_budget() -> int:
+    """每个部署可通过 ITEMS_SUMMARY_TOKEN_BUDGET 配置，0 表示不限制"""
+    try:
+        return max(0, int(os.getenv("ITEMS_SUMMARY_TOKEN_BUDGET", "0")))
+    except ValueError:
+        return 0
+
+
+class ItemsSummarizer:
+    """条目摘要渲染器
+
+    只记住最近一次渲染的 items 列表（按对象身份），因此同一步内多处使用摘要时只渲染一次。
+    跨步骤的状态会从检查点重新反序列化，不做内容级缓存：对条目内容做哈希比直接渲染更慢
+    （见 backend/benchmarks/bench_items_summary.py）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_items: Optional[List[Any]] = None
+        self._last_params: Optional[Tuple[int, str, str]] = None
+        self._last_summary: str = ""
+        self.truncated_items = 0
+        self.renders = 0
+        self.reuses = 0
+
+    def summarize(
+        self,
+        items: Optional[List[Any]],
+        budget_tokens: int = 0,
+        query: str = "",
+        last_action: str = "",
+    ) -> str:
+        """渲染所有条目的摘要文本；budget_tokens > 0 时启用预算模式"""
+        items = items or []
+        params = (budget_tokens, query, last_action) if budget_tokens > 0 else None
+        with self._lock:
+            if items is self._last_items and params == self._last_params:
+                self.reuses += 1
+                return self._last_summary
+
+        truncated = 0
+        if params is not None:
+            lines, truncated = budget_summary_lines(items, budget_tokens, query, last_action)
+        else:
+            lines = [safe_render_item_line(p) for p in items]
+        summary = "\n".join(lines) if lines else "(no items)"
+        if truncated:
+            summary += "\n" + truncation_note(truncated, len(items))
+
+        with self._lock:
+            self.renders += 1
+            self.truncated_items += truncated
+            self._last_items = items
+            self._last_params = params
+            self._last_summary = summary
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {"renders": self.renders, "reuses": self.reuses, "truncated_items": self.truncated_items}
+
+
+# 进程级单例
+items_summarizer = ItemsSummarizer()
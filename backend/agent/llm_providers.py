@@ -0,0 +1,196 @@
+"""
+LLM 提供商注册表
+进程级复用 ChatOpenAI 实例及其底层的 httpx 连接池，避免每次 chat_node 调用都重新建立连接
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+
+@dataclass(frozen=True)
+class ProviderSettings:
+    """单个 LLM 提供商/部署的配置"""
+    provider: str  # azure | openai | dummy
+    model: str
+    api_key: str
+    base_url: Optional[str] = None
+    default_query: Dict[str, str] = field(default_factory=dict)
+    temperature: float = 0.1
+    stream_usage: bool = True  # 流式响应也返回 token 用量（需要提供商支持 stream_options）
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """连接池按 (提供商, 部署) 维度复用"""
+        return (self.provider, self.model)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """httpx 连接池配置"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+
+
+# Azure OpenAI 从这个 api-version（含同日期及之后的 preview 版本）开始支持 stream_options
+AZURE_STREAM_OPTIONS_MIN_API_VERSION = "2024-09-01"
+
+
+def azure_supports_stream_usage(api_version: str) -> bool:
+    """api-version（YYYY-MM-DD 或 YYYY-MM-DD-preview）是否支持 stream_options"""
+    return api_version[:10] >= AZURE_STREAM_OPTIONS_MIN_API_VERSION
+
+
+def load_stream_usage(default: bool) -> bool:
+    """LLM_STREAM_USAGE 显式设置时以它为准，否则使用提供商的默认值"""
+    value = os.getenv("LLM_STREAM_USAGE", "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+def load_provider_settings() -> ProviderSettings:
+    """从环境变量读取 LLM 提供商配置（Azure OpenAI > OpenAI > dummy）"""
+    if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        return ProviderSettings(
+            provider="azure",
+            model=deployment,
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            base_url=f"{os.getenv('AZURE_OPENAI_ENDPOINT')}openai/deployments/{deployment}/",
+            default_query={"api-version": api_version},
+            # 较早的 api-version 会以 400 拒绝 stream_options
+            stream_usage=load_stream_usage(azure_supports_stream_usage(api_version)),
+        )
+    if os.getenv("OPENAI_API_KEY"):
+        return ProviderSettings(
+            provider="openai",
+            model="gpt-4o",
+            api_key=os.getenv("OPENAI_API_KEY"),
+            stream_usage=load_stream_usage(True),
+        )
+    # 默认配置（如果没有配置任何 API Key）
+    return ProviderSettings(
+        provider="dummy",
+        model="gpt-4o",
+        api_key="dummy-key",  # 将使用模拟响应
+    )
+
+
+def load_pool_settings() -> PoolSettings:
+    """从环境变量读取连接池配置"""
+    return PoolSettings(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+        timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", "60")),
+        connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+    )
+
+
+class LLMProviderRegistry:
+    """进程级 LLM 客户端注册表
+
+    配置在第一次使用时读取一次（此时 main.py 已经执行过 load_dotenv），
+    之后每个 (提供商, 部署) 只持有一个长连接的 httpx.AsyncClient 和一个 ChatOpenAI 实例。
+    """
+
+    def __init__(
+        self,
+        provider_settings: Optional[ProviderSettings] = None,
+        pool_settings: Optional[PoolSettings] = None,
+    ):
+        self._provider_settings = provider_settings
+        self._pool_settings = pool_settings
+        self._clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+        self._models: Dict[Tuple[str, str], ChatOpenAI] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def provider_settings(self) -> ProviderSettings:
+        if self._provider_settings is None:
+            self._provider_settings = load_provider_settings()
+        return self._provider_settings
+
+    @property
+    def pool_settings(self) -> PoolSettings:
+        if self._pool_settings is None:
+            self._pool_settings = load_pool_settings()
+        return self._pool_settings
+
+    def _create_async_client(self) -> httpx.AsyncClient:
+        pool = self.pool_settings
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool.max_connections,
+                max_keepalive_connections=pool.max_keepalive_connections,
+                keepalive_expiry=pool.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(pool.timeout, connect=pool.connect_timeout),
+        )
+
+    def get_chat_model(self) -> ChatOpenAI:
+        """获取当前提供商的共享 ChatOpenAI 实例"""
+        settings = self.provider_settings
+        model = self._models.get(settings.key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(settings.key)
+            if model is None:
+                client = self._create_async_client()
+                kwargs: Dict[str, Any] = {
+                    "model": settings.model,
+                    "temperature": settings.temperature,
+                    "api_key": settings.api_key,
+                    "http_async_client": client,
+                    "stream_usage": settings.stream_usage,
+                }
+                if settings.base_url:
+                    kwargs["base_url"] = settings.base_url
+                if settings.default_query:
+                    kwargs["default_query"] = dict(settings.default_query)
+                model = ChatOpenAI(**kwargs)
+                self._clients[settings.key] = client
+                self._models[settings.key] = model
+        return model
+
+    async def aclose(self):
+        """关闭所有连接池（FastAPI shutdown 时调用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._models.clear()
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回注册表状态，便于排查连接复用情况"""
+        settings = self.provider_settings
+        pool = self.pool_settings
+        return {
+            "provider": settings.provider,
+            "model": settings.model,
+            "clients": [f"{p}/{m}" for p, m in self._clients.keys()],
+            "max_connections": pool.max_connections,
+            "max_keepalive_connections": pool.max_keepalive_connections,
+            "keepalive_expiry": pool.keepalive_expiry,
+        }
+
+
+# 进程级单例
+llm_registry = LLMProviderRegistry()
+
+
+def get_chat_model() -> ChatOpenAI:
+    """获取共享的 ChatOpenAI 实例"""
+    return llm_registry.get_chat_model()
@@ -6,19 +6,37 @@ FastAPI 应用主文件
 
 import os
 import time
-from fastapi import FastAPI, Depends, HTTPException, status
+
+from dotenv import load_dotenv
+
+# 加载环境变量；必须在导入本地模块之前，检查点保存器、用户存储、日志管道等进程级单例在导入时读取配置
+load_dotenv()
+
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 from copilotkit import LangGraphAGUIAgent 
 from ag_ui_langgraph import add_langgraph_fastapi_endpoint 
 from agent import graph  # 导入 graph 对象
-from dotenv import load_dotenv
-from auth import get_current_user, User, Permission, require_permission, has_permission
+from auth import get_current_user, User, Permission, require_permission, has_permission, user_repository
 from auth_routes import router as auth_router
 from authenticated_agent import AuthenticatedLangGraphAgent, AuthenticatedLangGraphAgentFactory
+from llm_providers import llm_registry
+from checkpointer import checkpointer
+from tool_binding import bound_model_cache
+from prompts import prompt_cache_stats
+from streaming import streaming_stats
+from password_pool import password_pool
+from token_cache import token_cache
+from structured_logging import get_logger, logging_pipeline
+from metrics import metrics
+from fast_path import query_engine
+from response_cache import response_cache
+from item_choice import item_choice_gate
+from tracing import TracingMiddleware, annotate_current_span, tracing
 
-# 加载环境变量
-load_dotenv()
+logger = get_logger("main")
 
 app = FastAPI(
     title="LangGraph Agent API",
@@ -35,9 +53,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 每个 HTTP 请求一个根 span（TRACING_EXPORTER=none 时直接透传）
+app.add_middleware(TracingMiddleware)
+
 # 注册认证路由
 app.include_router(auth_router)
 
+@app.on_event("startup")
+async def setup_checkpointer():
+    """初始化检查点保存器（sqlite/postgres 需要在事件循环内建立连接）"""
+    await checkpointer.setup()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """关闭共享的 LLM 连接池"""
+    await llm_registry.aclose()
+
+@app.on_event("shutdown")
+async def close_checkpointer():
+    """关闭检查点数据库连接"""
+    await checkpointer.aclose()
+
+@app.on_event("shutdown")
+async def close_password_pool():
+    """关闭密码哈希工作池"""
+    password_pool.shutdown()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    """导出剩余的 span"""
+    tracing.shutdown()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    """写出队列中剩余的日志并停止日志线程"""
+    logging_pipeline.shutdown()
+
+@app.on_event("shutdown")
+async def close_user_repository():
+    """关闭用户存储的数据库连接"""
+    user_repository.close()
+
+@app.on_event("shutdown")
+async def close_response_cache():
+    """关闭响应缓存（sqlite 后端的数据库连接）"""
+    response_cache.close()
+
 # 创建带权限检查的 LangGraph 端点
 def create_authenticated_agent(user: User):
     """为认证用户创建 Agent"""
@@ -172,8 +233,10 @@ async def custom_langgraph_endpoint(
 ):
     """自定义LangGraph端点，支持认证"""
     try:
-        print(f"[CUSTOM_LANGGRAPH] 用户 {current_user.username} 调用LangGraph端点")
-        print(f"[CUSTOM_LANGGRAPH] 请求数据: {request_data}")
+        thread_id = request_data.get("threadId", f"thread-{current_user.username}-{int(time.time())}")
+        annotate_current_span(user=current_user.username, thread_id=thread_id)
+        # 请求体包含完整的画布状态和消息，只记录键名
+        logger.debug("langgraph_dev.request", username=current_user.username, keys=list(request_data.keys()))
         
         # 将用户信息添加到请求数据中
         enhanced_request_data = {
@@ -187,7 +250,6 @@ async def custom_langgraph_endpoint(
         }
         
         # 调用LangGraph
-        thread_id = request_data.get("threadId", f"thread-{current_user.username}-{int(time.time())}")
         result = await graph.ainvoke(enhanced_request_data, config={
             "configurable": {
                 "thread_id": thread_id,
@@ -204,9 +266,7 @@ async def custom_langgraph_endpoint(
         return result
         
     except Exception as e:
-        print(f"[CUSTOM_LANGGRAPH] 错误: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("langgraph_dev.error", username=current_user.username)
         return {"error": f"LangGraph execution failed: {str(e)}"}
 
 # 保留原始的 CopilotKit 集成方式（无权限校验，用于开发测试）
@@ -228,6 +288,61 @@ def health():
     """健康检查"""
     return {"status": "ok", "message": "LangGraph Agent API is running with volume mount hot reload"}
 
+# LLM 相关运行时统计
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus 文本格式的节点耗时、LLM、工具调用和检查点写入指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# /stats/* 暴露令牌缓存、用户存储等内部状态，只对有 MANAGE_USERS 权限的管理员开放
+stats_router = APIRouter(
+    prefix="/stats", tags=["统计"], dependencies=[Depends(require_permission(Permission.MANAGE_USERS))]
+)
+
+@stats_router.get("/llm")
+def llm_stats():
+    """LLM 客户端、工具绑定缓存与响应缓存统计"""
+    return {
+        "registry": llm_registry.stats(),
+        "bound_tools_cache": bound_model_cache.stats(),
+        "prompt_cache": prompt_cache_stats.stats(),
+        "streaming": streaming_stats.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+@stats_router.get("/checkpointer")
+def checkpointer_stats():
+    """检查点保存器统计（memory 后端包含线程数、淘汰次数和近似内存占用）"""
+    return checkpointer.stats()
+
+@stats_router.get("/logging")
+def logging_stats():
+    """日志管道统计（队列长度、丢弃和采样掉的记录数）"""
+    return logging_pipeline.stats()
+
+@stats_router.get("/fast_path")
+def fast_path_stats():
+    """只读查询快速路径统计（命中率、按意图的回答次数、低置信度和无法解析的次数）"""
+    return query_engine.stats.stats()
+
+@stats_router.get("/interrupts")
+def interrupt_stats():
+    """条目选择 interrupt 统计（判断次数、按消息 id 的缓存命中、触发 / 选择 / 取消次数、等待中的数量）"""
+    return item_choice_gate.stats()
+
+@stats_router.get("/auth")
+def auth_stats():
+    """密码哈希工作池、已验证令牌缓存、权限图缓存和用户存储统计"""
+    from permission_agent import permission_graph_cache
+    return {
+        "password_pool": password_pool.stats(),
+        "token_cache": token_cache.stats(),
+        "permission_graph_cache": permission_graph_cache.stats(),
+        "user_store": user_repository.stats(),
+    }
+
+app.include_router(stats_router)
+
 # 权限相关端点
 @app.get("/permissions/check")
 async def check_permissions(current_user: User = Depends(get_current_user)):
@@ -246,16 +361,15 @@ async def check_permissions(current_user: User = Depends(get_current_user)):
 @app.get("/permissions/tools")
 async def get_tool_permissions(current_user: User = Depends(get_current_user)):
     """获取工具权限映射"""
-    from permission_agent import PermissionAwareAgent
-    from agent import graph as original_graph
+    from tool_permissions import tool_permission_index
     
-    permission_agent = PermissionAwareAgent(original_graph)
+    mask = current_user.permission_mask
     tool_permissions = {}
     
-    for tool_name, permission in permission_agent.permission_tool_mapping.items():
+    for tool_name, permission in tool_permission_index.tool_permissions.items():
         tool_permissions[tool_name] = {
             "required_permission": permission.value,
-            "has_permission": has_permission(current_user, permission)
+            "has_permission": tool_permission_index.can_access(mask, tool_name)
         }
     
     return tool_permissions
@@ -0,0 +1,254 @@
+"""
+Prometheus 指标
+进程内的计数器和直方图：记录时只做一次加锁的桶计数（固定桶，二分查找），
+累计值和文本格式只在 GET /metrics 被抓取时生成，没有抓取时几乎没有额外开销
+"""
+
+import asyncio
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langgraph.errors import GraphBubbleUp
+
+from tracing import tracing
+
+# 节点和 LLM 调用耗时（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 检查点单次写入的序列化字节数
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# 每轮的计划自动继续次数
+ITERATION_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape("" if value is None else str(value))}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(map(labels.get, self.labelnames)) if labels else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram:
+    """固定桶直方图；每个桶只记非累计计数，渲染时再累加"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., +Inf 桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(map(labels.get, self.labelnames)) if labels else ()
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = []
+        for key, series in snapshot.items():
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，按注册顺序输出 Prometheus 文本格式（0.0.4）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class PlanAutoContinueTracker:
+    """按线程统计一轮对话中 chat_node 自动继续的次数，轮次结束时写入直方图"""
+
+    def __init__(self, histogram: Histogram, max_threads: int = 10000):
+        self.histogram = histogram
+        self.max_threads = max_threads
+        self._counts: Dict[str, int] = {}
+
+    def start(self, thread_id: Optional[str]):
+        if thread_id is None:
+            return
+        if len(self._counts) >= self.max_threads:
+            # 异常中断的轮次不会调用 finish，超出上限时整体丢弃
+            self._counts.clear()
+        self._counts[thread_id] = 0
+
+    def increment(self, thread_id: Optional[str]):
+        if thread_id is not None and thread_id in self._counts:
+            self._counts[thread_id] += 1
+
+    def finish(self, thread_id: Optional[str]):
+        if thread_id is not None and thread_id in self._counts:
+            self.histogram.observe(self._counts.pop(thread_id))
+
+    def track(self, node: Callable, count_continues: bool = True) -> Callable:
+        """
+        包装 graph 节点：路由回 chat_node 计一次自动继续，路由到 END 时结束本轮。
+
+        chat_node 和 plan_node 回到 chat_node 都是计划循环的下一次迭代；
+        fast_path_node 转给 chat_node 是本轮的第一次调用，用 count_continues=False 包装
+        """
+        @functools.wraps(node)
+        async def run(state, config):
+            command = await node(state, config)
+            goto = getattr(command, "goto", None)
+            if goto == "chat_node" and count_continues:
+                self.increment(_thread_id(config))
+            elif goto == "__end__":
+                self.finish(_thread_id(config))
+            return command
+        return run
+
+
+def _thread_id(config: Any) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+# 进程级单例
+metrics = MetricsRegistry()
+
+NODE_DURATION = metrics.histogram("canvas_node_duration_seconds", "Graph node execution time", ["node"])
+NODE_ERRORS = metrics.counter("canvas_node_errors_total", "Graph node executions that raised", ["node"])
+LLM_TTFT = metrics.histogram("canvas_llm_time_to_first_token_seconds", "Time to the first streamed LLM chunk")
+LLM_DURATION = metrics.histogram("canvas_llm_duration_seconds", "Total LLM call time")
+LLM_TOKENS = metrics.counter("canvas_llm_tokens_total", "LLM tokens by kind (prompt, completion, cached)", ["kind"])
+TOOL_CALLS = metrics.counter("canvas_tool_calls_total", "Tool calls requested by the model", ["tool"])
+PLAN_AUTOCONTINUE = metrics.histogram(
+    "canvas_plan_autocontinue_iterations", "chat_node auto-continue iterations per turn", buckets=ITERATION_BUCKETS
+)
+CHECKPOINT_WRITE_BYTES = metrics.histogram(
+    "canvas_checkpoint_write_bytes", "Serialized bytes per checkpoint write", ["kind"], buckets=SIZE_BUCKETS
+)
+
+plan_autocontinue = PlanAutoContinueTracker(PLAN_AUTOCONTINUE)
+
+
+def timed_node(name: str, node: Any) -> Callable:
+    """包装 graph 节点，记录耗时和异常次数并打开 node.<name> span；支持同步函数、异步函数和 Runnable（如 ToolNode）"""
+    if not inspect.isfunction(node) and hasattr(node, "ainvoke"):
+        runnable = node
+
+        async def run_runnable(state, config):
+            started = time.perf_counter()
+            try:
+                with tracing.node_span(name, (state, config)):
+                    return await runnable.ainvoke(state, config)
+            except GraphBubbleUp:
+                # interrupt() 等控制流异常不算错误
+                raise
+            except Exception:
+                NODE_ERRORS.inc(node=name)
+                raise
+            finally:
+                NODE_DURATION.observe(time.perf_counter() - started, node=name)
+
+        run_runnable.__name__ = name
+        return run_runnable
+
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def run_async(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with tracing.node_span(name, args):
+                    return await node(*args, **kwargs)
+            except GraphBubbleUp:
+                raise
+            except Exception:
+                NODE_ERRORS.inc(node=name)
+                raise
+            finally:
+                NODE_DURATION.observe(time.perf_counter() - started, node=name)
+        return run_async
+
+    @functools.wraps(node)
+    def run_sync(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with tracing.node_span(name, args):
+                return node(*args, **kwargs)
+        except GraphBubbleUp:
+            raise
+        except Exception:
+            NODE_ERRORS.inc(node=name)
+            raise
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - started, node=name)
+    return run_sync
+
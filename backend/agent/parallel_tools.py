@@ -0,0 +1,66 @@
+"""
+并行工具调用
+开启 LLM_PARALLEL_TOOL_CALLS 后模型可以在一次回复中发出多个工具调用：
+后端工具调用在 tool_node 中一起并发执行；前端工具调用留在同一条 AIMessage 里，一次交给客户端按顺序执行。
+后端工具只有计划工具，它们只回显参数、不改写状态（计划状态由 plan_node 按调用顺序归约），
+因此并发执行不需要按冲突排序
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import ToolNode
+
+
+def parallel_tool_calls_enabled() -> bool:
+    """LLM_PARALLEL_TOOL_CALLS=true 时允许模型一次发出多个工具调用（默认关闭）"""
+    return os.getenv("LLM_PARALLEL_TOOL_CALLS", "false").lower() in ("1", "true", "yes", "on")
+
+
+def latest_tool_request(messages: Sequence[BaseMessage]) -> Optional[AIMessage]:
+    """最近一条带工具调用的 AIMessage（之后只可能跟着 ToolMessage）"""
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return message if message.tool_calls else None
+        if not isinstance(message, ToolMessage):
+            return None
+    return None
+
+
+def pending_tool_calls(messages: Sequence[BaseMessage], names: Optional[Iterable[str]] = None, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """最近一次工具调用中还没有 ToolMessage 结果的调用，可按工具名筛选"""
+    request = latest_tool_request(messages)
+    if request is None:
+        return []
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    names = set(names) if names is not None else None
+    exclude = set(exclude)
+    return [
+        call for call in request.tool_calls
+        if call.get("id") not in answered
+        and (names is None or call.get("name") in names)
+        and call.get("name") not in exclude
+    ]
+
+
+class BackendToolNode:
+    """
+    执行最近一条 AIMessage 中还没有结果的后端工具调用。
+
+    与直接使用 ToolNode 的区别：前端工具调用留给客户端（不产生 "not a valid tool" 的错误结果）。
+    所有后端调用作为一个列表交给 ToolNode，由它用 asyncio.gather 并发执行，结果按原调用顺序返回。
+    """
+
+    def __init__(self, tools: Sequence[Any]):
+        self.tool_node = ToolNode(tools=list(tools))
+        self.tool_names = frozenset(self.tool_node.tools_by_name)
+
+    async def ainvoke(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        calls = pending_tool_calls(state.get("messages") or [], names=self.tool_names)
+        if not calls:
+            return {"messages": []}
+        output = await self.tool_node.ainvoke(calls, config)
+        results = {message.tool_call_id: message for message in output["messages"]}
+        return {"messages": [results[call["id"]] for call in calls if call["id"] in results]}
@@ -0,0 +1,93 @@
+"""
+密码哈希工作池
+PBKDF2 计算放到独立的有界线程池中执行，不阻塞事件循环（hashlib.pbkdf2_hmac 计算期间会释放 GIL）；
+排队的任务超过上限时直接拒绝，由路由返回 503
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class PasswordPoolSaturated(Exception):
+    """工作池和等待队列都已占满"""
+
+
+class PasswordWorkerPool:
+    """有界的密码哈希线程池"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """在工作池中执行 fn(*args)；执行中 + 排队的任务数达到上限时抛出 PasswordPoolSaturated"""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolSaturated()
+            self.in_flight += 1
+        submitted = time.perf_counter()
+
+        def task() -> T:
+            with self._lock:
+                self.total_wait += time.perf_counter() - submitted
+            return fn(*args)
+
+        def done(future: "Future[T]"):
+            # 计算真正结束（或在开始前被取消）时才释放名额；请求被取消时线程里的计算仍在进行
+            with self._lock:
+                self.in_flight -= 1
+                if not future.cancelled():
+                    self.completed += 1
+
+        future = self._get_executor().submit(task)
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 例如登录过程中客户端断开；还没开始执行的任务会随之取消
+            with self._lock:
+                self.cancelled += 1
+            raise
+
+    def shutdown(self):
+        """关闭线程池（FastAPI shutdown 时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+        }
+
+
+# 进程级单例
+password_pool = PasswordWorkerPool()
@@ -3,7 +3,10 @@
 根据用户权限限制工具访问和功能使用
 """
 
-from typing import Dict, Any, List, Optional
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional
 from langgraph.graph import StateGraph
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
@@ -11,6 +14,7 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import BaseTool
 
 from auth import User, Permission, has_permission
+from tool_permissions import tool_permission_index
 from agent import AgentState
 from langgraph.prebuilt import ToolNode
 
@@ -19,71 +23,24 @@ class PermissionAwareAgent:
     
     def __init__(self, original_graph: StateGraph):
         self.original_graph = original_graph
-        self.permission_tool_mapping = self._create_permission_mapping()
-    
-    def _create_permission_mapping(self) -> Dict[str, Permission]:
-        """创建工具到权限的映射"""
-        return {
-            # 基础画布操作
-            "setGlobalTitle": Permission.WRITE_CANVAS,
-            "setGlobalDescription": Permission.WRITE_CANVAS,
-            "setItemName": Permission.WRITE_CANVAS,
-            "setItemSubtitleOrDescription": Permission.WRITE_CANVAS,
-            "createItem": Permission.WRITE_CANVAS,
-            "deleteItem": Permission.DELETE_CANVAS,
-            
-            # 项目管理
-            "setProjectField1": Permission.EDIT_PROJECT,
-            "setProjectField2": Permission.EDIT_PROJECT,
-            "setProjectField3": Permission.EDIT_PROJECT,
-            "clearProjectField3": Permission.EDIT_PROJECT,
-            "addProjectChecklistItem": Permission.EDIT_PROJECT,
-            "setProjectChecklistItem": Permission.EDIT_PROJECT,
-            "removeProjectChecklistItem": Permission.EDIT_PROJECT,
-            
-            # 实体管理
-            "setEntityField1": Permission.EDIT_ENTITY,
-            "setEntityField2": Permission.EDIT_ENTITY,
-            "addEntityField3": Permission.EDIT_ENTITY,
-            "removeEntityField3": Permission.EDIT_ENTITY,
-            
-            # 笔记管理
-            "setNoteField1": Permission.EDIT_NOTE,
-            "appendNoteField1": Permission.EDIT_NOTE,
-            "clearNoteField1": Permission.EDIT_NOTE,
-            
-            # 图表管理
-            "addChartField1": Permission.EDIT_CHART,
-            "setChartField1Label": Permission.EDIT_CHART,
-            "setChartField1Value": Permission.EDIT_CHART,
-            "clearChartField1Value": Permission.EDIT_CHART,
-            "removeChartField1": Permission.EDIT_CHART,
-            
-            # 计划管理
-            "set_plan": Permission.CREATE_PLAN,
-            "update_plan_progress": Permission.EXECUTE_PLAN,
-            "complete_plan": Permission.MANAGE_PLAN,
-        }
+        # 映射和编译后的掩码来自进程级的不可变索引，构造本类不再重建映射表
+        self.permission_tool_mapping = tool_permission_index.tool_permissions
+        self.tool_permission_masks = tool_permission_index.tool_masks
     
     def filter_tools_by_permission(self, tools: List[BaseTool], user: User) -> List[BaseTool]:
         """根据用户权限过滤工具"""
+        user_mask = user.permission_mask
         filtered_tools = []
         for tool in tools:
-            tool_name = tool.name
-            required_permission = self.permission_tool_mapping.get(tool_name)
-            
-            if required_permission is None:
-                # 没有权限要求的工具，默认允许
-                filtered_tools.append(tool)
-            elif has_permission(user, required_permission):
-                # 用户有权限，添加工具
+            # 没有权限要求的工具（掩码为 0）默认允许；没有权限的工具被过滤掉
+            required = self.tool_permission_masks.get(tool.name, 0)
+            if user_mask & required == required:
                 filtered_tools.append(tool)
-            # 没有权限的工具被过滤掉
         
         return filtered_tools
     
-    def create_permission_aware_chat_node(self, user: User):
-        """创建带权限检查的聊天节点"""
+    def create_permission_aware_chat_node(self, permission_mask: int):
+        """创建带权限检查的聊天节点（只依赖权限掩码，同一权限组合的用户可以共享）"""
         from agent import chat_node
         
         async def permission_chat_node(state: AgentState, config: Dict[str, Any]) -> Any:
@@ -97,7 +54,7 @@ class PermissionAwareAgent:
                     tool_name = tool_call.get('name', '')
                     required_permission = self.permission_tool_mapping.get(tool_name)
                     
-                    if required_permission is None or has_permission(user, required_permission):
+                    if tool_permission_index.can_access(permission_mask, tool_name):
                         filtered_tool_calls.append(tool_call)
                     else:
                         # 添加权限不足的消息
@@ -116,13 +73,12 @@ class PermissionAwareAgent:
         
         return permission_chat_node
     
-    def create_permission_aware_tool_node(self, user: User):
+    def create_permission_aware_tool_node(self, permission_mask: int):
         """创建带权限检查的工具节点"""
-        from langgraph.prebuilt import ToolNode
-        from agent import tools
+        from agent import backend_tools
         
         # 创建工具节点
-        tool_node = ToolNode(tools)
+        tool_node = ToolNode(backend_tools)
         
         async def permission_tool_node(state: AgentState, config: Dict[str, Any]) -> Any:
             # 获取原始工具节点的结果
@@ -143,13 +99,19 @@ class PermissionAwareAgent:
         return permission_tool_node
     
     def create_user_specific_graph(self, user: User) -> StateGraph:
-        """为用户创建特定的图"""
+        """为用户创建特定的图（按权限掩码从缓存中取，同一权限组合只编译一次）"""
+        return permission_graph_cache.get_or_compile(
+            user.permission_mask, lambda: self.compile_graph_for_mask(user.permission_mask)
+        )
+    
+    def compile_graph_for_mask(self, permission_mask: int) -> StateGraph:
+        """为一个权限组合编译图"""
         # 创建新的图实例
         graph = StateGraph(AgentState)
         
         # 添加带权限检查的节点
-        graph.add_node("chat", self.create_permission_aware_chat_node(user))
-        graph.add_node("tools", self.create_permission_aware_tool_node(user))
+        graph.add_node("chat", self.create_permission_aware_chat_node(permission_mask))
+        graph.add_node("tools", self.create_permission_aware_tool_node(permission_mask))
         
         # 添加边
         graph.add_edge("chat", "tools")
@@ -158,8 +120,57 @@ class PermissionAwareAgent:
         # 设置入口点
         graph.set_entry_point("chat")
         
+        # 节点拓扑与主图不同，不能与主图共用检查点保存器（同一 thread_id 会读到对方的检查点），不保存检查点
         return graph.compile()
 
+
+class PermissionGraphCache:
+    """
+    按权限掩码缓存编译好的权限感知图（有界 LRU）
+
+    图只依赖权限掩码和工具权限映射（不可变），与角色定义无关：角色的权限被修改后，
+    该角色的用户有了新的掩码，自然会取到（或编译）对应的图，不需要让缓存失效。
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._graphs: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, permission_mask: int, compile_fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            graph = self._graphs.get(permission_mask)
+            if graph is not None:
+                self._graphs.move_to_end(permission_mask)
+                self.hits += 1
+                return graph
+            self.misses += 1
+
+        graph = compile_fn()
+
+        with self._lock:
+            self._graphs[permission_mask] = graph
+            self._graphs.move_to_end(permission_mask)
+            while len(self._graphs) > self.maxsize:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._graphs),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+# 进程级单例
+permission_graph_cache = PermissionGraphCache(maxsize=int(os.getenv("PERMISSION_GRAPH_CACHE_SIZE", "16")))
+
 def create_permission_aware_agent(user: User) -> StateGraph:
     """为特定用户创建带权限检查的 Agent"""
     from agent import graph as original_graph
@@ -184,23 +195,9 @@ def get_user_permissions(user: User) -> List[str]:
 
 def can_access_tool(user: User, tool_name: str) -> bool:
     """检查用户是否可以访问特定工具"""
-    from agent import graph as original_graph
-    permission_agent = PermissionAwareAgent(original_graph)
-    required_permission = permission_agent.permission_tool_mapping.get(tool_name)
-    
-    if required_permission is None:
-        return True  # 没有权限要求的工具默认允许
-    
-    return has_permission(user, required_permission)
+    # 没有权限要求的工具默认允许
+    return tool_permission_index.can_access(user.permission_mask, tool_name)
 
 def get_available_tools_for_user(user: User) -> List[str]:
     """获取用户可用的工具列表"""
-    from agent import graph as original_graph
-    permission_agent = PermissionAwareAgent(original_graph)
-    available_tools = []
-    
-    for tool_name, required_permission in permission_agent.permission_tool_mapping.items():
-        if has_permission(user, required_permission):
-            available_tools.append(tool_name)
-    
-    return available_tools
+    return list(tool_permission_index.tools_for_user(user))
@@ -0,0 +1,120 @@
+"""
+计划状态归约
+把 set_plan / update_plan_progress / complete_plan 的调用按顺序确定性地应用到 planSteps、currentStepIndex 和 planStatus。
+计划工具本身只回显参数，真正的状态变化只在这里计算（由 agent.plan_node 在 tool_node 之后调用）
+"""
+
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+PLAN_TOOL_NAMES = frozenset({"set_plan", "update_plan_progress", "complete_plan"})
+
+PlanState = Tuple[List[Any], int, str]
+
+
+def _call_args(call: Dict[str, Any]) -> Dict[str, Any]:
+    args = call.get("args")
+    if isinstance(args, dict):
+        return args
+    try:
+        parsed = json.loads(args)  # sometimes args can be a json string
+        return parsed if isinstance(parsed, dict) else {}
+    except Exception:
+        return {}
+
+
+def applied_plan_calls(messages: Sequence[BaseMessage], request: AIMessage) -> List[Dict[str, Any]]:
+    """request 中已成功执行的计划工具调用（有 ToolMessage 且不是错误），保持调用顺序"""
+    results = {m.tool_call_id: m for m in messages if isinstance(m, ToolMessage)}
+    return [
+        call for call in request.tool_calls
+        if call.get("name") in PLAN_TOOL_NAMES
+        and call.get("id") in results
+        and getattr(results[call["id"]], "status", "success") != "error"
+    ]
+
+
+def apply_plan_calls(plan_steps: List[Any], current_step_index: int, plan_status: str, calls: Sequence[Dict[str, Any]]) -> PlanState:
+    """按顺序应用计划工具调用，返回新的 (planSteps, currentStepIndex, planStatus)；不修改传入的步骤"""
+    # copy the step dicts too: mutating the state's own dicts would hide the change from the delta
+    steps = [dict(s) if isinstance(s, dict) else s for s in plan_steps]
+    index = current_step_index
+    status = plan_status
+    closed = False
+    for call in calls:
+        name = call.get("name")
+        args = _call_args(call)
+        if name == "set_plan":
+            raw_steps = args.get("steps") or []
+            steps = [{"title": s if isinstance(s, str) else str(s), "status": "pending"} for s in raw_steps]
+            if steps:
+                steps[0]["status"] = "in_progress"
+                index = 0
+                status = "in_progress"
+            else:
+                index = -1
+                status = ""
+        elif name == "update_plan_progress":
+            idx = args.get("step_index")
+            step_status = args.get("status")
+            note = args.get("note")
+            if isinstance(idx, int) and 0 <= idx < len(steps) and isinstance(step_status, str):
+                if note:
+                    steps[idx]["note"] = note
+                steps[idx]["status"] = step_status
+                if step_status == "in_progress":
+                    index = idx
+                    status = "in_progress"
+                if step_status == "completed" and idx >= index:
+                    index = idx
+        elif name == "complete_plan":
+            for step in steps:
+                if step.get("status") != "completed":
+                    step["status"] = "completed"
+            status = "completed"
+            closed = True
+
+    if not steps or closed:
+        return steps, index, status
+
+    statuses = [str(s.get("status", "")) for s in steps]
+    if all(st == "completed" for st in statuses):
+        # every step was marked completed by the model: close the plan here instead of
+        # spending another LLM round trip on complete_plan
+        return steps, index, "completed"
+    # We still reflect failure if any step failed.
+    if any(st == "failed" for st in statuses):
+        status = "failed"
+    elif any(st == "in_progress" for st in statuses):
+        status = "in_progress"
+    elif any(st == "blocked" for st in statuses):
+        status = "blocked"
+
+    # Only promote a new step when the previously active step transitioned to completed
+    active_idx = next((i for i, st in enumerate(statuses) if st == "in_progress"), -1)
+    if active_idx == -1:
+        # find last completed and promote the next pending, else first pending
+        last_completed = max((i for i, st in enumerate(statuses) if st == "completed"), default=-1)
+        # Prefer the immediate next step after the last completed
+        promote_idx = next((i for i in range(last_completed + 1, len(steps)) if statuses[i] == "pending"), -1)
+        if promote_idx == -1:
+            promote_idx = next((i for i, st in enumerate(statuses) if st == "pending"), -1)
+        if promote_idx != -1:
+            steps[promote_idx]["status"] = "in_progress"
+            index = promote_idx
+            status = "in_progress"
+    return steps, index, status
+
+
+def plan_summary(plan_steps: Sequence[Any]) -> str:
+    """计划完成时的简短总结（模型没有自己写总结时使用）"""
+    lines = ["Plan completed:"]
+    for i, step in enumerate(plan_steps, start=1):
+        if not isinstance(step, dict):
+            lines.append(f"{i}. {step}")
+            continue
+        note = step.get("note")
+        lines.append(f"{i}. {step.get('title', '')}" + (f" - {note}" if note else ""))
+    return "\n".join(lines)
@@ -0,0 +1,351 @@
+"""
+响应缓存
+同一个问题在画布没有变化时被重复提出（例如刷新页面后）时，直接返回上次的 AIMessage（包括工具调用），不再调用模型。
+键为（规范化的最新用户消息、之前对话历史的哈希、ground truth 摘要的哈希、已绑定工具集指纹、模型标识），
+"yes"、"undo that" 这类依赖上下文的追问只有在之前的对话完全相同时才会命中，
+带 TTL 和 LRU 淘汰，后端可选内存或 SQLite（RESPONSE_CACHE_BACKEND，默认关闭）。
+请求随机值、占位内容等的消息不走缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from metrics import metrics
+
+RESPONSE_CACHE_LOOKUPS = metrics.counter(
+    "canvas_response_cache_total", "Response cache lookups by outcome (hit, miss, bypass)", ["outcome"]
+)
+
+# 用户要求随机 / 占位 / 示例数据时每次都应生成新的值
+BYPASS_PATTERN = re.compile(
+    r"\b(random\w*|placeholders?|mock\w*|dummy|fake|samples?|lorem|ipsum|surprise|arbitrary|made[- ]up|invent\w*|"
+    r"shuffle\w*|any values?|some values?|whatever)\b"
+)
+
+
+@dataclass(frozen=True)
+class ResponseCacheSettings:
+    """响应缓存配置"""
+    backend: str = "none"  # none | memory | sqlite
+    ttl: float = 600.0  # 秒
+    max_entries: int = 1000
+    sqlite_path: str = "response_cache.sqlite"
+
+
+def load_response_cache_settings() -> ResponseCacheSettings:
+    """从环境变量读取响应缓存配置"""
+    return ResponseCacheSettings(
+        backend=os.getenv("RESPONSE_CACHE_BACKEND", "none").lower(),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600")),
+        max_entries=max(1, int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))),
+        sqlite_path=os.getenv("RESPONSE_CACHE_SQLITE_PATH", "response_cache.sqlite"),
+    )
+
+
+def normalize_message(text: str) -> str:
+    """大小写、空白和结尾标点不影响命中"""
+    return re.sub(r"\s+", " ", text.lower()).strip().rstrip("?.!。？！ ")
+
+
+def needs_bypass(text: str) -> bool:
+    """消息要求随机或占位内容时不读也不写缓存"""
+    return bool(BYPASS_PATTERN.search(text.lower()))
+
+
+def model_identity(model: Any) -> str:
+    """模型标识：类型 + 部署/模型名 + 温度"""
+    name = getattr(model, "deployment_name", None) or getattr(model, "model_name", None) or getattr(model, "model", None)
+    return f"{type(model).__name__}:{name}:{getattr(model, 'temperature', None)}"
+
+
+def history_fingerprint(messages: Sequence[BaseMessage]) -> str:
+    """
+    模型看到的历史消息（最新用户消息之前的部分）的哈希。
+
+    只包含消息类型、文本、工具调用的名称和参数；消息 id 和工具调用 id 是随机的，不参与哈希。
+    """
+    digest = hashlib.sha256()
+    for m in messages:
+        entry = [m.type, m.content, [[tc.get("name"), tc.get("args")] for tc in getattr(m, "tool_calls", None) or []]]
+        digest.update(json.dumps(entry, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def response_cache_key(message: str, history: str, ground_truth: str, tool_fingerprint: str, model_id: str) -> str:
+    """缓存键：历史和 ground truth 只参与哈希，不保存原文"""
+    payload = json.dumps(
+        [normalize_message(message), history, hashlib.sha256(ground_truth.encode("utf-8")).hexdigest(), tool_fingerprint, model_id],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dump_response(message: AIMessage) -> str:
+    """只保存文本和工具调用（名称、参数）；原始的消息 id 和调用 id 不保存"""
+    return json.dumps(
+        {
+            "content": message.content,
+            "tool_calls": [{"name": tc["name"], "args": tc.get("args") or {}} for tc in message.tool_calls],
+        },
+        ensure_ascii=False,
+    )
+
+
+def load_response(payload: str) -> AIMessage:
+    """
+    还原缓存的回复。
+
+    消息 id 和工具调用 id 每次重新生成：同一线程里重复出现的消息 id 会被 add_messages 当作更新而覆盖旧消息，
+    重复的调用 id 也会让 ToolMessage 对应错位。
+    """
+    data = json.loads(payload)
+    return AIMessage(
+        content=data.get("content", ""),
+        tool_calls=[
+            {"name": tc["name"], "args": tc.get("args") or {}, "id": f"call_{uuid.uuid4().hex[:24]}", "type": "tool_call"}
+            for tc in data.get("tool_calls", [])
+        ],
+        id=f"cached-{uuid.uuid4()}",
+        response_metadata={"response_cache": "hit"},
+    )
+
+
+class ResponseCacheBackend(ABC):
+    """缓存后端：保存序列化后的回复，负责 TTL 和 LRU 淘汰"""
+
+    # get/set 是否会阻塞（需要放到线程中执行）
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, payload: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryResponseCache(ResponseCacheBackend):
+    """进程内 LRU + TTL 缓存"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, payload: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseCache(ResponseCacheBackend):
+    """SQLite 缓存：进程重启后仍然有效，同一文件可以被多个 worker 共享"""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            # LRU 淘汰按最近使用时间扫描
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache(last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, payload: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, payload, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE key IN "
+                    "(SELECT key FROM response_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """chat_node 使用的响应缓存入口；backend=none 时 enabled 为 False，所有方法都不做事"""
+
+    def __init__(self):
+        self.settings: Optional[ResponseCacheSettings] = None
+        self.backend: Optional[ResponseCacheBackend] = None
+        self._lock = threading.Lock()
+        self._reset_counts()
+
+    def _reset_counts(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def configure(self, settings: Optional[ResponseCacheSettings] = None):
+        """按配置创建后端；重新配置时关闭旧后端并清零统计"""
+        self.close()
+        self._reset_counts()
+        self.settings = settings or load_response_cache_settings()
+        if self.settings.backend == "none":
+            self.backend = None
+        elif self.settings.backend == "memory":
+            self.backend = InMemoryResponseCache(self.settings.ttl, self.settings.max_entries)
+        elif self.settings.backend == "sqlite":
+            self.backend = SQLiteResponseCache(self.settings.sqlite_path, self.settings.ttl, self.settings.max_entries)
+        else:
+            raise ValueError(f"不支持的响应缓存后端: {self.settings.backend}")
+
+    def _count(self, outcome: str):
+        RESPONSE_CACHE_LOOKUPS.inc(outcome=outcome)
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "miss":
+                self.misses += 1
+            else:
+                self.bypassed += 1
+
+    def record_bypass(self):
+        self._count("bypass")
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        """命中时返回带新 id 的 AIMessage"""
+        backend = self.backend
+        if backend is None:
+            return None
+        payload = await asyncio.to_thread(backend.get, key) if backend.blocking else backend.get(key)
+        self._count("hit" if payload is not None else "miss")
+        return load_response(payload) if payload is not None else None
+
+    async def aset(self, key: str, message: AIMessage):
+        backend = self.backend
+        if backend is None:
+            return
+        payload = dump_response(message)
+        if backend.blocking:
+            await asyncio.to_thread(backend.set, key, payload)
+        else:
+            backend.set(key, payload)
+        with self._lock:
+            self.stores += 1
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        backend = self.backend
+        return {
+            "backend": self.settings.backend if self.settings else None,
+            "ttl": self.settings.ttl if self.settings else None,
+            "max_entries": self.settings.max_entries if self.settings else None,
+            "size": backend.size() if backend else 0,
+            "evictions": getattr(backend, "evictions", 0),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# 进程级单例；main.py 加载 .env 后会按最新的环境变量重新配置
+response_cache = ResponseCache()
+response_cache.configure()
@@ -0,0 +1,90 @@
+"""
+流式输出
+开启 LLM_STREAMING 时 chat_node 用 astream 调用模型，文本和工具调用参数片段一到达就经 AG-UI 推送给前端；
+所有片段合并成完整消息后再做计划/循环判断。同时统计首 token 延迟（TTFT）。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+def streaming_enabled() -> bool:
+    """LLM_STREAMING=true（默认）时启用流式输出"""
+    return os.getenv("LLM_STREAMING", "true").lower() in ("1", "true", "yes", "on")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class StreamingStats:
+    """首 token 延迟和整次调用耗时（只保留最近 window 次调用的样本）"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._ttft: Deque[float] = deque(maxlen=window)
+        self._total: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.chunks = 0
+
+    def record(self, ttft: Optional[float], total: float, chunks: int):
+        with self._lock:
+            self.calls += 1
+            self.chunks += chunks
+            if ttft is not None:
+                self._ttft.append(ttft)
+            self._total.append(total)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft = list(self._ttft)
+            total = list(self._total)
+        return {
+            "enabled": streaming_enabled(),
+            "calls": self.calls,
+            "chunks": self.chunks,
+            "ttft_p50_ms": _percentile(ttft, 0.5) * 1000,
+            "ttft_p95_ms": _percentile(ttft, 0.95) * 1000,
+            "total_p50_ms": _percentile(total, 0.5) * 1000,
+            "total_p95_ms": _percentile(total, 0.95) * 1000,
+        }
+
+
+# 进程级单例
+streaming_stats = StreamingStats()
+
+
+async def astream_response(
+    model: Runnable,
+    messages: List[BaseMessage],
+    config: RunnableConfig,
+) -> Tuple[BaseMessage, Optional[float]]:
+    """
+    流式调用模型并合并所有片段，返回 (完整消息, 首 token 延迟秒数)
+
+    片段通过 astream_events 回调推送，AG-UI 端点据此发送 TEXT_MESSAGE_CONTENT / TOOL_CALL_ARGS
+    （ag_ui_langgraph 的 emit-messages / emit-tool-calls 元数据默认即为开启，不需要额外设置），
+    调用方只拿到合并后的最终消息。
+    """
+    started = time.perf_counter()
+    ttft: Optional[float] = None
+    merged = None
+    chunks = 0
+    async for chunk in model.astream(messages, config):
+        if ttft is None and (chunk.content or getattr(chunk, "tool_call_chunks", None)):
+            ttft = time.perf_counter() - started
+        merged = chunk if merged is None else merged + chunk
+        chunks += 1
+    streaming_stats.record(ttft, time.perf_counter() - started, chunks)
+    if merged is None:
+        return AIMessage(content=""), ttft
+    return message_chunk_to_message(merged), ttft
@@ -0,0 +1,249 @@
+"""
+结构化日志
+替代热路径上的 print()：按级别过滤（默认 INFO，调试输出关闭）、按比例采样 DEBUG 记录、
+对令牌/密码等字段脱敏，并通过有界队列交给后台线程格式化和写出，事件循环上只做一次非阻塞入队；
+队列满时丢弃并计数，不会阻塞请求
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional
+
+ROOT_LOGGER_NAME = "canvas"
+
+# 键名（不区分大小写，- 视为 _）等于、以之结尾或以 "<key>_" 开头时，值在输出前替换为 ***；
+# 例如 access_token、hashed_password、x-api-key，但 prompt_tokens 这类计数不受影响
+DEFAULT_REDACT_KEYS = ("authorization", "token", "password", "secret", "api_key", "apikey", "cookie")
+REDACTED = "***"
+
+
+@dataclass(frozen=True)
+class LogSettings:
+    """日志配置"""
+    level: str = "INFO"
+    format: str = "json"  # json | text
+    debug_sample_rate: float = 1.0  # DEBUG 记录的采样比例，仅在 LOG_LEVEL=DEBUG 时有意义
+    queue_size: int = 10000
+    max_field_chars: int = 2000  # 单个字段的最大长度，超出截断
+    redact_keys: FrozenSet[str] = frozenset(DEFAULT_REDACT_KEYS)
+
+
+def load_log_settings() -> LogSettings:
+    """从环境变量读取日志配置"""
+    extra_keys = [k.strip().lower() for k in os.getenv("LOG_REDACT_KEYS", "").split(",") if k.strip()]
+    return LogSettings(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format=os.getenv("LOG_FORMAT", "json").lower(),
+        debug_sample_rate=min(1.0, max(0.0, float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0")))),
+        queue_size=max(1, int(os.getenv("LOG_QUEUE_SIZE", "10000"))),
+        max_field_chars=int(os.getenv("LOG_MAX_FIELD_CHARS", "2000")),
+        redact_keys=frozenset(DEFAULT_REDACT_KEYS) | frozenset(extra_keys),
+    )
+
+
+def _is_sensitive_key(key: str, redact_keys: FrozenSet[str]) -> bool:
+    normalized = key.lower().replace("-", "_")
+    return any(normalized.endswith(k) or normalized.startswith(k + "_") for k in redact_keys)
+
+
+def redact(value: Any, redact_keys: FrozenSet[str], max_chars: int, _depth: int = 0) -> Any:
+    """递归脱敏并截断，返回可 JSON 序列化的值"""
+    if _depth > 4:
+        return "..."
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            key_str = str(key)
+            if _is_sensitive_key(key_str, redact_keys):
+                out[key_str] = REDACTED
+            else:
+                out[key_str] = redact(item, redact_keys, max_chars, _depth + 1)
+        return out
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [redact(item, redact_keys, max_chars, _depth + 1) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else str(value)
+    if text.startswith("Bearer "):
+        return "Bearer " + REDACTED
+    if len(text) > max_chars:
+        return text[:max_chars] + f"...(+{len(text) - max_chars} chars)"
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """把记录和结构化字段格式化为 JSON 行或 key=value 文本（在后台线程执行）"""
+
+    def __init__(self, settings: LogSettings):
+        super().__init__()
+        self.settings = settings
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = redact(getattr(record, "fields", None) or {}, self.settings.redact_keys, self.settings.max_field_chars)
+        if self.settings.format == "text":
+            parts = [f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"]
+            parts.extend(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}" for key, value in fields.items())
+            text = " ".join(parts)
+        else:
+            text = json.dumps(
+                {
+                    "ts": round(record.created, 3),
+                    "level": record.levelname,
+                    "logger": record.name,
+                    "event": record.getMessage(),
+                    **fields,
+                },
+                ensure_ascii=False,
+                default=str,
+            )
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        elif record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """只做 put_nowait 的队列处理器；格式化留给监听线程，队列满时丢弃"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 默认实现会在调用方线程格式化消息；这里原样入队
+        if record.exc_info:
+            # 异常对象不能跨线程长期持有，先在这里格式化回溯
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class DebugSampler(logging.Filter):
+    """按比例保留 DEBUG 记录，更高级别的记录总是保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class StructuredLogger:
+    """
+    结构化日志接口：logger.info("event", key=value, ...)
+
+    级别未启用时直接返回，不构造任何字段；调用方需要计算开销较大的字段时先检查 is_debug()。
+    """
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def is_debug(self) -> bool:
+        return self._logger.isEnabledFor(logging.DEBUG)
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info: Any = None):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields: Any):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields: Any):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields: Any):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields: Any):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+class LoggingPipeline:
+    """根日志器 -> 采样过滤 -> 非阻塞队列 -> 后台监听线程 -> stdout"""
+
+    def __init__(self):
+        self.settings: Optional[LogSettings] = None
+        self._handler: Optional[NonBlockingQueueHandler] = None
+        self._sampler: Optional[DebugSampler] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Optional[LogSettings] = None, force: bool = False, stream: Any = None):
+        """安装队列处理器并启动监听线程；已配置时只有 force=True 才重新配置"""
+        with self._lock:
+            if self._listener is not None and not force:
+                return
+            self._stop_locked()
+            self.settings = settings or load_log_settings()
+            root = logging.getLogger(ROOT_LOGGER_NAME)
+            root.setLevel(getattr(logging, self.settings.level, logging.INFO))
+            root.propagate = False
+            log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=self.settings.queue_size)
+            self._handler = NonBlockingQueueHandler(log_queue)
+            self._sampler = DebugSampler(self.settings.debug_sample_rate)
+            self._handler.addFilter(self._sampler)
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(StructuredFormatter(self.settings))
+            root.handlers = [self._handler]
+            self._listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+            self._listener.start()
+
+    def _stop_locked(self):
+        if self._listener is not None:
+            self._listener.stop()  # 写完队列中剩余的记录
+            self._listener = None
+
+    def shutdown(self):
+        with self._lock:
+            self._stop_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        handler, sampler = self._handler, self._sampler
+        return {
+            "level": self.settings.level if self.settings else None,
+            "format": self.settings.format if self.settings else None,
+            "debug_sample_rate": self.settings.debug_sample_rate if self.settings else None,
+            "queue_size": handler.queue.qsize() if handler else 0,
+            "queue_capacity": self.settings.queue_size if self.settings else 0,
+            "enqueued": handler.enqueued if handler else 0,
+            "dropped": handler.dropped if handler else 0,
+            "sampled_out": sampler.sampled_out if sampler else 0,
+        }
+
+
+# 进程级单例
+logging_pipeline = LoggingPipeline()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """获取 canvas.<name> 结构化日志器（首次调用时按环境变量配置日志管道）"""
+    logging_pipeline.configure()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}"))
@@ -0,0 +1,126 @@
+"""
+已验证令牌缓存
+按令牌摘要缓存 jwt.decode 的结果和解析出的用户，过期时间不晚于令牌自身的 exp；
+用户被修改或删除时按用户名失效
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+
+@dataclass
+class CachedToken:
+    """一个已验证令牌的缓存项"""
+    payload: Dict[str, Any]
+    username: str
+    user: Any
+    expires_at: float  # time.time() 时间戳
+    user_info: Optional[Dict[str, Any]] = field(default=None)
+
+
+def token_digest(token: str) -> bytes:
+    """缓存键只保存令牌的摘要，不在内存中留存令牌原文"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class VerifiedTokenCache:
+    """有界 TTL + LRU 的已验证令牌缓存"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._by_user: Dict[str, Set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def get(self, key: bytes) -> Optional[CachedToken]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: bytes, payload: Dict[str, Any], user: Any) -> CachedToken:
+        username = payload.get("sub")
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        entry = CachedToken(payload=payload, username=username, user=user, expires_at=expires_at)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_user.setdefault(username, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, key: bytes):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry.username)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry.username]
+
+    def invalidate_user(self, username: str):
+        """用户信息变化（角色、状态、删除）后丢弃该用户的所有缓存令牌"""
+        with self._lock:
+            keys = self._by_user.pop(username, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.invalidations += len(keys)
+
+    def record(self, hit: bool, seconds: float):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "avg_hit_us": (self.hit_seconds / self.hits * 1e6) if self.hits else 0.0,
+            "avg_miss_us": (self.miss_seconds / self.misses * 1e6) if self.misses else 0.0,
+        }
+
+
+# 进程级单例
+token_cache = VerifiedTokenCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_TOKEN_CACHE_TTL", "60")),
+)
@@ -0,0 +1,139 @@
+"""
+前端工具筛选与绑定缓存
+按工具集指纹缓存 bind_tools 的结果，同一组工具只做一次 schema 转换
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.runnables import Runnable
+
+
+def extract_tool_name(tool: Any) -> Optional[str]:
+    """Extract a tool name from either a LangChain tool or an OpenAI function spec dict."""
+    try:
+        # OpenAI tool spec dict: { "type": "function", "function": { "name": "..." } }
+        if isinstance(tool, dict):
+            fn = tool.get("function", {}) if isinstance(tool.get("function", {}), dict) else {}
+            name = fn.get("name") or tool.get("name")
+            if isinstance(name, str) and name.strip():
+                return name
+            return None
+        # LangChain tool object or @tool-decorated function
+        name = getattr(tool, "name", None)
+        if isinstance(name, str) and name.strip():
+            return name
+        return None
+    except Exception:
+        return None
+
+
+def select_frontend_tools(state: Dict[str, Any], allowlist: Iterable[str], max_tools: int) -> List[Any]:
+    """Collect frontend tools from state, then dedupe, allowlist and cap them."""
+    # Frontend tools may arrive either under state["tools"] or within the CopilotKit envelope
+    raw_tools = (state.get("tools", []) or [])
+    try:
+        ck = state.get("copilotkit", {}) or {}
+        raw_actions = ck.get("actions", []) or []
+        if isinstance(raw_actions, list) and raw_actions:
+            raw_tools = [*raw_tools, *raw_actions]
+    except Exception:
+        pass
+
+    allowed = allowlist if isinstance(allowlist, (set, frozenset)) else set(allowlist)
+    deduped_frontend_tools: List[Any] = []
+    seen: set[str] = set()
+    for t in raw_tools:
+        name = extract_tool_name(t)
+        if not name:
+            continue
+        if name not in allowed:
+            continue
+        if name in seen:
+            continue
+        seen.add(name)
+        deduped_frontend_tools.append(t)
+
+    if len(deduped_frontend_tools) > max_tools:
+        deduped_frontend_tools = deduped_frontend_tools[:max_tools]
+    return deduped_frontend_tools
+
+
+def _tool_identity(tool: Any) -> Any:
+    """工具在指纹中的表示：dict 规范取完整内容，LangChain 工具取名称和描述"""
+    if isinstance(tool, dict):
+        return tool
+    return {"name": extract_tool_name(tool), "description": getattr(tool, "description", "")}
+
+
+def tool_set_fingerprint(frontend_tools: List[Any], backend_tools: List[Any], **bind_kwargs: Any) -> str:
+    """计算工具集的稳定指纹（与工具出现顺序相关，顺序决定绑定结果）"""
+    payload = {
+        "frontend": [_tool_identity(t) for t in frontend_tools],
+        "backend": [_tool_identity(t) for t in backend_tools],
+        "bind": bind_kwargs,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class BoundModelCache:
+    """bind_tools 结果的有界 LRU 缓存"""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, Runnable]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_bind(
+        self,
+        model: Any,
+        frontend_tools: List[Any],
+        backend_tools: List[Any],
+        **bind_kwargs: Any,
+    ) -> Runnable:
+        """返回已绑定工具的模型；未命中时调用 model.bind_tools 并缓存"""
+        # 缓存项持有 model 的引用，因此 id(model) 在缓存生命周期内是稳定的
+        key = (id(model), tool_set_fingerprint(frontend_tools, backend_tools, **bind_kwargs))
+        with self._lock:
+            bound = self._entries.get(key)
+            if bound is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return bound
+            self.misses += 1
+
+        bound = model.bind_tools([*frontend_tools, *backend_tools], **bind_kwargs)
+
+        with self._lock:
+            self._entries[key] = bound
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return bound
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+# 进程级单例
+bound_model_cache = BoundModelCache(maxsize=int(os.getenv("BOUND_TOOLS_CACHE_SIZE", "32")))
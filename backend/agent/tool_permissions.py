@@ -0,0 +1,113 @@
+"""
+工具权限索引
+工具到权限的映射、编译后的权限掩码以及各角色掩码对应的可用工具表，进程启动时构建一次且不可变；
+各处的权限过滤都只做字典查找。可用工具只取决于权限掩码，与角色定义无关；
+角色 -> 工具按角色当前的掩码查询，运行时修改 ROLE_PERMISSIONS 后不会读到旧表
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from auth import Permission, Role, ROLE_PERMISSION_MASKS, User, role_permission_mask
+
+# 工具到所需权限的映射；不在表中的工具没有权限要求
+TOOL_PERMISSIONS: Mapping[str, Permission] = MappingProxyType({
+    # 基础画布操作
+    "setGlobalTitle": Permission.WRITE_CANVAS,
+    "setGlobalDescription": Permission.WRITE_CANVAS,
+    "setItemName": Permission.WRITE_CANVAS,
+    "setItemSubtitleOrDescription": Permission.WRITE_CANVAS,
+    "createItem": Permission.WRITE_CANVAS,
+    "deleteItem": Permission.DELETE_CANVAS,
+
+    # 项目管理
+    "setProjectField1": Permission.EDIT_PROJECT,
+    "setProjectField2": Permission.EDIT_PROJECT,
+    "setProjectField3": Permission.EDIT_PROJECT,
+    "clearProjectField3": Permission.EDIT_PROJECT,
+    "addProjectChecklistItem": Permission.EDIT_PROJECT,
+    "setProjectChecklistItem": Permission.EDIT_PROJECT,
+    "removeProjectChecklistItem": Permission.EDIT_PROJECT,
+
+    # 实体管理
+    "setEntityField1": Permission.EDIT_ENTITY,
+    "setEntityField2": Permission.EDIT_ENTITY,
+    "addEntityField3": Permission.EDIT_ENTITY,
+    "removeEntityField3": Permission.EDIT_ENTITY,
+
+    # 笔记管理
+    "setNoteField1": Permission.EDIT_NOTE,
+    "appendNoteField1": Permission.EDIT_NOTE,
+    "clearNoteField1": Permission.EDIT_NOTE,
+
+    # 图表管理
+    "addChartField1": Permission.EDIT_CHART,
+    "setChartField1Label": Permission.EDIT_CHART,
+    "setChartField1Value": Permission.EDIT_CHART,
+    "clearChartField1Value": Permission.EDIT_CHART,
+    "removeChartField1": Permission.EDIT_CHART,
+
+    # 计划管理
+    "set_plan": Permission.CREATE_PLAN,
+    "update_plan_progress": Permission.EXECUTE_PLAN,
+    "complete_plan": Permission.MANAGE_PLAN,
+})
+
+
+@dataclass(frozen=True)
+class ToolPermissionIndex:
+    """不可变的工具权限索引"""
+    tool_permissions: Mapping[str, Permission]
+    tool_masks: Mapping[str, int]
+    # 权限掩码 -> 可用工具（按映射表顺序）；预先为构建时每个角色的掩码计算
+    tools_by_mask: Mapping[int, Tuple[str, ...]]
+
+    def required_permission(self, tool_name: str) -> Optional[Permission]:
+        return self.tool_permissions.get(tool_name)
+
+    def can_access(self, mask: int, tool_name: str) -> bool:
+        """没有权限要求的工具默认允许"""
+        required = self.tool_masks.get(tool_name, 0)
+        return mask & required == required
+
+    def tools_for_mask(self, mask: int) -> Tuple[str, ...]:
+        tools = self.tools_by_mask.get(mask)
+        if tools is None:
+            # 单独调整过权限的用户：不落入缓存，保持索引不可变
+            tools = _compute_tools(self.tool_masks, mask)
+        return tools
+
+    def tools_for_user(self, user: User) -> Tuple[str, ...]:
+        return self.tools_for_mask(user.permission_mask)
+
+    def tools_for_role(self, role: Role) -> Tuple[str, ...]:
+        return self.tools_for_mask(role_permission_mask(role))
+
+    def filter_names(self, mask: int, tool_names: Iterable[str]) -> List[str]:
+        return [name for name in tool_names if self.can_access(mask, name)]
+
+
+def _compute_tools(tool_masks: Mapping[str, int], mask: int) -> Tuple[str, ...]:
+    return tuple(name for name, required in tool_masks.items() if mask & required == required)
+
+
+def build_tool_permission_index(
+    tool_permissions: Mapping[str, Permission] = TOOL_PERMISSIONS,
+    role_masks: Mapping[Role, int] = ROLE_PERMISSION_MASKS,
+) -> ToolPermissionIndex:
+    """编译工具权限掩码并预先计算每个角色掩码的可用工具"""
+    tool_masks = {name: permission.bit for name, permission in tool_permissions.items()}
+    tools_by_mask: Dict[int, Tuple[str, ...]] = {}
+    for mask in role_masks.values():
+        if mask not in tools_by_mask:
+            tools_by_mask[mask] = _compute_tools(tool_masks, mask)
+    return ToolPermissionIndex(
+        tool_permissions=MappingProxyType(dict(tool_permissions)),
+        tool_masks=MappingProxyType(tool_masks),
+        tools_by_mask=MappingProxyType(tools_by_mask),
+    )
+
+
+# 进程级单例
+tool_permission_index = build_tool_permission_index()
@@ -0,0 +1,269 @@
+"""
+链路追踪
+OpenTelemetry 兼容的 span：HTTP 请求、认证、graph 节点、工具绑定、LLM 请求和检查点读写，
+都带 thread_id 和 user 属性。导出器由 TRACING_EXPORTER 选择（none / console / file / memory / otlp），
+默认关闭，此时 span() 返回共享的空上下文，没有额外开销。需要安装 opentelemetry-sdk（otlp 另需对应导出器）
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+# 子 span 缺少这些属性时从父 span 继承
+INHERITED_ATTRIBUTES = ("thread_id", "user")
+
+
+@dataclass(frozen=True)
+class TracingSettings:
+    """追踪配置"""
+    exporter: str = "none"  # none | console | file | memory | otlp
+    file_path: str = "traces.jsonl"
+    sample_ratio: float = 1.0
+    service_name: str = "canvas-agent"
+
+
+def load_tracing_settings() -> TracingSettings:
+    """从环境变量读取追踪配置"""
+    return TracingSettings(
+        exporter=os.getenv("TRACING_EXPORTER", "none").lower(),
+        file_path=os.getenv("TRACING_FILE_PATH", "traces.jsonl"),
+        sample_ratio=min(1.0, max(0.0, float(os.getenv("TRACING_SAMPLE_RATIO", "1.0")))),
+        service_name=os.getenv("OTEL_SERVICE_NAME", "canvas-agent"),
+    )
+
+
+class _NoopSpan:
+    """追踪关闭时的占位 span"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+
+class _NoopSpanContext:
+    """可重复使用的空上下文管理器"""
+
+    def __enter__(self) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_CONTEXT = _NoopSpanContext()
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """OTel 属性只接受基本类型及其序列，去掉 None"""
+    out = {}
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, bool, int, float)):
+            out[key] = value
+        elif isinstance(value, (list, tuple)):
+            out[key] = [v if isinstance(v, (str, bool, int, float)) else str(v) for v in value if v is not None]
+        else:
+            out[key] = str(value)
+    return out
+
+
+def _make_file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class FileSpanExporter(SpanExporter):
+        """每个 span 一行 JSON，便于离线按耗时排序查找长尾"""
+
+        def __init__(self):
+            self._lock = threading.Lock()
+            self._file = open(path, "a", encoding="utf-8")
+
+        def export(self, spans: Sequence[Any]):
+            lines = []
+            for s in spans:
+                lines.append(json.dumps({
+                    "name": s.name,
+                    "trace_id": format(s.context.trace_id, "032x"),
+                    "span_id": format(s.context.span_id, "016x"),
+                    "parent_id": format(s.parent.span_id, "016x") if s.parent else None,
+                    "start": s.start_time / 1e9,
+                    "duration_ms": (s.end_time - s.start_time) / 1e6,
+                    "status": s.status.status_code.name,
+                    "attributes": dict(s.attributes or {}),
+                }, ensure_ascii=False, default=str))
+            with self._lock:
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            with self._lock:
+                self._file.close()
+
+    return FileSpanExporter()
+
+
+def _make_inherit_processor():
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import SpanProcessor
+
+    class InheritAttributesProcessor(SpanProcessor):
+        """把 thread_id / user 从父 span 复制到子 span（检查点等处拿不到用户信息）"""
+
+        def on_start(self, span, parent_context=None):
+            parent = trace.get_current_span(parent_context)
+            attributes = getattr(parent, "attributes", None)
+            if not attributes:
+                return
+            own = span.attributes or {}
+            for key in INHERITED_ATTRIBUTES:
+                if key not in own and key in attributes:
+                    span.set_attribute(key, attributes[key])
+
+    return InheritAttributesProcessor()
+
+
+class Tracing:
+    """追踪入口：span(name, **attributes) 作为上下文管理器使用"""
+
+    def __init__(self):
+        self.settings: Optional[TracingSettings] = None
+        self.enabled = False
+        self.memory_exporter: Any = None  # exporter=memory 时可通过 get_finished_spans() 读取
+        self._provider: Any = None
+        self._tracer: Any = None
+
+    def configure(self, settings: Optional[TracingSettings] = None):
+        """按配置创建 TracerProvider；exporter=none 时关闭追踪"""
+        self.shutdown()
+        self.settings = settings or load_tracing_settings()
+        self.enabled = False
+        self.memory_exporter = None
+        if self.settings.exporter == "none":
+            return
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+            from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        except ImportError as e:
+            raise RuntimeError("TRACING_EXPORTER 需要 opentelemetry-sdk：pip install opentelemetry-sdk") from e
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": self.settings.service_name}),
+            sampler=ParentBased(TraceIdRatioBased(self.settings.sample_ratio)),
+        )
+        provider.add_span_processor(_make_inherit_processor())
+        if self.settings.exporter == "memory":
+            from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+            self.memory_exporter = InMemorySpanExporter()
+            # 测试中需要在请求结束后立即读取，同步导出
+            provider.add_span_processor(SimpleSpanProcessor(self.memory_exporter))
+        elif self.settings.exporter == "console":
+            provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+        elif self.settings.exporter == "file":
+            provider.add_span_processor(BatchSpanProcessor(_make_file_exporter(self.settings.file_path)))
+        elif self.settings.exporter == "otlp":
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            except ImportError as e:
+                raise RuntimeError("TRACING_EXPORTER=otlp 需要 opentelemetry-exporter-otlp-proto-http") from e
+            # 端点等参数由标准的 OTEL_EXPORTER_OTLP_* 环境变量指定
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        else:
+            raise ValueError(f"不支持的追踪导出器: {self.settings.exporter}")
+        self._provider = provider
+        self._tracer = provider.get_tracer("canvas-agent")
+        self.enabled = True
+
+    def span(self, name: str, **attributes: Any):
+        """打开一个子 span；追踪关闭时返回空上下文"""
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        return self._tracer.start_as_current_span(name, attributes=_clean(attributes))
+
+    def node_span(self, name: str, args: Sequence[Any]):
+        """graph 节点的 span，属性从 (state, config) 中提取"""
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        return self.span(f"node.{name}", **node_attributes(args))
+
+    def shutdown(self):
+        """导出剩余的 span"""
+        if self._provider is not None:
+            self._provider.shutdown()
+            self._provider = None
+            self._tracer = None
+        self.enabled = False
+
+
+def annotate_current_span(**attributes: Any):
+    """给当前 span 补充属性（例如认证后才知道的用户名）"""
+    if tracing.enabled:
+        from opentelemetry import trace
+        trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def set_span_attributes(span: Any, **attributes: Any):
+    """给 span 补充属性（忽略 None）"""
+    if span is not _NOOP_SPAN:
+        span.set_attributes(_clean(attributes))
+
+
+def node_attributes(args: Sequence[Any]) -> Dict[str, Any]:
+    """从节点参数 (state, config) 中取出 thread_id 和用户名"""
+    state = args[0] if args else None
+    config = args[1] if len(args) > 1 else None
+    user_info = state.get("user_info") if isinstance(state, dict) else None
+    configurable = (config or {}).get("configurable") or {}
+    if not user_info:
+        user_info = configurable.get("user_info")
+    return {
+        "thread_id": configurable.get("thread_id"),
+        "user": (user_info or {}).get("username"),
+    }
+
+
+class TracingMiddleware:
+    """ASGI 中间件：为每个 HTTP 请求建立根 span，覆盖到流式响应结束"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+        status: List[int] = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        with tracing.span(f"HTTP {scope['method']} {scope['path']}", **{
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        }) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                set_span_attributes(
+                    span,
+                    **{"http.status_code": status[0] if status else None, "http.duration_ms": (time.perf_counter() - started) * 1000},
+                )
+
+
+# 进程级单例；main.py 加载 .env 后会按最新的环境变量重新配置
+tracing = Tracing()
+tracing.configure()
@@ -0,0 +1,517 @@
+"""
+用户存储
+UserRepository 接口及两个实现：进程内的 memory（默认，单 worker 开发用）和 SQLite（多个 worker 共享同一个数据库文件）。
+memory 实现按 id 以及 (角色, is_active) 维护有序索引；SQLite 实现使用连接池和 username/id/role/is_active 索引，支持按 id 的键集分页，前面加一层有界 TTL 读缓存；异步方法在线程池中执行，不阻塞事件循环
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class UserStoreSettings:
+    """用户存储配置"""
+    backend: str = "memory"  # memory | sqlite
+    sqlite_path: str = "users.sqlite"
+    pool_size: int = 4
+    cache_ttl: float = 5.0  # 读缓存的有效期（秒）；其他 worker 的修改最多延迟这么久可见
+    cache_size: int = 1024
+
+
+def load_user_store_settings() -> UserStoreSettings:
+    """从环境变量读取用户存储配置"""
+    return UserStoreSettings(
+        backend=os.getenv("USER_STORE_BACKEND", "memory").lower(),
+        sqlite_path=os.getenv("USER_STORE_SQLITE_PATH", "users.sqlite"),
+        pool_size=max(1, int(os.getenv("USER_STORE_POOL_SIZE", "4"))),
+        cache_ttl=float(os.getenv("USER_STORE_CACHE_TTL", "5")),
+        cache_size=int(os.getenv("USER_STORE_CACHE_SIZE", "1024")),
+    )
+
+
+class UserRepository(ABC):
+    """
+    用户存储接口
+
+    同步方法供同步代码（FastAPI 同步依赖、启动初始化）使用；异步方法默认通过 asyncio.to_thread 调用同步方法。
+    """
+
+    @abstractmethod
+    def get_by_username(self, username: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def get_by_id(self, user_id: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def add(self, user: Any) -> None:
+        """新增用户；用户名已存在时抛出 ValueError"""
+
+    @abstractmethod
+    def update(self, user: Any) -> None:
+        """保存用户的修改"""
+
+    @abstractmethod
+    def delete(self, user_id: str) -> bool:
+        """删除用户，返回是否存在"""
+
+    @abstractmethod
+    def list_users(self) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def list_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        """按 id 升序返回 id 大于 after 的最多 limit 个用户（键集分页），可按角色和启用状态过滤"""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+    def close(self):
+        pass
+
+    async def aget_by_username(self, username: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get_by_username, username)
+
+    async def aget_by_id(self, user_id: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get_by_id, user_id)
+
+    async def aadd(self, user: Any) -> None:
+        await asyncio.to_thread(self.add, user)
+
+    async def aupdate(self, user: Any) -> None:
+        await asyncio.to_thread(self.update, user)
+
+    async def adelete(self, user_id: str) -> bool:
+        return await asyncio.to_thread(self.delete, user_id)
+
+    async def alist_users(self) -> List[Any]:
+        return await asyncio.to_thread(self.list_users)
+
+    async def alist_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        return await asyncio.to_thread(self.list_page, after, limit, role, is_active)
+
+    async def aiter_pages(
+        self,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        after: Optional[str] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[List[Any]]:
+        """按批遍历用户，每次只加载一页"""
+        while True:
+            page = await self.alist_page(after, batch_size, role, is_active)
+            if page:
+                yield page
+            if len(page) < batch_size:
+                return
+            after = page[-1].id
+
+
+def _role_value(role: Any) -> Optional[str]:
+    """Role 枚举或字符串统一为字符串值"""
+    return getattr(role, "value", role)
+
+
+class InMemoryUserRepository(UserRepository):
+    """进程内字典存储（每个 worker 各有一份，仅用于开发和单 worker 部署）"""
+
+    def __init__(self):
+        self.users: Dict[str, Any] = {}
+        self._by_id: Dict[str, Any] = {}
+        # 有序 id 索引（分页），以及按 (角色, is_active) 过滤的有序 id 索引；None 表示不按该字段过滤
+        self._ids: List[str] = []
+        self._ids_by_filter: Dict[Tuple[Optional[str], Optional[bool]], List[str]] = {}
+        self._indexed: Dict[str, Tuple[str, bool]] = {}
+        self._lock = threading.Lock()
+
+    def get_by_username(self, username: str) -> Optional[Any]:
+        return self.users.get(username)
+
+    def get_by_id(self, user_id: str) -> Optional[Any]:
+        return self._by_id.get(user_id)
+
+    @staticmethod
+    def _filter_keys(role: str, is_active: bool) -> Tuple[Tuple[Optional[str], Optional[bool]], ...]:
+        return ((role, None), (None, is_active), (role, is_active))
+
+    def _index(self, user: Any):
+        key = (_role_value(user.role), bool(user.is_active))
+        for filter_key in self._filter_keys(*key):
+            bisect.insort(self._ids_by_filter.setdefault(filter_key, []), user.id)
+        self._indexed[user.id] = key
+
+    def _unindex(self, user_id: str):
+        key = self._indexed.pop(user_id, None)
+        if key is None:
+            return
+        for filter_key in self._filter_keys(*key):
+            ids = self._ids_by_filter[filter_key]
+            i = bisect.bisect_left(ids, user_id)
+            if i < len(ids) and ids[i] == user_id:
+                del ids[i]
+
+    def add(self, user: Any) -> None:
+        with self._lock:
+            if user.username in self.users or user.id in self._by_id:
+                raise ValueError("用户已存在")
+            self.users[user.username] = user
+            self._by_id[user.id] = user
+            bisect.insort(self._ids, user.id)
+            self._index(user)
+
+    def update(self, user: Any) -> None:
+        # 对象本身就是存储的值，修改已经生效；只需在角色或 is_active 变化时更新过滤索引
+        with self._lock:
+            self.users[user.username] = user
+            self._by_id[user.id] = user
+            if self._indexed.get(user.id) != (_role_value(user.role), bool(user.is_active)):
+                self._unindex(user.id)
+                self._index(user)
+
+    def delete(self, user_id: str) -> bool:
+        with self._lock:
+            user = self._by_id.pop(user_id, None)
+            if user is None:
+                return False
+            del self.users[user.username]
+            i = bisect.bisect_left(self._ids, user_id)
+            del self._ids[i]
+            self._unindex(user_id)
+            return True
+
+    def list_users(self) -> List[Any]:
+        return list(self.users.values())
+
+    def list_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        if role is None and is_active is None:
+            ids = self._ids
+        else:
+            ids = self._ids_by_filter.get((_role_value(role) if role is not None else None, is_active), [])
+        start = bisect.bisect_right(ids, after) if after is not None else 0
+        return [self._by_id[user_id] for user_id in ids[start:start + limit]]
+
+    def count(self) -> int:
+        return len(self.users)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "users": len(self.users)}
+
+    # 纯内存操作不需要切换线程
+    async def aget_by_username(self, username: str) -> Optional[Any]:
+        return self.get_by_username(username)
+
+    async def aget_by_id(self, user_id: str) -> Optional[Any]:
+        return self.get_by_id(user_id)
+
+    async def aadd(self, user: Any) -> None:
+        self.add(user)
+
+    async def aupdate(self, user: Any) -> None:
+        self.update(user)
+
+    async def adelete(self, user_id: str) -> bool:
+        return self.delete(user_id)
+
+    async def alist_users(self) -> List[Any]:
+        return self.list_users()
+
+    async def alist_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        return self.list_page(after, limit, role, is_active)
+
+
+_USER_COLUMNS = "id, username, email, hashed_password, role, permissions, is_active, created_at, last_login"
+
+
+def _user_to_row(user: Any) -> Tuple:
+    return (
+        user.id,
+        user.username,
+        user.email,
+        user.hashed_password,
+        user.role.value,
+        json.dumps([p.value for p in user.permissions]),
+        1 if user.is_active else 0,
+        user.created_at.isoformat() if user.created_at else None,
+        user.last_login.isoformat() if user.last_login else None,
+    )
+
+
+def _row_to_user(row: sqlite3.Row) -> Any:
+    from auth import Permission, Role, User
+    return User(
+        id=row["id"],
+        username=row["username"],
+        email=row["email"],
+        hashed_password=row["hashed_password"],
+        role=Role(row["role"]),
+        permissions=[Permission(v) for v in json.loads(row["permissions"] or "[]")],
+        is_active=bool(row["is_active"]),
+        created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
+        last_login=datetime.fromisoformat(row["last_login"]) if row["last_login"] else None,
+    )
+
+
+class SQLiteUserRepository(UserRepository):
+    """SQLite 用户存储，同一数据库文件可以被多个 worker 进程共享"""
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._connections: List[sqlite3.Connection] = []
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL 允许读写并发；多个 worker 同时写时由 busy timeout 排队
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.append(conn)
+            self._pool.put(conn)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "id TEXT PRIMARY KEY, username TEXT NOT NULL, email TEXT NOT NULL, hashed_password TEXT NOT NULL, "
+                "role TEXT NOT NULL, permissions TEXT NOT NULL, is_active INTEGER NOT NULL DEFAULT 1, "
+                "created_at TEXT, last_login TEXT)"
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+            # 分页按 id 顺序扫描；过滤条件与 id 组成复合索引，翻页时直接从游标位置开始
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_id ON users(role, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_active_id ON users(is_active, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_active_id ON users(role, is_active, id)")
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            with conn:  # 提交或回滚
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _fetch_one(self, sql: str, params: Tuple) -> Optional[Any]:
+        with self._connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return _row_to_user(row) if row else None
+
+    def get_by_username(self, username: str) -> Optional[Any]:
+        return self._fetch_one(f"SELECT {_USER_COLUMNS} FROM users WHERE username = ?", (username,))
+
+    def get_by_id(self, user_id: str) -> Optional[Any]:
+        return self._fetch_one(f"SELECT {_USER_COLUMNS} FROM users WHERE id = ?", (user_id,))
+
+    def add(self, user: Any) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute(f"INSERT INTO users ({_USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", _user_to_row(user))
+        except sqlite3.IntegrityError as e:
+            raise ValueError("用户已存在") from e
+
+    def update(self, user: Any) -> None:
+        row = _user_to_row(user)
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE users SET username = ?, email = ?, hashed_password = ?, role = ?, permissions = ?, "
+                "is_active = ?, created_at = ?, last_login = ? WHERE id = ?",
+                (*row[1:], row[0]),
+            )
+
+    def delete(self, user_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount > 0
+
+    def list_users(self) -> List[Any]:
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT {_USER_COLUMNS} FROM users ORDER BY created_at, id").fetchall()
+        return [_row_to_user(row) for row in rows]
+
+    def list_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if role is not None:
+            clauses.append("role = ?")
+            params.append(_role_value(role))
+        if is_active is not None:
+            clauses.append("is_active = ?")
+            params.append(1 if is_active else 0)
+        if after is not None:
+            clauses.append("id > ?")
+            params.append(after)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT {_USER_COLUMNS} FROM users{where} ORDER BY id LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [_row_to_user(row) for row in rows]
+
+    def count(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, "pool_size": self.pool_size, "idle_connections": self._pool.qsize()}
+
+
+class CachedUserRepository(UserRepository):
+    """
+    读缓存：按 username 缓存用户对象（有界 LRU + TTL），写操作同步失效
+
+    缓存只在本进程内有效，其他 worker 的修改在 TTL 内可能不可见。
+    """
+
+    def __init__(self, inner: UserRepository, ttl: float = 5.0, maxsize: int = 1024):
+        self.inner = inner
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cached(self, username: str) -> Tuple[bool, Optional[Any]]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return True, entry[1]
+
+    def _store(self, username: str, user: Optional[Any]):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: Optional[str] = None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def get_by_username(self, username: str) -> Optional[Any]:
+        found, user = self._get_cached(username)
+        if found:
+            return user
+        user = self.inner.get_by_username(username)
+        # 不存在的用户也缓存（None），避免对无效用户名的重复查询
+        self._store(username, user)
+        return user
+
+    def get_by_id(self, user_id: str) -> Optional[Any]:
+        return self.inner.get_by_id(user_id)
+
+    def add(self, user: Any) -> None:
+        self.invalidate(user.username)
+        self.inner.add(user)
+        self.invalidate(user.username)
+
+    def update(self, user: Any) -> None:
+        self.inner.update(user)
+        self.invalidate(user.username)
+
+    def delete(self, user_id: str) -> bool:
+        user = self.inner.get_by_id(user_id)
+        deleted = self.inner.delete(user_id)
+        self.invalidate(user.username if user is not None else None)
+        return deleted
+
+    def list_users(self) -> List[Any]:
+        return self.inner.list_users()
+
+    def list_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        role: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Any]:
+        return self.inner.list_page(after, limit, role, is_active)
+
+    def count(self) -> int:
+        return self.inner.count()
+
+    def close(self):
+        self.inner.close()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            **self.inner.stats(),
+            "cache_size": len(self._entries),
+            "cache_ttl_seconds": self.ttl,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+def create_user_repository(settings: Optional[UserStoreSettings] = None) -> UserRepository:
+    """按配置创建用户存储"""
+    settings = settings or load_user_store_settings()
+    if settings.backend == "memory":
+        return InMemoryUserRepository()
+    if settings.backend == "sqlite":
+        return CachedUserRepository(
+            SQLiteUserRepository(settings.sqlite_path, pool_size=settings.pool_size),
+            ttl=settings.cache_ttl,
+            maxsize=settings.cache_size,
+        )
+    raise ValueError(f"不支持的用户存储后端: {settings.backend}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+只读查询快速路径基准
+在 10 / 100 / 1,000 个条目的画布上，用一组典型的用户消息（只读问题、修改请求、模糊问题各占一部分）测量：
+- 命中率：不调用 LLM 直接回答的比例
+- 误答：修改请求被快速路径回答的次数（必须为 0）
+- 每条消息的平均耗时（包括建立索引）
+
+用法：
+    python backend/benchmarks/bench_fast_path.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_items_summary import make_item  # noqa: E402
+from fast_path import CanvasQueryEngine, FastPathStats  # noqa: E402
+
+SIZES = [10, 100, 1000]
+
+READ_ONLY = [
+    "What's the title?",
+    "what is the canvas description",
+    "list my charts",
+    "show me all notes",
+    "How many projects are there?",
+    "which entities do we have",
+    "what is the subtitle of item 0003",
+    "what is the due date of {project}",
+    "what is the checklist of {project}?",
+    "what's the value of {metric} in {chart}",
+    "what are the metrics of {chart}",
+    "what is the content of {note}",
+]
+MUTATIONS = [
+    "rename {project} to Apollo",
+    "set the title to Roadmap",
+    "add a metric to {chart}",
+    "delete {note}",
+    "create a new chart with random values",
+    "mark the checklist item done",
+]
+OPEN_ENDED = [
+    "summarize the canvas",
+    "which project is most at risk?",
+    "what should I work on next",
+    "compare the charts",
+]
+
+
+def make_items(n: int):
+    return [make_item(i) for i in range(n)]
+
+
+def first_of(items, item_type):
+    return next(i for i in items if i.get("type") == item_type)
+
+
+def render(template: str, items) -> str:
+    chart = first_of(items, "chart")
+    metrics = chart.get("data", {}).get("field1") or [{"label": "Metric"}]
+    return template.format(
+        project=first_of(items, "project")["name"],
+        note=first_of(items, "note")["name"],
+        chart=chart["name"],
+        metric=metrics[0]["label"],
+    )
+
+
+def main():
+    print(f"{'items':>6} {'queries':>8} {'answered':>9} {'hit rate':>9} {'read-only hit':>14} {'mutations answered':>19} {'us/query':>9}")
+    for n in SIZES:
+        items = make_items(n)
+        state = {"items": items, "globalTitle": "Bench", "globalDescription": "Benchmark canvas"}
+        read_only = [render(q, items) for q in READ_ONLY]
+        mutations = [render(q, items) for q in MUTATIONS]
+        corpus = read_only + mutations + OPEN_ENDED
+
+        engine = CanvasQueryEngine(FastPathStats())
+        answered_read_only = sum(engine.answer(state, q, 0.8) is not None for q in read_only)
+        answered_mutations = sum(engine.answer(state, q, 0.8) is not None for q in mutations)
+        answered_open = sum(engine.answer(state, q, 0.8) is not None for q in OPEN_ENDED)
+        answered = answered_read_only + answered_mutations + answered_open
+
+        number = max(5, 2000 // n)
+        seconds = min(timeit.repeat(lambda: [engine.answer(state, q, 0.8) for q in corpus], number=number, repeat=3))
+        per_query_us = seconds / number / len(corpus) * 1e6
+        print(
+            f"{n:>6} {len(corpus):>8} {answered:>9} {answered / len(corpus):>9.0%} "
+            f"{answered_read_only / len(read_only):>14.0%} {answered_mutations:>19} {per_query_us:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+图级负载/延迟基准
+用进程内的假聊天模型（fake_llm.py，可脚本化工具调用序列和延迟）驱动：
+- graph：直接调用编译好的 agent.graph（astream, stream_mode="updates"）
+- app：通过 httpx.ASGITransport 调用 FastAPI 应用的 AG-UI 端点（/langgraph，SSE）
+
+在不同并发数和画布条目数下报告每轮的 p50/p95/p99 延迟、每秒完成轮数、
+每轮的图步数以及 Python 分配的峰值内存（tracemalloc，会拖慢运行，可用 --no-tracemalloc 关闭）。
+
+用法：
+    python backend/benchmarks/bench_graph_load.py
+    python backend/benchmarks/bench_graph_load.py --target app --scenario frontend --concurrency 1,16 --items 100
+    python backend/benchmarks/bench_graph_load.py --latency-ms 200 --chunk-latency-ms 5 --turns 64
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+import warnings
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from bench_items_summary import make_item  # noqa: E402
+from fake_llm import SCRIPTS, make_fake_model  # noqa: E402
+
+ADMIN = {"username": "admin", "role": "admin", "permissions": [], "user_id": "admin"}
+PROMPTS = {
+    "chat": "What is on the canvas?",
+    "plan": "Create a note and fill in its fields",
+    "frontend": "Create a note",
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def graph_turn(graph, scenario: str, items: List[Dict[str, Any]]) -> int:
+    """直接调用 graph 跑一轮，返回图步数（节点更新次数）"""
+    config = {"configurable": {"thread_id": str(uuid.uuid4()), "user_info": ADMIN}}
+    inputs = {"messages": [HumanMessage(content=PROMPTS[scenario])], "items": items, "globalTitle": "Bench"}
+    steps = 0
+    async for _ in graph.astream(inputs, config, stream_mode="updates"):
+        steps += 1
+    return steps
+
+
+async def app_turn(client, scenario: str, items: List[Dict[str, Any]]) -> int:
+    """通过 AG-UI 端点跑一轮，返回图步数（STEP_STARTED 事件数）"""
+    body = {
+        "threadId": str(uuid.uuid4()),
+        "runId": str(uuid.uuid4()),
+        "state": {"items": items, "globalTitle": "Bench", "globalDescription": ""},
+        "messages": [{"id": str(uuid.uuid4()), "role": "user", "content": PROMPTS[scenario]}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+    steps = 0
+    async with client.stream("POST", "/langgraph", json=body, headers={"Accept": "text/event-stream"}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            if event.get("type") == "STEP_STARTED":
+                steps += 1
+            elif event.get("type") == "RUN_ERROR":
+                raise RuntimeError(event.get("message"))
+    return steps
+
+
+async def run_level(turn, concurrency: int, turns: int) -> Dict[str, Any]:
+    """以固定并发跑 turns 轮，返回延迟分布和吞吐"""
+    latencies: List[float] = []
+    steps: List[int] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(turns):
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            steps.append(await turn())
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "rps": turns / elapsed if elapsed else 0.0,
+        "steps": sum(steps) / len(steps) if steps else 0.0,
+    }
+
+
+async def main(args):
+    # 节点内有大量调试输出，运行期间重定向到 /dev/null
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        import agent
+        model = make_fake_model(args.scenario, args.latency_ms, args.chunk_latency_ms)
+        agent.get_chat_model = lambda: model
+        client = None
+        if args.target == "app":
+            import httpx
+            import main as app_module
+            await app_module.checkpointer.setup()
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://bench", timeout=None)
+
+    print(f"target={args.target} scenario={args.scenario} script_len={len(SCRIPTS[args.scenario])} "
+          f"latency={args.latency_ms}ms+{args.chunk_latency_ms}ms/chunk streaming={os.getenv('LLM_STREAMING', 'true')}")
+    print(f"{'items':>6} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'turns/s':>9} {'steps':>6} {'peak MB':>8}")
+    try:
+        for n_items in args.items:
+            items = [make_item(i) for i in range(n_items)]
+            if args.target == "app":
+                turn = lambda: app_turn(client, args.scenario, items)  # noqa: E731
+            else:
+                turn = lambda: graph_turn(agent.graph, args.scenario, items)  # noqa: E731
+            for concurrency in args.concurrency:
+                with contextlib.redirect_stdout(devnull):
+                    await run_level(turn, concurrency, min(args.turns, concurrency * 2))  # 预热
+                    if args.tracemalloc:
+                        tracemalloc.start()
+                    result = await run_level(turn, concurrency, args.turns)
+                    peak_mb = 0.0
+                    if args.tracemalloc:
+                        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                        tracemalloc.stop()
+                print(
+                    f"{n_items:>6} {concurrency:>5} {result['p50']:>9.1f} {result['p95']:>9.1f} {result['p99']:>9.1f} "
+                    f"{result['rps']:>9.1f} {result['steps']:>6.1f} {peak_mb:>8.1f}"
+                )
+    finally:
+        if client is not None:
+            await client.aclose()
+        devnull.close()
+    # ru_maxrss 在 Linux 上以 KB 为单位
+    print(f"process max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["graph", "app"], default="graph")
+    parser.add_argument("--scenario", choices=sorted(SCRIPTS), default="plan")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32])
+    parser.add_argument("--items", type=lambda s: [int(x) for x in s.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--turns", type=int, default=64, help="每个并发档位完成的轮数")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="假模型的首 token 延迟")
+    parser.add_argument("--chunk-latency-ms", type=float, default=0.0, help="假模型流式输出每个片段的延迟")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+条目选择判断的开销
+一轮计划执行中 chat_node 会被调用多次（工具结果之后、计划自动继续），而用户消息始终是同一条。
+比较两种做法在一轮中花在判断上的总时间：
+- 原来的做法：每次调用都在整个消息历史里找最后一条用户消息，转两次小写，逐个扫描关键词列表
+- ItemChoiceGate：只在最后一条消息是用户消息时判断，正则预编译，结果按消息 id 缓存
+
+用法：
+    python backend/benchmarks/bench_item_choice.py
+"""
+
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+
+from item_choice import ItemChoiceGate  # noqa: E402
+
+# 每轮 chat_node 的调用次数（1 = 没有工具调用的普通问答）
+CALLS_PER_TURN = [1, 5, 13, 25]
+HISTORY = 40
+ITEMS = [{"id": f"{i:04d}", "type": "note", "name": f"Note {i}"} for i in range(50)]
+TURNS = 2000
+
+
+def legacy_check(messages) -> bool:
+    last_user = next((m for m in reversed(messages) if getattr(m, "type", "") == "human"), None)
+    return bool(
+        last_user
+        and any(k in last_user.content.lower() for k in ["item", "rename", "owner", "priority", "status"])
+        and not any(k in last_user.content.lower() for k in ["prj_", "item id", "id="])
+    )
+
+
+def make_history():
+    history = []
+    for i in range(HISTORY // 2):
+        history.append(HumanMessage(content=f"please summarize the canvas section {i} " * 5, id=str(uuid.uuid4())))
+        history.append(AIMessage(content="Done.", id=str(uuid.uuid4())))
+    return history
+
+
+def make_turn(history, calls: int):
+    """返回一轮中每次 chat_node 调用时看到的消息列表（每轮一条新的用户消息）"""
+    question = HumanMessage(content="Create a project for the launch and fill in its checklist " * 3, id=str(uuid.uuid4()))
+    views = [history + [question]]
+    tail = [question]
+    for i in range(calls - 1):
+        tail = tail + [
+            AIMessage(content="", tool_calls=[{"name": "setItemName", "args": {}, "id": f"c{i}"}]),
+            ToolMessage(content="ok", tool_call_id=f"c{i}"),
+        ]
+        views.append(history + tail)
+    return views
+
+
+def main():
+    history = make_history()
+    print(f"{'calls/turn':>11} {'legacy us/turn':>15} {'gate us/turn':>13} {'speedup':>8}")
+    for calls in CALLS_PER_TURN:
+        turns = [make_turn(history, calls) for _ in range(TURNS)]
+        legacy = min(timeit.repeat(lambda: [legacy_check(v) for views in turns for v in views], number=1, repeat=3))
+
+        def gated():
+            # 进程级 gate；每轮的用户消息 id 不同，包含第一次判断（缓存未命中）的开销
+            gate = ItemChoiceGate()
+            return [gate.should_ask(v, ITEMS) for views in turns for v in views]
+
+        gate = min(timeit.repeat(gated, number=1, repeat=3))
+        print(f"{calls:>11} {legacy / TURNS * 1e6:>15.2f} {gate / TURNS * 1e6:>13.2f} {legacy / gate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+条目摘要微基准
+在 10 / 100 / 1,000 / 10,000 个条目下比较：
+- 直接逐条渲染（items_summary.render_item_line）
+- 按 (id, type, name, subtitle, data) 内容哈希缓存每行（仅用于对照，未采用）
+- ItemsSummarizer：跨步骤重新渲染，同一步内重复使用时直接复用
+
+用法：
+    python backend/benchmarks/bench_items_summary.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+
+from items_summary import ItemsSummarizer, render_item_line  # noqa: E402
+
+SIZES = [10, 100, 1000, 10000]
+TYPES = ["project", "entity", "note", "chart"]
+
+
+def make_item(i: int) -> dict:
+    """生成一个与前端数据结构一致的条目"""
+    itype = TYPES[i % len(TYPES)]
+    data: dict = {}
+    if itype == "project":
+        data = {
+            "field1": f"Project text {i}",
+            "field2": "Option A",
+            "field3": "2025-12-31",
+            "field4": [{"id": f"c{j}", "text": f"task {j}", "done": False, "proposed": False} for j in range(3)],
+        }
+    elif itype == "entity":
+        data = {"field1": f"Entity {i}", "field2": "Option B", "field3": ["tag1"], "field3_options": ["tag1", "tag2", "tag3"]}
+    elif itype == "note":
+        data = {"field1": f"Note content {i} " + "lorem ipsum " * 40}
+    elif itype == "chart":
+        data = {"field1": [{"id": f"m{j}", "label": f"metric {j}", "value": j * 10} for j in range(4)]}
+    return {"id": f"{i:04d}", "type": itype, "name": f"Item {i}", "subtitle": f"subtitle {i}", "data": data}
+
+
+def render_all(items):
+    lines = [render_item_line(p) for p in items]
+    return "\n".join(lines) if lines else "(no items)"
+
+
+class DigestCache:
+    """按内容哈希缓存每行的对照实现"""
+
+    def __init__(self):
+        self.lines = {}
+
+    def summarize(self, items):
+        out = []
+        for p in items:
+            payload = json.dumps(
+                [p.get("id", ""), p.get("type", ""), p.get("name", ""), p.get("subtitle", ""), p.get("data", {})],
+                separators=(",", ":"), ensure_ascii=False, default=str,
+            )
+            key = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+            line = self.lines.get(key)
+            if line is None:
+                line = self.lines[key] = render_item_line(p)
+            out.append(line)
+        return "\n".join(out) if out else "(no items)"
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def bench(n: int, repeat: int):
+    items = [make_item(i) for i in range(n)]
+    digest = DigestCache()
+    digest.summarize(items)
+    summarizer = ItemsSummarizer()
+
+    # 直接渲染一次
+    t_render = best(lambda: render_all(items), repeat)
+    # 内容哈希缓存（全部命中）
+    t_digest_warm = best(lambda: digest.summarize(items), repeat)
+
+    # ItemsSummarizer：新的一步（状态重新反序列化，列表是新对象），使用两次
+    def new_step():
+        step_items = list(items)
+        summarizer.summarize(step_items)
+        return summarizer.summarize(step_items)
+    t_step = best(new_step, repeat)
+
+    assert summarizer.summarize(items) == render_all(items) == digest.summarize(items)
+    return t_render, t_digest_warm, t_step
+
+
+def main():
+    print(f"{'items':>7} | {'render':>10} | {'digest hit':>10} | {'per step':>10}")
+    print("-" * 48)
+    for n in SIZES:
+        repeat = 50 if n <= 1000 else 10
+        t_render, t_digest, t_step = bench(n, repeat)
+        print(f"{n:>7} | {t_render:>8.3f}ms | {t_digest:>8.3f}ms | {t_step:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
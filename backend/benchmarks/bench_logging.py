@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+chat_node 日志开销微基准
+每次进入 chat_node 时，在调用方线程（即事件循环）上花费的时间，分别在 10 / 100 / 1,000 个条目下比较：
+- print：旧实现，print(f"state: {state}") 加两行用户信息，同步写 stdout（这里重定向到临时文件）
+- info：新实现的默认配置（LOG_LEVEL=INFO），调试输出关闭，只剩一次级别检查
+- debug：LOG_LEVEL=DEBUG，只记录规模摘要，格式化和写出在日志线程完成，调用方只做一次入队
+
+用法：
+    python backend/benchmarks/bench_logging.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import timeit
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from bench_items_summary import make_item  # noqa: E402
+from structured_logging import LogSettings, get_logger, logging_pipeline  # noqa: E402
+
+SIZES = [10, 100, 1000]
+MESSAGES = 20
+
+
+def make_state(n_items: int) -> dict:
+    messages = []
+    for i in range(MESSAGES // 2):
+        messages.append(HumanMessage(content=f"please update item {i}"))
+        messages.append(AIMessage(content=f"updated item {i} " + "ok " * 20))
+    return {
+        "items": [make_item(i) for i in range(n_items)],
+        "messages": messages,
+        "globalTitle": "Bench",
+        "planStatus": "",
+        "user_info": {"username": "admin", "role": "admin", "permissions": ["read:canvas", "write:canvas"], "user_id": "admin"},
+    }
+
+
+def legacy_log(state: dict):
+    """旧 chat_node 入口的输出"""
+    print(f"state: {state}")
+    user_info = state.get("user_info")
+    if user_info:
+        print(f"用户 {user_info['username']} (角色: {user_info['role']}) 正在使用Agent")
+        print(f"用户权限: {user_info['permissions']}")
+
+
+def structured_log(logger, state: dict):
+    """新 chat_node 入口的输出（与 agent.chat_node 相同）"""
+    if logger.is_debug():
+        user_info = state.get("user_info") or {}
+        logger.debug(
+            "chat_node.enter",
+            username=user_info.get("username"),
+            role=user_info.get("role"),
+            items=len(state.get("items") or []),
+            messages=len(state.get("messages") or []),
+            plan_status=state.get("planStatus"),
+        )
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    sink = open(os.devnull, "w")
+    print(f"{'items':>6} {'print us':>10} {'info us':>9} {'debug us':>9} {'print/debug':>12}")
+    for n in SIZES:
+        state = make_state(n)
+        number = max(20, 20000 // n)
+
+        with tempfile.TemporaryFile("w", encoding="utf-8") as out, redirect_stdout(out):
+            t_print = per_call_us(lambda: legacy_log(state), number)
+
+        logging_pipeline.configure(LogSettings(level="INFO"), force=True, stream=sink)
+        logger = get_logger("bench")
+        t_info = per_call_us(lambda: structured_log(logger, state), number * 10)
+
+        logging_pipeline.configure(LogSettings(level="DEBUG", queue_size=1_000_000), force=True, stream=sink)
+        t_debug = per_call_us(lambda: structured_log(logger, state), number)
+
+        print(f"{n:>6} {t_print:>10.1f} {t_info:>9.3f} {t_debug:>9.1f} {t_print / t_debug:>11.0f}x")
+    started = time.perf_counter()
+    logging_pipeline.shutdown()
+    print(f"pipeline stats: {logging_pipeline.stats()} (drained in {time.perf_counter() - started:.2f}s)")
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+登录风暴下的事件循环延迟基准
+同时发起 N 个登录请求，另起一个每 5ms 唤醒一次的心跳协程，记录它实际被唤醒时比预期晚了多少
+（事件循环延迟，流式 agent 响应的每个片段都会被同样推迟）。比较：
+- inline：旧实现，在协程里直接调用同步的 auth.authenticate_user（PBKDF2 阻塞事件循环）
+- pool：通过 FastAPI 的 /auth/login 路由，密码校验在 password_pool 工作池中执行，池满返回 503
+
+用法：
+    python backend/benchmarks/bench_login_lag.py
+    python backend/benchmarks/bench_login_lag.py --logins 200 --workers 2 --max-queue 16
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import warnings
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+
+TICK = 0.005
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def heartbeat(lags: List[float], stop: asyncio.Event):
+    """每 TICK 秒唤醒一次，记录超出预期的延迟"""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def storm(mode: str, logins: int) -> dict:
+    import auth
+
+    statuses: List[int] = []
+
+    async def inline_login():
+        await asyncio.sleep(0)
+        user = auth.authenticate_user("admin", "admin123")
+        statuses.append(200 if user else 401)
+
+    client = None
+    if mode == "pool":
+        import httpx
+        from auth_routes import router
+        from fastapi import FastAPI
+        app = FastAPI()
+        app.include_router(router)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def pool_login():
+        response = await client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+        statuses.append(response.status_code)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(TICK * 4)
+    started = time.perf_counter()
+    await asyncio.gather(*((inline_login if mode == "inline" else pool_login)() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    if client is not None:
+        await client.aclose()
+    return {
+        "elapsed": elapsed,
+        "lag_p50": percentile(lags, 0.50) * 1000,
+        "lag_p99": percentile(lags, 0.99) * 1000,
+        "lag_max": max(lags) * 1000 if lags else 0.0,
+        "ok": statuses.count(200),
+        "busy": statuses.count(503),
+    }
+
+
+async def main(args):
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_MAX_QUEUE"] = str(args.max_queue)
+    print(f"logins={args.logins} workers={args.workers} max_queue={args.max_queue}")
+    print(f"{'mode':>7} {'total s':>8} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11} {'200':>5} {'503':>5}")
+    for mode in ("inline", "pool"):
+        r = await storm(mode, args.logins)
+        print(f"{mode:>7} {r['elapsed']:>8.2f} {r['lag_p50']:>11.1f} {r['lag_p99']:>11.1f} {r['lag_max']:>11.1f} {r['ok']:>5} {r['busy']:>5}")
+    from password_pool import password_pool
+    print(f"pool stats: {password_pool.stats()}")
+    password_pool.shutdown()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-queue", type=int, default=32)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
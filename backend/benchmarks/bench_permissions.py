@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+权限检查微基准
+比较旧的列表实现和新的掩码实现：
+- has_permission：`permission in user.permissions`（列表线性查找） vs 掩码按位与
+- 按 user_info["permissions"]（字符串列表）过滤 30 个工具：逐个 `.value in list` vs 掩码按位与
+
+用法：
+    python backend/benchmarks/bench_permissions.py
+"""
+
+import os
+import sys
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+
+from auth import PERMISSION_BITS, Permission, get_user, has_permission, permission_mask_from_values  # noqa: E402
+from tool_permissions import tool_permission_index  # noqa: E402
+
+NUMBER = 200_000
+
+
+def list_has_permission(user, permission):
+    return permission in user.permissions
+
+
+def list_filter(tool_names, mapping, user_permissions):
+    out = []
+    for name in tool_names:
+        required = mapping.get(name)
+        if required is None or required.value in user_permissions:
+            out.append(name)
+    return out
+
+
+def mask_filter(tool_names, masks, user_permissions):
+    user_mask = permission_mask_from_values(user_permissions)
+    out = []
+    for name in tool_names:
+        required = masks.get(name, 0)
+        if user_mask & required == required:
+            out.append(name)
+    return out
+
+
+def main():
+    mapping = tool_permission_index.tool_permissions
+    masks = tool_permission_index.tool_masks
+    tool_names = list(mapping)
+    print(f"{'check':<38} {'user':<8} {'list ns':>9} {'mask ns':>9} {'speedup':>8}")
+    for username in ("admin", "editor", "viewer"):
+        user = get_user(username)
+        # 列表末尾的权限是线性查找的最坏情况
+        for permission in (Permission.READ_CANVAS, Permission.MANAGE_USERS):
+            assert list_has_permission(user, permission) == has_permission(user, permission)
+            t_list = timeit.timeit(lambda: list_has_permission(user, permission), number=NUMBER) / NUMBER * 1e9
+            t_mask = timeit.timeit(lambda: has_permission(user, permission), number=NUMBER) / NUMBER * 1e9
+            print(f"{'has_permission(' + permission.value + ')':<38} {username:<8} {t_list:>9.1f} {t_mask:>9.1f} {t_list / t_mask:>7.2f}x")
+
+        user_permissions = [p.value for p in user.permissions]
+        assert list_filter(tool_names, mapping, user_permissions) == mask_filter(tool_names, masks, user_permissions)
+        n = NUMBER // 20
+        t_list = timeit.timeit(lambda: list_filter(tool_names, mapping, user_permissions), number=n) / n * 1e9
+        t_mask = timeit.timeit(lambda: mask_filter(tool_names, masks, user_permissions), number=n) / n * 1e9
+        print(f"{f'filter {len(tool_names)} tools':<38} {username:<8} {t_list:>9.1f} {t_mask:>9.1f} {t_list / t_mask:>7.2f}x")
+    print(f"permission bits: {len(PERMISSION_BITS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+计划执行的 LLM 往返次数
+用一个按系统提示词行事的假模型跑完 2 / 3 / 5 步的计划，统计每个计划的 LLM 调用次数和客户端往返次数（graph 运行次数）。
+假模型每一步执行一个前端工具调用（setItemName），由本脚本模拟客户端回传 ToolMessage；
+提示词要求逐步标记 in_progress 时它会照做，计划未关闭时会调用 complete_plan，最后用一条文本总结。
+
+用法：
+    python backend/benchmarks/bench_plan_round_trips.py
+"""
+
+import asyncio
+import os
+import re
+import sys
+import uuid
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+os.environ["LLM_STREAMING"] = "false"
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+import agent  # noqa: E402
+
+STEP_COUNTS = [2, 3, 5]
+# 旧提示词要求模型逐步把每一步标记为 in_progress
+LITERAL_IN_PROGRESS = "set the step in progress via update_plan_progress"
+
+
+def _call(name, args, call_id):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+class PlanFollowingModel(BaseChatModel):
+    """根据 ground truth（planStatus / currentStepIndex）和最近的工具调用决定下一步"""
+    steps: int = 3
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-plan-follower"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=self._decide(messages))])
+
+    def _decide(self, messages) -> AIMessage:
+        ground_truth = messages[-1].content
+        plan_status = re.search(r"- planStatus: (.*)", ground_truth).group(1).strip()
+        index = int(re.search(r"- currentStepIndex: (-?\d+)", ground_truth).group(1))
+        issued = {tc["id"] for m in messages if isinstance(m, AIMessage) for tc in m.tool_calls}
+        answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+        if plan_status == "completed":
+            return AIMessage(content="All steps are done.")
+        if not plan_status:
+            return _call("set_plan", {"steps": [f"Rename item {i}" for i in range(self.steps)]}, "plan")
+        if f"done{self.steps - 1}" in issued:
+            return _call("complete_plan", {}, "complete")
+        if LITERAL_IN_PROGRESS in messages[0].content and f"prog{index}" not in issued:
+            return _call("update_plan_progress", {"step_index": index, "status": "in_progress"}, f"prog{index}")
+        if f"act{index}" not in answered:
+            return _call("setItemName", {"itemId": f"{index:04d}", "name": f"Item {index}"}, f"act{index}")
+        return _call("update_plan_progress", {"step_index": index, "status": "completed", "note": "renamed"}, f"done{index}")
+
+
+async def run_plan(steps: int) -> dict:
+    model = PlanFollowingModel(steps=steps)
+    agent.get_chat_model = lambda: model
+    config = {"configurable": {
+        "thread_id": str(uuid.uuid4()),
+        "user_info": {"username": "admin", "role": "admin", "permissions": [], "user_id": "admin"},
+    }}
+    inputs = {
+        "messages": [HumanMessage(content=f"rename the first {steps} items")],
+        "items": [{"id": f"{i:04d}", "type": "note", "name": f"Note {i}", "data": {"field1": ""}} for i in range(steps)],
+    }
+    runs = 0
+    while True:
+        runs += 1
+        state = await agent.graph.ainvoke(inputs, config)
+        last = state["messages"][-1]
+        if not (isinstance(last, AIMessage) and last.tool_calls):
+            break
+        # 模拟客户端：执行前端工具后回传结果，开始下一次运行
+        inputs = {"messages": [ToolMessage(content="ok", tool_call_id=tc["id"]) for tc in last.tool_calls]}
+    assert state.get("planStatus") == "completed", state.get("planStatus")
+    return {"llm_calls": model.calls, "runs": runs}
+
+
+async def main():
+    print(f"{'steps':>6} {'llm calls':>10} {'calls/step':>11} {'client runs':>12}")
+    for steps in STEP_COUNTS:
+        result = await run_plan(steps)
+        print(f"{steps:>6} {result['llm_calls']:>10} {result['llm_calls'] / steps:>11.2f} {result['runs']:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
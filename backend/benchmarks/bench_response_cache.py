@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+响应缓存基准
+用一个固定延迟的假模型，把同一组问题在画布不变的情况下重复提出（模拟刷新页面后重问），比较：
+- LLM 调用次数
+- 每条消息的平均耗时
+分别测量不启用缓存、memory 后端和 sqlite 后端。要求随机内容的消息始终调用模型。
+
+用法：
+    python backend/benchmarks/bench_response_cache.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+os.environ["LLM_STREAMING"] = "false"
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+import agent  # noqa: E402
+from response_cache import ResponseCacheSettings, response_cache  # noqa: E402
+
+# 假模型每次调用的耗时（秒），用来代表真实的网络与生成延迟
+MODEL_LATENCY = 0.05
+ROUNDS = 5
+QUESTIONS = [
+    "Summarize the canvas",
+    "Which project is most at risk?",
+    "What should I work on next?",
+    "Fill note 0001 with random text",
+]
+
+
+class SlowModel(BaseChatModel):
+    """固定延迟后返回一段文本"""
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-slow"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(MODEL_LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"answer {self.calls}"))])
+
+
+async def run(settings: ResponseCacheSettings) -> dict:
+    response_cache.configure(settings)
+    response_cache.clear()
+    model = SlowModel()
+    agent.get_chat_model = lambda: model
+    items = [{"id": f"{i:04d}", "type": "note", "name": f"Note {i}", "data": {"field1": ""}} for i in range(20)]
+    user_info = {"username": "admin", "role": "admin", "permissions": [], "user_id": "admin"}
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        # 每轮一个新线程，相当于刷新页面后重新提问
+        config = {"configurable": {"thread_id": str(uuid.uuid4()), "user_info": user_info}}
+        for question in QUESTIONS:
+            await agent.graph.ainvoke({"messages": [HumanMessage(content=question)], "items": items}, config)
+    elapsed = time.perf_counter() - started
+    stats = response_cache.stats()
+    response_cache.close()
+    return {"llm_calls": model.calls, "ms_per_message": elapsed / (ROUNDS * len(QUESTIONS)) * 1000, **stats}
+
+
+async def main():
+    messages = ROUNDS * len(QUESTIONS)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ResponseCacheSettings(backend="none"),
+            ResponseCacheSettings(backend="memory"),
+            ResponseCacheSettings(backend="sqlite", sqlite_path=os.path.join(tmp, "response_cache.sqlite")),
+        ]
+        print(f"{'backend':>8} {'messages':>9} {'llm calls':>10} {'hits':>5} {'bypassed':>9} {'ms/message':>11}")
+        for settings in backends:
+            r = await run(settings)
+            print(f"{settings.backend:>8} {messages:>9} {r['llm_calls']:>10} {r['hits']:>5} {r['bypassed']:>9} {r['ms_per_message']:>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
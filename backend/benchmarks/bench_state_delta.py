@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+状态增量基准
+在 10 / 100 / 1,000 个条目下，用脚本化的假 LLM 跑一轮两步计划（3 次模型调用），比较：
+- delta：当前的 chat_node / authenticate_user，只写有变化的键
+- full：模拟旧行为，每个节点都重新写出 items、标题、计划等全部共享状态键
+
+统计每轮写入检查点的字节数（通道值 + 检查点本体 + 待写入记录），以及
+stream_mode="updates" 下每轮推送的状态更新 JSON 字节数。
+
+用法：
+    python backend/benchmarks/bench_state_delta.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+warnings.filterwarnings("ignore")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.graph import StateGraph  # noqa: E402
+from langgraph.prebuilt import ToolNode  # noqa: E402
+from langgraph.types import Command  # noqa: E402
+
+import agent  # noqa: E402
+from bench_items_summary import make_item  # noqa: E402
+from fake_llm import make_fake_model  # noqa: E402
+
+SIZES = [10, 100, 1000]
+LEGACY_KEYS = (
+    "items", "globalTitle", "globalDescription", "itemsCreated", "lastAction",
+    "planSteps", "currentStepIndex", "planStatus",
+)
+
+
+class CountingSaver(MemorySaver):
+    """统计写入的序列化字节数"""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        for channel, version in new_versions.items():
+            blob = self.blobs.get((thread_id, checkpoint_ns, channel, version))
+            if blob is not None:
+                self.bytes_written += len(blob[1])
+        saved, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+        self.bytes_written += len(saved[1]) + len(saved_metadata[1])
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        for _, value in writes:
+            self.bytes_written += len(self.serde.dumps_typed(value)[1])
+        super().put_writes(config, writes, task_id, task_path)
+
+
+async def legacy_chat_node(state, config):
+    """旧行为：在 chat_node 的更新里补回全部共享状态键"""
+    command = await agent.chat_node(state, config)
+    update = {k: state.get(k) for k in LEGACY_KEYS}
+    update.update(command.update or {})
+    return Command(goto=command.goto, update=update)
+
+
+def legacy_authenticate_user(state, config):
+    return {**state, **agent.authenticate_user(state, config)}
+
+
+def build_graph(mode: str, saver: MemorySaver):
+    workflow = StateGraph(agent.AgentState)
+    if mode == "full":
+        workflow.add_node("authenticate_user", legacy_authenticate_user)
+        workflow.add_node("chat_node", legacy_chat_node)
+    else:
+        workflow.add_node("authenticate_user", agent.authenticate_user)
+        workflow.add_node("chat_node", agent.chat_node)
+    workflow.add_node("tool_node", ToolNode(tools=agent.backend_tools))
+    workflow.add_edge("authenticate_user", "chat_node")
+    workflow.add_node("plan_node", agent.plan_node)
+    workflow.add_edge("tool_node", "plan_node")
+    workflow.set_entry_point("authenticate_user")
+    return workflow.compile(checkpointer=saver)
+
+
+async def run_turn(mode: str, n_items: int) -> dict:
+    model = make_fake_model("plan")
+    agent.get_chat_model = lambda: model
+    saver = CountingSaver()
+    graph = build_graph(mode, saver)
+    config = {"configurable": {
+        "thread_id": str(uuid.uuid4()),
+        "user_info": {"username": "admin", "role": "admin", "permissions": [], "user_id": "admin"},
+    }}
+    inputs = {
+        "messages": [HumanMessage(content="plan two things")],
+        "items": [make_item(i) for i in range(n_items)],
+        "globalTitle": "Canvas",
+        "lastAction": "",
+        "itemsCreated": n_items,
+    }
+    update_bytes = 0
+    updates = 0
+    async for chunk in graph.astream(inputs, config, stream_mode="updates"):
+        update_bytes += len(json.dumps(chunk, default=str, ensure_ascii=False).encode("utf-8"))
+        updates += 1
+    final = (await graph.aget_state(config)).values
+    assert final.get("planStatus") == "completed", final.get("planStatus")
+    return {"checkpoint_bytes": saver.bytes_written, "update_bytes": update_bytes, "updates": updates}
+
+
+async def main():
+    # 关闭节点内的调试输出，避免干扰结果
+    devnull = open(os.devnull, "w")
+    print(f"{'items':>6} {'mode':>6} {'checkpoint KB/turn':>19} {'update KB/turn':>15} {'updates':>8}")
+    for n_items in SIZES:
+        for mode in ("full", "delta"):
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                result = await run_turn(mode, n_items)
+            finally:
+                sys.stdout = stdout
+            print(
+                f"{n_items:>6} {mode:>6} {result['checkpoint_bytes'] / 1024:>19.1f} "
+                f"{result['update_bytes'] / 1024:>15.1f} {result['updates']:>8}"
+            )
+    devnull.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
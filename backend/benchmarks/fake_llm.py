@@ -0,0 +1,109 @@
+"""
+基准测试用的假聊天模型
+按脚本返回文本或工具调用，可配置首 token 延迟和每个片段的延迟，支持流式输出。
+回复由当前对话决定（最后一条用户消息之后已有几条 ToolMessage 就返回脚本中的第几条），
+因此同一个实例可以被并发的多个线程共享。
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def tool_call(name: str, args: Dict[str, Any], call_id: str) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+# 预置脚本
+SCRIPTS: Dict[str, List[AIMessage]] = {
+    # 纯聊天：一次模型调用
+    "chat": [AIMessage(content="There are several items on the canvas. Let me know what you would like to change.")],
+    # 两步计划：set_plan -> 两次 update_plan_progress，共 3 次模型调用
+    # （最后一步完成后由 plan_node 关闭计划并给出总结）
+    "plan": [
+        tool_call("set_plan", {"steps": ["Create the item", "Fill in the fields"]}, "call_plan"),
+        tool_call("update_plan_progress", {"step_index": 0, "status": "completed", "note": "created"}, "call_step0"),
+        tool_call("update_plan_progress", {"step_index": 1, "status": "completed", "note": "filled"}, "call_step1"),
+    ],
+    # 前端工具调用：一次模型调用后结束本轮，等待前端执行
+    "frontend": [tool_call("createItem", {"type": "note", "name": "New note"}, "call_create")],
+}
+
+
+class FakeChatModel(BaseChatModel):
+    """按脚本回复的假聊天模型"""
+    script: List[AIMessage] = []
+    first_token_latency: float = 0.0  # 秒
+    chunk_latency: float = 0.0  # 秒，流式输出时每个片段之间的延迟
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        self.calls += 1
+        tool_results = 0
+        for m in reversed(messages):
+            if m.type == "human":
+                break
+            if m.type == "tool":
+                tool_results += 1
+        if tool_results < len(self.script):
+            return self.script[tool_results]
+        return AIMessage(content="done")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        time.sleep(self.first_token_latency + self.chunk_latency * len(_split(message)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        await asyncio.sleep(self.first_token_latency + self.chunk_latency * len(_split(message)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in _split(message):
+            if self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            # BaseChatModel.astream 负责回调 on_llm_new_token
+            yield ChatGenerationChunk(message=chunk)
+
+
+def _split(message: AIMessage, args_chunk_size: int = 16) -> List[AIMessageChunk]:
+    """把完整消息拆成流式片段：文本按词拆分，工具调用参数按固定长度拆分"""
+    chunks: List[AIMessageChunk] = []
+    for index, tc in enumerate(message.tool_calls):
+        args = json.dumps(tc["args"])
+        pieces = [args[i:i + args_chunk_size] for i in range(0, len(args), args_chunk_size)] or [""]
+        for n, piece in enumerate(pieces):
+            chunks.append(AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tc["name"] if n == 0 else None,
+                "args": piece,
+                "id": tc["id"] if n == 0 else None,
+                "index": index,
+            }]))
+    if message.content:
+        words = str(message.content).split(" ")
+        chunks.extend(AIMessageChunk(content=w if i == 0 else " " + w) for i, w in enumerate(words))
+    return chunks or [AIMessageChunk(content="")]
+
+
+def make_fake_model(scenario: str, first_token_latency_ms: float = 0.0, chunk_latency_ms: float = 0.0,
+                    script: Optional[List[AIMessage]] = None) -> FakeChatModel:
+    return FakeChatModel(
+        script=script if script is not None else SCRIPTS[scenario],
+        first_token_latency=first_token_latency_ms / 1000,
+        chunk_latency=chunk_latency_ms / 1000,
+    )
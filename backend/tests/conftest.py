@@ -0,0 +1,41 @@
+"""
+后端测试公共配置
+把 backend/agent 和 backend/benchmarks（假聊天模型）加入导入路径，并提供用假模型运行 graph 的 fixture。
+
+用法：
+    python -m pytest -q backend/tests
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "agent"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# 测试不依赖 .env：关闭流式输出，其余可选功能保持默认（关闭）
+os.environ["LLM_STREAMING"] = "false"
+
+ADMIN = {"username": "admin", "role": "admin", "permissions": [], "user_id": "admin"}
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """替换 agent.get_chat_model 的脚本化假模型（设置 fake_model.script 决定回复）"""
+    import agent
+    from fake_llm import FakeChatModel
+
+    model = FakeChatModel()
+    monkeypatch.setattr(agent, "get_chat_model", lambda: model)
+    return model
+
+
+@pytest.fixture
+def thread_config():
+    """返回一个生成新线程配置的函数"""
+    def make(user_info=None):
+        return {"configurable": {"thread_id": str(uuid.uuid4()), "user_info": user_info or ADMIN}}
+    return make
@@ -0,0 +1,59 @@
+"""
+有界内存检查点保存器：淘汰线程和裁剪检查点时，按线程的索引与存储保持一致
+"""
+
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from checkpointer import BoundedMemorySaver
+
+
+class State(TypedDict):
+    n: int
+
+
+def _graph(saver):
+    graph = StateGraph(State)
+    graph.add_node("inc", lambda state: {"n": state["n"] + 1})
+    graph.add_edge(START, "inc")
+    graph.add_edge("inc", END)
+    return graph.compile(checkpointer=saver)
+
+
+def _run(graph, thread_id, turns):
+    config = {"configurable": {"thread_id": thread_id}}
+    for _ in range(turns):
+        graph.invoke({"n": 0}, config)
+
+
+def _assert_indexes_consistent(saver):
+    indexed = set().union(*saver._thread_versions.values()) if saver._thread_versions else set()
+    assert indexed == set(saver._versions)
+    for thread_id, keys in saver._thread_versions.items():
+        assert all(key[0] == thread_id for key in keys)
+
+
+def test_trim_keeps_version_index_in_sync():
+    saver = BoundedMemorySaver(max_threads=10, max_checkpoints_per_thread=3)
+    _run(_graph(saver), "t1", 5)
+    assert len(saver.storage["t1"][""]) == 3
+    assert len(saver._thread_versions["t1"]) == 3
+    assert saver.trimmed_checkpoints > 0
+    _assert_indexes_consistent(saver)
+
+
+def test_evicted_thread_leaves_nothing_behind():
+    saver = BoundedMemorySaver(max_threads=2, max_checkpoints_per_thread=3)
+    graph = _graph(saver)
+    for thread_id in ("t1", "t2", "t3"):
+        _run(graph, thread_id, 2)
+
+    assert saver.evicted_threads == 1
+    assert "t1" not in saver.storage
+    assert "t1" not in saver._thread_versions
+    assert not any(key[0] == "t1" for key in saver._versions)
+    assert not any(key[0] == "t1" for key in saver.writes)
+    assert not any(key[0] == "t1" for key in saver.blobs)
+    _assert_indexes_consistent(saver)
+    assert graph.get_state({"configurable": {"thread_id": "t3"}}).values == {"n": 1}
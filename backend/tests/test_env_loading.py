@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from conftest import BACKEND_DIR
+
+# 用假的 load_dotenv 模拟 .env，再导入 main，读出各个单例实际使用的配置
+SCRIPT = textwrap.dedent("""
+    import json, os, sys
+    import dotenv
+
+    DOTENV = json.loads(sys.argv[1])
+
+    def fake_load_dotenv(*args, **kwargs):
+        os.environ.update(DOTENV)
+        return True
+
+    dotenv.load_dotenv = fake_load_dotenv
+
+    import main
+    from permission_agent import permission_graph_cache
+    from tool_binding import bound_model_cache
+
+    user_store = main.user_repository.stats()
+    print(json.dumps({
+        "checkpointer_keep_last": main.checkpointer.settings.keep_last,
+        "checkpointer_max_threads": main.checkpointer.settings.max_threads,
+        "log_level": main.logging_pipeline.settings.level,
+        "user_store": [user_store["backend"], user_store.get("path"), user_store.get("cache_ttl_seconds")],
+        "password_hash_workers": main.password_pool.max_workers,
+        "token_cache": [main.token_cache.maxsize, main.token_cache.ttl],
+        "bound_tools_cache_size": bound_model_cache.maxsize,
+        "permission_graph_cache_size": permission_graph_cache.maxsize,
+    }))
+""")
+
+
+def run_with_dotenv(dotenv):
+    env = {k: v for k, v in os.environ.items() if k not in dotenv}
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, json.dumps(dotenv)],
+        cwd=os.path.join(BACKEND_DIR, "agent"), env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_dotenv_is_loaded_before_singletons_read_settings():
+    values = run_with_dotenv({
+        "CHECKPOINTER_KEEP_LAST": "7",
+        "CHECKPOINTER_MAX_THREADS": "42",
+        "LOG_LEVEL": "WARNING",
+    })
+    assert values["checkpointer_keep_last"] == 7
+    assert values["checkpointer_max_threads"] == 42
+    assert values["log_level"] == "WARNING"
+
+
+def test_dotenv_configures_the_user_store_and_auth_caches(tmp_path):
+    users_db = str(tmp_path / "users.sqlite")
+    values = run_with_dotenv({
+        "USER_STORE_BACKEND": "sqlite",
+        "USER_STORE_SQLITE_PATH": users_db,
+        "USER_STORE_CACHE_TTL": "3",
+        "PASSWORD_HASH_WORKERS": "3",
+        "AUTH_TOKEN_CACHE_SIZE": "77",
+        "AUTH_TOKEN_CACHE_TTL": "11",
+        "BOUND_TOOLS_CACHE_SIZE": "5",
+        "PERMISSION_GRAPH_CACHE_SIZE": "6",
+    })
+    assert values["user_store"] == ["sqlite", users_db, 3.0]
+    assert values["password_hash_workers"] == 3
+    assert values["token_cache"] == [77, 11.0]
+    assert values["bound_tools_cache_size"] == 5
+    assert values["permission_graph_cache_size"] == 6
@@ -0,0 +1,103 @@
+"""
+条目选择 interrupt：触发条件、按消息 id 缓存，以及 ITEM_CHOICE_INTERRUPT 开关
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent
+from item_choice import ItemChoiceGate, needs_item_choice
+
+NOTES = [
+    {"id": "0001", "type": "note", "name": "Groceries"},
+    {"id": "0002", "type": "note", "name": "Reading list"},
+    {"id": "0003", "type": "project", "name": "Launch"},
+]
+
+
+@pytest.mark.parametrize("text", [
+    "create a new item",
+    "add a checklist item",
+    "what's the plan status",
+    "what is the status of the project?",
+    "mark the checklist item done",
+    "rename the first 3 items",
+    "set all notes to done",
+    "rename note 0001 to Errands",
+    "rename the Groceries note to Errands",
+    "set id=0002 priority to high",
+    # 只有一个 project，目标不含糊
+    "change the project owner to Ana",
+])
+def test_does_not_ask(text):
+    assert not needs_item_choice(text, NOTES)
+
+
+@pytest.mark.parametrize("text", [
+    "rename the note to Errands",
+    "Set the priority to high",
+    "delete the item",
+    # 2025 不是条目 id
+    "change the note due date to 2025",
+])
+def test_asks_for_ambiguous_edit(text):
+    assert needs_item_choice(text, NOTES)
+
+
+def test_word_boundaries():
+    # "items" / "statuses" / "itemize" 不是单个条目
+    assert not needs_item_choice("update the itemized list", NOTES)
+    assert not needs_item_choice("rename items", NOTES)
+
+
+def test_decision_cached_per_message_id():
+    gate = ItemChoiceGate()
+    messages = [HumanMessage(content="rename the note to Errands", id="m1")]
+    assert gate.should_ask(messages, NOTES)
+    # 缓存的是第一次的判断结果，即使条目已经变化
+    assert gate.should_ask(messages, NOTES[:1])
+    assert gate.stats()["decisions"] == 1
+    assert gate.stats()["cache_hits"] == 1
+
+
+def test_skipped_after_tool_results():
+    gate = ItemChoiceGate()
+    messages = [
+        HumanMessage(content="rename the note to Errands", id="m1"),
+        AIMessage(content="", tool_calls=[{"name": "setItemName", "args": {}, "id": "c1"}]),
+        ToolMessage(content="ok", tool_call_id="c1"),
+    ]
+    assert not gate.should_ask(messages, NOTES)
+    assert gate.stats()["skipped"] == 1
+    assert gate.stats()["decisions"] == 0
+
+
+def _run(config, fake_model, text):
+    fake_model.script = [AIMessage(content="ok")]
+    inputs = {"messages": [HumanMessage(content=text)], "items": NOTES}
+    asyncio.run(agent.graph.ainvoke(inputs, config))
+    return asyncio.run(agent.graph.aget_state(config))
+
+
+def test_disabled_by_default(monkeypatch, fake_model, thread_config):
+    monkeypatch.delenv("ITEM_CHOICE_INTERRUPT", raising=False)
+    state = _run(thread_config(), fake_model, "rename the note to Errands")
+    assert state.next == ()
+    assert fake_model.calls == 1
+
+
+def test_enabled_interrupts_and_resumes(monkeypatch, fake_model, thread_config):
+    from langgraph.types import Command
+
+    monkeypatch.setenv("ITEM_CHOICE_INTERRUPT", "true")
+    config = thread_config()
+    state = _run(config, fake_model, "rename the note to Errands")
+    assert state.next == ("chat_node",)
+    assert [i.value["type"] for t in state.tasks for i in t.interrupts] == ["choose_item"]
+    assert fake_model.calls == 0
+
+    result = asyncio.run(agent.graph.ainvoke(Command(resume="0002"), config))
+    assert fake_model.calls == 1
+    assert result["messages"][-1].content == "ok"
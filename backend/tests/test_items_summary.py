@@ -0,0 +1,41 @@
+"""
+条目摘要的 token 预算：整个摘要（包括被引用的条目、末尾的 id 行和截断说明）不超过预算
+"""
+
+import pytest
+
+from bench_items_summary import make_item
+from items_summary import ItemsSummarizer, count_tokens, safe_render_item_line
+
+ITEMS = [make_item(i) for i in range(3000)]
+
+
+@pytest.mark.parametrize("budget", [300, 500, 2000, 8000])
+def test_summary_stays_within_budget(budget):
+    summary = ItemsSummarizer().summarize(ITEMS, budget, query="update item 42 and 0007", last_action="updated:0100")
+    assert count_tokens(summary) <= budget
+
+
+def test_referenced_items_count_against_budget():
+    # 消息里引用了几百个条目，完整信息放不下也不能超出预算
+    query = " ".join(f"{i:04d}" for i in range(400))
+    summary = ItemsSummarizer().summarize(ITEMS, 500, query=query)
+    assert count_tokens(summary) <= 500
+
+
+def test_referenced_items_shown_in_full_first():
+    summary = ItemsSummarizer().summarize(ITEMS, 2000, query="update item 42", last_action="updated:0100")
+    assert safe_render_item_line(ITEMS[42]) in summary.splitlines()
+    assert safe_render_item_line(ITEMS[100]) in summary.splitlines()
+
+
+def test_id_tail_is_truncated():
+    summary = ItemsSummarizer().summarize(ITEMS, 500)
+    tail = next(line for line in summary.splitlines() if line.startswith("(other item ids"))
+    assert tail.endswith("more)")
+    assert tail.count(",") < 100
+
+
+def test_no_budget_renders_everything():
+    summary = ItemsSummarizer().summarize(ITEMS[:20])
+    assert summary.splitlines() == [safe_render_item_line(p) for p in ITEMS[:20]]
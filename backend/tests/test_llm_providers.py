@@ -0,0 +1,46 @@
+"""
+流式 token 用量：只在提供商支持 stream_options 时默认开启
+"""
+
+import pytest
+
+from llm_providers import load_provider_settings
+
+AZURE = {"AZURE_OPENAI_API_KEY": "k", "AZURE_OPENAI_ENDPOINT": "https://example.openai.azure.com/"}
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_VERSION", "OPENAI_API_KEY", "LLM_STREAM_USAGE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _azure(monkeypatch, **env):
+    for name, value in {**AZURE, **env}.items():
+        monkeypatch.setenv(name, value)
+    return load_provider_settings()
+
+
+@pytest.mark.parametrize("api_version, expected", [
+    (None, False),  # 默认的 2024-02-15-preview
+    ("2024-06-01", False),
+    ("2024-09-01-preview", True),
+    ("2024-10-21", True),
+])
+def test_azure_stream_usage_follows_api_version(monkeypatch, api_version, expected):
+    env = {"AZURE_OPENAI_API_VERSION": api_version} if api_version else {}
+    settings = _azure(monkeypatch, **env)
+    assert settings.provider == "azure"
+    assert settings.stream_usage is expected
+
+
+def test_explicit_setting_wins(monkeypatch):
+    assert _azure(monkeypatch, LLM_STREAM_USAGE="true").stream_usage is True
+    assert _azure(monkeypatch, AZURE_OPENAI_API_VERSION="2024-10-21", LLM_STREAM_USAGE="false").stream_usage is False
+
+
+def test_openai_defaults_to_stream_usage(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    assert load_provider_settings().stream_usage is True
+    monkeypatch.setenv("LLM_STREAM_USAGE", "false")
+    assert load_provider_settings().stream_usage is False
@@ -0,0 +1,53 @@
+"""
+计划自动继续次数（canvas_plan_autocontinue_iterations）：plan_node 回到 chat_node 也计一次
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import agent
+from fake_llm import SCRIPTS
+from metrics import plan_autocontinue
+
+
+class Recorder:
+    def __init__(self):
+        self.values = []
+
+    def observe(self, value, **labels):
+        self.values.append(value)
+
+
+@pytest.fixture
+def observed(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(plan_autocontinue, "histogram", recorder)
+    return recorder.values
+
+
+def _run(config, text):
+    asyncio.run(agent.graph.ainvoke({"messages": [HumanMessage(content=text)]}, config))
+
+
+def test_plan_loop_iterations_are_counted(observed, fake_model, thread_config):
+    # set_plan -> plan_node -> chat_node, step 0 -> plan_node -> chat_node, step 1 -> plan_node -> END
+    fake_model.script = SCRIPTS["plan"]
+    _run(thread_config(), "plan two things")
+    assert fake_model.calls == 3
+    assert observed == [2]
+
+
+def test_plain_chat_has_no_iterations(observed, fake_model, thread_config):
+    fake_model.script = SCRIPTS["chat"]
+    _run(thread_config(), "hello")
+    assert observed == [0]
+
+
+def test_each_turn_is_observed_once(observed, fake_model, thread_config):
+    config = thread_config()
+    fake_model.script = SCRIPTS["chat"]
+    _run(config, "hello")
+    _run(config, "hello again")
+    assert observed == [0, 0]
@@ -0,0 +1,57 @@
+"""
+后端工具节点：只执行后端调用、并发执行、结果按调用顺序返回
+"""
+
+import asyncio
+import time
+
+from langchain.tools import tool
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from parallel_tools import BackendToolNode, pending_tool_calls
+
+DELAY = 0.2
+
+
+@tool
+async def slow_a(x: int) -> int:
+    """测试用：延迟后返回参数"""
+    await asyncio.sleep(DELAY)
+    return x
+
+
+@tool
+async def slow_b(x: int) -> int:
+    """测试用：延迟后返回参数的两倍"""
+    await asyncio.sleep(DELAY)
+    return x * 2
+
+
+def _request(*calls):
+    return AIMessage(content="", tool_calls=[{"name": n, "args": a, "id": i} for n, a, i in calls])
+
+
+def test_backend_calls_run_concurrently():
+    node = BackendToolNode([slow_a, slow_b])
+    request = _request(("slow_a", {"x": 1}, "c1"), ("slow_b", {"x": 2}, "c2"), ("slow_a", {"x": 3}, "c3"))
+    started = time.perf_counter()
+    output = asyncio.run(node.ainvoke({"messages": [HumanMessage(content="go"), request]}, {}))
+    elapsed = time.perf_counter() - started
+    assert elapsed < DELAY * 2
+    assert [m.tool_call_id for m in output["messages"]] == ["c1", "c2", "c3"]
+    assert [m.content for m in output["messages"]] == ["1", "4", "3"]
+
+
+def test_frontend_and_answered_calls_are_skipped():
+    node = BackendToolNode([slow_a])
+    request = _request(("slow_a", {"x": 1}, "c1"), ("setItemName", {"itemId": "0001"}, "c2"), ("slow_a", {"x": 5}, "c3"))
+    messages = [HumanMessage(content="go"), request, ToolMessage(content="1", tool_call_id="c1")]
+    output = asyncio.run(node.ainvoke({"messages": messages}, {}))
+    assert [m.tool_call_id for m in output["messages"]] == ["c3"]
+    assert [c["id"] for c in pending_tool_calls(messages, exclude={"slow_a"})] == ["c2"]
+
+
+def test_no_pending_calls():
+    node = BackendToolNode([slow_a])
+    output = asyncio.run(node.ainvoke({"messages": [HumanMessage(content="go")]}, {}))
+    assert output == {"messages": []}
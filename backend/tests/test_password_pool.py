@@ -0,0 +1,86 @@
+"""
+密码哈希工作池：请求被取消后，名额要等线程中的计算结束才释放
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from password_pool import PasswordPoolSaturated, PasswordWorkerPool
+
+
+def test_cancelled_request_keeps_its_slot_until_the_work_finishes():
+    pool = PasswordWorkerPool(max_workers=1, max_queue=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+        return "hash"
+
+    async def scenario():
+        request = asyncio.ensure_future(pool.run(slow_hash))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+        # 计算还在进行，名额没有释放
+        assert pool.in_flight == 1
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.run(lambda: "other")
+
+        release.set()
+        for _ in range(100):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await pool.run(lambda: "other") == "other"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+
+    stats = pool.stats()
+    assert stats["in_flight"] == 0
+    assert stats["cancelled"] == 1
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_queued_task_cancelled_before_it_starts_is_not_completed():
+    pool = PasswordWorkerPool(max_workers=1, max_queue=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+        return "hash"
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(slow_hash))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.ensure_future(pool.run(lambda: "never"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert pool.in_flight == 1
+        release.set()
+        assert await running == "hash"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+
+    stats = pool.stats()
+    assert stats["in_flight"] == 0
+    assert stats["cancelled"] == 1
+    assert stats["completed"] == 1
@@ -0,0 +1,78 @@
+from auth import (
+    ROLE_PERMISSIONS,
+    Permission,
+    Role,
+    User,
+    permission_mask,
+    refresh_role_permission_masks,
+    role_permission_mask,
+)
+import permission_agent
+from permission_agent import PermissionAwareAgent, PermissionGraphCache
+from tool_permissions import tool_permission_index
+
+
+def _user(role, permissions):
+    return User(
+        id=f"u_{role.value}", username=role.value, email=f"{role.value}@example.com",
+        hashed_password="x", role=role, permissions=permissions,
+    )
+
+
+def test_role_masks_follow_role_permission_changes(monkeypatch):
+    assert "setItemName" not in tool_permission_index.tools_for_role(Role.VIEWER)
+
+    monkeypatch.setitem(ROLE_PERMISSIONS, Role.VIEWER, [Permission.READ_CANVAS, Permission.WRITE_CANVAS])
+    assert role_permission_mask(Role.VIEWER) == permission_mask([Permission.READ_CANVAS, Permission.WRITE_CANVAS])
+    assert "setItemName" in tool_permission_index.tools_for_role(Role.VIEWER)
+
+    monkeypatch.undo()
+    assert refresh_role_permission_masks()
+    assert role_permission_mask(Role.VIEWER) == permission_mask([Permission.READ_CANVAS])
+    assert "setItemName" not in tool_permission_index.tools_for_role(Role.VIEWER)
+
+
+def test_refresh_is_a_no_op_when_roles_are_unchanged():
+    refresh_role_permission_masks()
+    assert not refresh_role_permission_masks()
+
+
+def test_graph_cache_is_keyed_by_mask():
+    cache = PermissionGraphCache(maxsize=2)
+    compiled = []
+
+    def compile_fn(mask):
+        def build():
+            compiled.append(mask)
+            return object()
+        return build
+
+    first = cache.get_or_compile(1, compile_fn(1))
+    assert cache.get_or_compile(1, compile_fn(1)) is first
+    cache.get_or_compile(2, compile_fn(2))
+    cache.get_or_compile(3, compile_fn(3))
+    assert cache.get_or_compile(1, compile_fn(1)) is not first
+    assert compiled == [1, 2, 3, 1]
+    assert cache.stats()["size"] == 2
+
+
+def test_users_with_the_same_permissions_share_a_graph(monkeypatch):
+    from agent import graph as main_graph
+
+    monkeypatch.setattr(permission_agent, "permission_graph_cache", PermissionGraphCache())
+    agent = PermissionAwareAgent(main_graph)
+    viewer = _user(Role.VIEWER, [Permission.READ_CANVAS])
+    guest = _user(Role.GUEST, [Permission.READ_CANVAS])
+    editor = _user(Role.EDITOR, [Permission.READ_CANVAS, Permission.WRITE_CANVAS])
+
+    graph = agent.create_user_specific_graph(viewer)
+    assert agent.create_user_specific_graph(guest) is graph
+    assert agent.create_user_specific_graph(editor) is not graph
+
+
+def test_permission_graphs_do_not_share_the_main_checkpointer():
+    from agent import graph as main_graph
+
+    graph = PermissionAwareAgent(main_graph).compile_graph_for_mask(permission_mask([Permission.READ_CANVAS]))
+    assert main_graph.checkpointer is not None
+    assert graph.checkpointer is not main_graph.checkpointer
@@ -0,0 +1,78 @@
+"""
+响应缓存：相同的问题在相同的上下文中命中，依赖上下文的追问在不同的对话中不命中
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent
+from response_cache import ResponseCacheSettings, history_fingerprint, response_cache
+
+ITEMS = [{"id": "0001", "type": "note", "name": "Groceries", "data": {"field1": ""}}]
+
+
+@pytest.fixture
+def memory_cache():
+    response_cache.configure(ResponseCacheSettings(backend="memory"))
+    yield response_cache
+    response_cache.configure(ResponseCacheSettings(backend="none"))
+
+
+def _ask(config, text, first=False):
+    inputs = {"messages": [HumanMessage(content=text)]}
+    if first:
+        inputs["items"] = ITEMS
+    return asyncio.run(agent.graph.ainvoke(inputs, config))["messages"][-1]
+
+
+def test_history_fingerprint_ignores_ids():
+    a = [HumanMessage(content="hi", id="1"), AIMessage(content="", tool_calls=[{"name": "t", "args": {"x": 1}, "id": "c1"}], id="2")]
+    b = [HumanMessage(content="hi", id="3"), AIMessage(content="", tool_calls=[{"name": "t", "args": {"x": 1}, "id": "c9"}], id="4")]
+    c = [HumanMessage(content="hi", id="1"), AIMessage(content="", tool_calls=[{"name": "t", "args": {"x": 2}, "id": "c1"}], id="2")]
+    assert history_fingerprint(a) == history_fingerprint(b)
+    assert history_fingerprint(a) != history_fingerprint(c)
+
+
+def test_first_question_hits_across_threads(memory_cache, fake_model, thread_config):
+    fake_model.script = [AIMessage(content="A summary.")]
+    _ask(thread_config(), "Summarize the canvas", first=True)
+    reply = _ask(thread_config(), "summarize the canvas?", first=True)
+    assert fake_model.calls == 1
+    assert reply.content == "A summary."
+    assert memory_cache.stats()["hits"] == 1
+
+
+def test_follow_up_in_different_conversation_misses(memory_cache, fake_model, thread_config):
+    first, second = thread_config(), thread_config()
+    fake_model.script = [AIMessage(content="Delete note 0001?")]
+    _ask(first, "clean up the canvas", first=True)
+    fake_model.script = [AIMessage(content="Deleted.")]
+    assert _ask(first, "yes").content == "Deleted."
+
+    fake_model.script = [AIMessage(content="Rename note 0001 to Errands?")]
+    _ask(second, "tidy the names", first=True)
+    fake_model.script = [AIMessage(content="Renamed.")]
+    # 同样是 "yes"，但之前的对话不同：必须调用模型，不能重放 "Deleted."
+    assert _ask(second, "yes").content == "Renamed."
+    assert fake_model.calls == 4
+    assert memory_cache.stats()["hits"] == 0
+
+
+def test_follow_up_with_same_history_hits(memory_cache, fake_model, thread_config):
+    for config in (thread_config(), thread_config()):
+        fake_model.script = [AIMessage(content="Delete note 0001?")]
+        _ask(config, "clean up the canvas", first=True)
+        fake_model.script = [AIMessage(content="Deleted.")]
+        assert _ask(config, "yes").content == "Deleted."
+    assert fake_model.calls == 2
+    assert memory_cache.stats()["hits"] == 2
+
+
+def test_random_requests_bypass(memory_cache, fake_model, thread_config):
+    fake_model.script = [AIMessage(content="Here is some random text.")]
+    _ask(thread_config(), "fill the note with random text", first=True)
+    _ask(thread_config(), "fill the note with random text", first=True)
+    assert fake_model.calls == 2
+    assert memory_cache.stats()["bypassed"] == 2
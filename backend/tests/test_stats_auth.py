@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from auth import ROLE_PERMISSIONS, Role, User, create_access_token, user_repository
+
+STATS = ["/stats/llm", "/stats/checkpointer", "/stats/logging", "/stats/fast_path", "/stats/interrupts", "/stats/auth"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main import app
+
+    return TestClient(app)
+
+
+def _token(username, role):
+    if user_repository.get_by_username(username) is None:
+        user_repository.add(User(
+            id=username, username=username, email=f"{username}@example.com",
+            hashed_password="x", role=role, permissions=ROLE_PERMISSIONS[role],
+        ))
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+@pytest.mark.parametrize("path", STATS)
+def test_stats_require_manage_users(client, path):
+    assert client.get(path).status_code in (401, 403)
+    assert client.get(path, headers=_token("stats_editor", Role.EDITOR)).status_code == 403
+    assert client.get(path, headers=_token("stats_admin", Role.ADMIN)).status_code == 200
+
+
+def test_metrics_stays_public(client):
+    assert client.get("/metrics").status_code == 200
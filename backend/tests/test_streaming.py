@@ -0,0 +1,73 @@
+"""
+流式输出：片段经 astream_events 发出（AG-UI 端点据此推送），计划执行中途推送过的文本保存在状态中
+"""
+
+import asyncio
+from typing import List
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent
+from fake_llm import FakeChatModel, tool_call
+
+PLAN = {
+    "planSteps": [{"title": "a", "status": "in_progress"}, {"title": "b", "status": "pending"}],
+    "currentStepIndex": 0,
+    "planStatus": "in_progress",
+}
+
+
+class SequenceModel(FakeChatModel):
+    """依次返回 replies 中的消息"""
+    replies: List[AIMessage] = []
+
+    def _next_message(self, messages):
+        self.calls += 1
+        return self.replies[self.calls - 1] if self.calls <= len(self.replies) else AIMessage(content="done")
+
+
+def _use(monkeypatch, model):
+    monkeypatch.setattr(agent, "get_chat_model", lambda: model)
+
+
+def test_chunks_reach_astream_events(monkeypatch, thread_config):
+    monkeypatch.setenv("LLM_STREAMING", "true")
+    _use(monkeypatch, SequenceModel(replies=[AIMessage(content="one two three")]))
+
+    async def collect():
+        events = []
+        async for event in agent.graph.astream_events({"messages": [HumanMessage(content="hi")]}, thread_config(), version="v2"):
+            if event["event"] == "on_chat_model_stream":
+                events.append(event)
+        return events
+
+    events = asyncio.run(collect())
+    assert len(events) > 1
+    # ag_ui_langgraph 只在这些元数据为 False 时才不推送
+    assert all(e["metadata"].get("emit-messages", True) and e["metadata"].get("emit-tool-calls", True) for e in events)
+    assert "".join(e["data"]["chunk"].content for e in events) == "one two three"
+
+
+def test_streamed_text_during_plan_is_kept(monkeypatch, thread_config):
+    monkeypatch.setenv("LLM_STREAMING", "true")
+    _use(monkeypatch, SequenceModel(replies=[
+        AIMessage(content="Working on step a."),
+        tool_call("update_plan_progress", {"step_index": 0, "status": "completed"}, "c0"),
+        AIMessage(content="Working on step b."),
+        tool_call("update_plan_progress", {"step_index": 1, "status": "completed"}, "c1"),
+    ]))
+    result = asyncio.run(agent.graph.ainvoke({"messages": [HumanMessage(content="go")], **PLAN}, thread_config()))
+    texts = [m.content for m in result["messages"] if isinstance(m, AIMessage) and m.content]
+    assert texts[:2] == ["Working on step a.", "Working on step b."]
+    assert result["planStatus"] == "completed"
+
+
+def test_unstreamed_text_during_plan_is_not_added(monkeypatch, thread_config):
+    monkeypatch.setenv("LLM_STREAMING", "false")
+    _use(monkeypatch, SequenceModel(replies=[
+        AIMessage(content="Working on step a."),
+        tool_call("update_plan_progress", {"step_index": 0, "status": "completed"}, "c0"),
+        tool_call("update_plan_progress", {"step_index": 1, "status": "completed"}, "c1"),
+    ]))
+    result = asyncio.run(agent.graph.ainvoke({"messages": [HumanMessage(content="go")], **PLAN}, thread_config()))
+    assert "Working on step a." not in [m.content for m in result["messages"]]
@@ -0,0 +1,93 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth_routes
+from auth import ROLE_PERMISSIONS, Role, User, create_access_token
+from user_store import InMemoryUserRepository
+
+
+def _user(user_id, role=Role.VIEWER, is_active=True):
+    return User(
+        id=user_id, username=user_id, email=f"{user_id}@example.com",
+        hashed_password="x", role=role, permissions=ROLE_PERMISSIONS[role], is_active=is_active,
+    )
+
+
+@pytest.fixture
+def store():
+    store = InMemoryUserRepository()
+    for i in range(10):
+        store.add(_user(f"u{i:02d}", role=Role.EDITOR if i % 2 else Role.VIEWER, is_active=i % 3 != 0))
+    return store
+
+
+def _ids(users):
+    return [u.id for u in users]
+
+
+def test_list_page_filters_use_the_indexes(store):
+    assert _ids(store.list_page(limit=3)) == ["u00", "u01", "u02"]
+    assert _ids(store.list_page(after="u02", limit=3)) == ["u03", "u04", "u05"]
+    assert _ids(store.list_page(is_active=False)) == ["u00", "u03", "u06", "u09"]
+    assert _ids(store.list_page(role=Role.EDITOR, is_active=True)) == ["u01", "u05", "u07"]
+    assert _ids(store.list_page(after="u01", limit=1, role="editor", is_active=True)) == ["u05"]
+
+
+def test_update_moves_users_between_indexes(store):
+    user = store.get_by_id("u01")
+    user.is_active = False
+    user.role = Role.VIEWER
+    store.update(user)
+    assert "u01" in _ids(store.list_page(role=Role.VIEWER, is_active=False))
+    assert "u01" not in _ids(store.list_page(is_active=True))
+    assert "u01" not in _ids(store.list_page(role=Role.EDITOR))
+
+    assert store.delete("u01")
+    assert "u01" not in _ids(store.list_page(role=Role.VIEWER, is_active=False))
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    admin = _user("admin", role=Role.ADMIN)
+    store.add(admin)
+    monkeypatch.setattr(auth_routes, "user_repository", store)
+    monkeypatch.setattr("auth.user_repository", store)
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'admin'})}"
+    return client
+
+
+def test_users_endpoint_returns_a_list_by_default(client, monkeypatch):
+    monkeypatch.setattr(auth_routes, "USERS_STREAM_BATCH_SIZE", 3)
+    response = client.get("/auth/users")
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body, list)
+    assert [u["id"] for u in body] == ["admin"] + [f"u{i:02d}" for i in range(10)]
+
+    body = client.get("/auth/users", params={"role": "editor", "is_active": "false"}).json()
+    assert [u["id"] for u in body] == ["u03", "u09"]
+
+
+def test_users_endpoint_pages_when_asked(client):
+    seen = []
+    page = client.get("/auth/users", params={"limit": 4}).json()
+    while True:
+        seen += [u["id"] for u in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        page = client.get("/auth/users", params={"limit": 4, "cursor": page["next_cursor"]}).json()
+    assert seen == ["admin"] + [f"u{i:02d}" for i in range(10)]
+
+    page = client.get("/auth/users", params={"cursor": "u07"}).json()
+    assert [u["id"] for u in page["items"]] == ["u08", "u09"]
+    assert page["next_cursor"] is None
+
+
+def test_users_endpoint_requires_manage_users(client, store):
+    store.add(_user("viewer_only"))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'viewer_only'})}"}
+    assert client.get("/auth/users", headers=headers).status_code == 403